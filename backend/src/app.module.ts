@@ -27,6 +27,7 @@ import { AnalyticsModule } from './modules/analytics/analytics.module';
 import { ReviewModule } from './modules/review/review.module';
 import { ExportModule } from './modules/export/export.module';
 import { AppCacheModule } from './modules/cache/cache.module';
+import { StatisticsModule } from './modules/statistics/statistics.module';
 
 @Module({
   imports: [
@@ -38,7 +39,8 @@ import { AppCacheModule } from './modules/cache/cache.module';
 
     // 数据库模块
     DatabaseModule,
-    // RedisModule,  // Redis 未运行，暂时禁用
+    // Redis 可选：未启用时缓存退化为进程内 L1
+    ...(process.env.REDIS_ENABLED === 'true' ? [RedisModule] : []),
 
     // 缓存模块
     AppCacheModule,
@@ -65,8 +67,8 @@ import { AppCacheModule } from './modules/cache/cache.module';
     AnalyticsModule,
     ReviewModule,
     ExportModule,
+    StatisticsModule,
     // 其他模块将在后续开发中添加
-    // StatisticsModule,
     // QuestionModule,
 
     // 静态资源服务（可选）
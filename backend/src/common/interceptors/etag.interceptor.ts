@@ -0,0 +1,34 @@
+import { Injectable, NestInterceptor, ExecutionContext, CallHandler } from '@nestjs/common';
+import { Observable } from 'rxjs';
+import { map } from 'rxjs/operators';
+import { Request, Response } from 'express';
+import { createHash } from 'crypto';
+
+/**
+ * 弱 ETag 拦截器（用于 GET 接口）
+ * 基于控制器返回的数据计算（TransformInterceptor 包装时附加的 timestamp 不参与）；
+ * Express 在 res.send 时按 If-None-Match 做新鲜度检查（req.fresh），命中即返回不带响应体的 304
+ */
+@Injectable()
+export class ETagInterceptor implements NestInterceptor {
+  intercept(context: ExecutionContext, next: CallHandler): Observable<any> {
+    const request = context.switchToHttp().getRequest<Request>();
+    const response = context.switchToHttp().getResponse<Response>();
+
+    if (request.method !== 'GET') {
+      return next.handle();
+    }
+
+    return next.handle().pipe(
+      map((data) => {
+        const body = JSON.stringify(data ?? null);
+        const etag = `W/"${Buffer.byteLength(body).toString(16)}-${createHash('sha1').update(body).digest('base64url')}"`;
+
+        response.setHeader('ETag', etag);
+        // 带鉴权的个人数据：仅允许客户端缓存，每次使用前重新验证
+        response.setHeader('Cache-Control', 'private, no-cache');
+        return data;
+      }),
+    );
+  }
+}
@@ -75,24 +75,3 @@ export class RequestSizeLimitInterceptor implements NestInterceptor {
     return next.handle();
   }
 }
-
-/**
- * 响应压缩拦截器
- */
-@Injectable()
-export class CompressionInterceptor implements NestInterceptor {
-  intercept(context: ExecutionContext, next: CallHandler): Observable<any> {
-    const response = context.switchToHttp().getResponse();
-    const request = context.switchToHttp().getRequest();
-
-    // 检查客户端是否支持压缩
-    const acceptEncoding = request.headers['accept-encoding'] || '';
-    if (acceptEncoding.includes('gzip')) {
-      response.setHeader('Content-Encoding', 'gzip');
-    } else if (acceptEncoding.includes('deflate')) {
-      response.setHeader('Content-Encoding', 'deflate');
-    }
-
-    return next.handle();
-  }
-}
@@ -0,0 +1,27 @@
+/**
+ * 以有限并发处理列表，返回与输入顺序一致的结果
+ * 单个任务失败不会中断其他任务，失败结果以 { error } 返回
+ */
+export async function mapWithConcurrency<T, R>(
+  items: T[],
+  concurrency: number,
+  worker: (item: T, index: number) => Promise<R>,
+): Promise<Array<{ value?: R; error?: Error }>> {
+  const results: Array<{ value?: R; error?: Error }> = new Array(items.length);
+  let next = 0;
+
+  const run = async () => {
+    while (next < items.length) {
+      const index = next++;
+      try {
+        results[index] = { value: await worker(items[index], index) };
+      } catch (error) {
+        results[index] = { error };
+      }
+    }
+  };
+
+  const workers = Math.max(1, Math.min(concurrency, items.length));
+  await Promise.all(Array.from({ length: workers }, run));
+  return results;
+}
@@ -0,0 +1,87 @@
+import { BadRequestException } from '@nestjs/common';
+import { ObjectLiteral, SelectQueryBuilder } from 'typeorm';
+
+const CURSOR_VALUE_ALIAS = 'keyset_cursor_value';
+
+/**
+ * 游标分页配置
+ * 排序键必须非空；主实体 id 作为次排序键保证顺序稳定
+ */
+export interface KeysetOptions {
+  alias: string;
+  sortKey: string;
+  order: 'ASC' | 'DESC';
+  limit: number;
+  cursor?: string;
+  // 写入游标的取值表达式，默认与 sortKey 相同
+  cursorValue?: string;
+}
+
+export interface KeysetPage<T> {
+  items: T[];
+  nextCursor: string | null;
+  hasMore: boolean;
+}
+
+/**
+ * datetime 列的游标取值：保留微秒，避免 JS Date 截断到毫秒后跳过同一毫秒内的行
+ */
+export function datetimeCursorValue(column: string): string {
+  return `DATE_FORMAT(${column}, '%Y-%m-%d %H:%i:%s.%f')`;
+}
+
+export function encodeCursor(value: string | number, id: string): string {
+  return Buffer.from(JSON.stringify([value, id])).toString('base64url');
+}
+
+export function decodeCursor(cursor: string): { value: string | number; id: string } {
+  try {
+    const [value, id] = JSON.parse(Buffer.from(cursor, 'base64url').toString('utf8'));
+    if ((typeof value === 'string' || typeof value === 'number') && typeof id === 'string') {
+      return { value, id };
+    }
+  } catch {
+    // 落到下方统一报错
+  }
+  throw new BadRequestException('无效的分页游标');
+}
+
+/**
+ * 按 (排序键, id) 做游标分页：从上一页最后一行之后继续，无 OFFSET 扫描
+ * 多取一行判断是否还有下一页；调用方只应关联多对一关系，保证一行对应一个实体
+ */
+export async function paginateByKeyset<T extends ObjectLiteral>(
+  queryBuilder: SelectQueryBuilder<T>,
+  options: KeysetOptions,
+): Promise<KeysetPage<T>> {
+  const { alias, sortKey, order, limit, cursor } = options;
+  const idColumn = `${alias}.id`;
+  const operator = order === 'DESC' ? '<' : '>';
+
+  if (cursor) {
+    const { value, id } = decodeCursor(cursor);
+    queryBuilder.andWhere(
+      `(${sortKey} ${operator} :keysetValue OR (${sortKey} = :keysetValue AND ${idColumn} ${operator} :keysetId))`,
+      { keysetValue: value, keysetId: id },
+    );
+  }
+
+  const { entities, raw } = await queryBuilder
+    .addSelect(options.cursorValue || sortKey, CURSOR_VALUE_ALIAS)
+    .orderBy(sortKey, order)
+    .addOrderBy(idColumn, order)
+    .limit(limit + 1)
+    .getRawAndEntities();
+
+  const hasMore = entities.length > limit;
+  const items = entities.slice(0, limit);
+
+  let nextCursor: string | null = null;
+  if (hasMore && items.length > 0) {
+    const last = items[items.length - 1];
+    const lastRaw = raw.find((row) => row[`${alias}_id`] === last.id);
+    nextCursor = encodeCursor(lastRaw[CURSOR_VALUE_ALIAS], last.id);
+  }
+
+  return { items, nextCursor, hasMore };
+}
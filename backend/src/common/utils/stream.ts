@@ -0,0 +1,11 @@
+import { once } from 'events';
+import { Writable } from 'stream';
+
+/**
+ * 输出端缓冲已满时等待 drain，使生产速度跟随下游消费速度
+ */
+export async function waitForDrain(output: Writable): Promise<void> {
+  if (output.writableNeedDrain && !output.destroyed) {
+    await once(output, 'drain');
+  }
+}
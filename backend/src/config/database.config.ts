@@ -5,12 +5,14 @@ import { join } from 'path';
 // Import entities directly
 import { User } from '../modules/user/entities/user.entity';
 import { Mistake } from '../modules/mistake/entities/mistake.entity';
+import { MistakeKnowledgePoint } from '../modules/mistake/entities/mistake-knowledge-point.entity';
 import { Subject } from '../modules/subject/entities/subject.entity';
 import { Review } from '../modules/review/entities/review.entity';
 import { Practice } from '../modules/practice/entities/practice.entity';
 import { Exam } from '../modules/practice/entities/exam.entity';
 import { ExamRecord } from '../modules/practice/entities/exam-record.entity';
 import { ExamAnswer } from '../modules/practice/entities/exam-answer.entity';
+import { UserStatsDaily } from '../modules/statistics/entities/user-stats-daily.entity';
 
 @Global()
 @Module({
@@ -25,7 +27,7 @@ import { ExamAnswer } from '../modules/practice/entities/exam-answer.entity';
         username: configService.get('DB_USERNAME') || 'root',
         password: configService.get('DB_PASSWORD') || '',
         database: configService.get('DB_NAME') || 'mistakery',
-        entities: [User, Mistake, Subject, Review, Practice, Exam, ExamRecord, ExamAnswer],
+        entities: [User, Mistake, MistakeKnowledgePoint, Subject, Review, Practice, Exam, ExamRecord, ExamAnswer, UserStatsDaily],
         synchronize: configService.get('NODE_ENV') === 'development',
         logging: configService.get('NODE_ENV') === 'development',
         charset: 'utf8mb4',
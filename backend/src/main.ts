@@ -1,5 +1,7 @@
 import { NestFactory } from '@nestjs/core';
 import { ValidationPipe, Logger } from '@nestjs/common';
+import * as compression from 'compression';
+import { constants as zlibConstants } from 'zlib';
 import { AppModule } from './app.module';
 import { HttpExceptionFilter, AllExceptionsFilter } from './common/filters/global-exception.filter';
 import { PerformanceInterceptor } from './common/interceptors/performance.interceptor';
@@ -53,6 +55,23 @@ async function bootstrap() {
     next();
   });
 
+  // ====================================
+  // 性能配置
+  // ====================================
+
+  // 响应压缩：按 Accept-Encoding 协商 br/gzip，小于阈值的响应不压缩
+  // brotli 取中等质量，压缩率接近 gzip -9 而 CPU 开销小得多
+  app.use(
+    compression({
+      threshold: parseInt(process.env.COMPRESSION_THRESHOLD, 10) || 1024,
+      brotli: {
+        params: {
+          [zlibConstants.BROTLI_PARAM_QUALITY]: 4,
+        },
+      },
+    }),
+  );
+
   // 全局前缀
   app.setGlobalPrefix('api', {
     exclude: ['health', 'health/live', 'health/ready'],
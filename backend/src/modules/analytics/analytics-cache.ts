@@ -0,0 +1,208 @@
+/**
+ * 分析缓存条目
+ */
+export interface AnalyticsCacheEntry<T = any> {
+  data: T;
+  expiresAt: number; // 过期时间（之后为旧值）
+  evictAt: number; // 彻底删除时间
+  bytes: number;
+}
+
+/**
+ * 分析缓存指标
+ */
+export interface AnalyticsCacheMetrics {
+  entries: number;
+  bytes: number;
+  users: number;
+  maxEntries: number;
+  maxBytes: number;
+  hits: number;
+  misses: number;
+  evictions: number;
+}
+
+/**
+ * 按用户分区的有界 LRU 缓存
+ * 全局按条目数和估算字节数限制容量；清除单个用户的缓存只遍历该用户的条目
+ */
+export class AnalyticsCache {
+  // 全局 LRU 顺序（Map 插入顺序），键为 userId + '\0' + key
+  private readonly lru = new Map<string, AnalyticsCacheEntry>();
+  // 用户 -> 该用户的完整键集合
+  private readonly partitions = new Map<string, Set<string>>();
+  // 用户缓存代数（清除时取全局递增的时钟值），用于丢弃清除前发起的加载结果；
+  // 只保留最近清除的 maxEntries 个用户，淘汰的代数并入下限，未记录的用户按下限计，
+  // 因此淘汰后代数只会变大，清除前发起的加载仍会被丢弃
+  private readonly generations = new Map<string, number>();
+  private generationClock = 0;
+  private generationFloor = 0;
+  private totalBytes = 0;
+  private hits = 0;
+  private misses = 0;
+  private evictions = 0;
+
+  constructor(
+    private readonly maxEntries: number,
+    private readonly maxBytes: number,
+  ) {}
+
+  /**
+   * 读取条目（包含已过期但未到删除时间的旧值），命中时刷新为最近使用
+   */
+  get<T>(userId: string, key: string): AnalyticsCacheEntry<T> | undefined {
+    const fullKey = this.fullKey(userId, key);
+    const entry = this.lru.get(fullKey);
+    if (!entry) {
+      this.misses++;
+      return undefined;
+    }
+
+    if (Date.now() > entry.evictAt) {
+      this.remove(userId, fullKey);
+      this.misses++;
+      return undefined;
+    }
+
+    this.lru.delete(fullKey);
+    this.lru.set(fullKey, entry);
+    this.hits++;
+    return entry as AnalyticsCacheEntry<T>;
+  }
+
+  /**
+   * 写入条目；generation 与当前代数不一致时（期间用户缓存已被清除）丢弃
+   */
+  set<T>(
+    userId: string,
+    key: string,
+    data: T,
+    ttlSeconds: number,
+    staleSeconds = 0,
+    generation = this.generation(userId),
+  ): void {
+    if (generation !== this.generation(userId)) {
+      return;
+    }
+
+    const fullKey = this.fullKey(userId, key);
+    if (this.lru.has(fullKey)) {
+      this.remove(userId, fullKey);
+    }
+
+    const now = Date.now();
+    const entry: AnalyticsCacheEntry<T> = {
+      data,
+      expiresAt: now + ttlSeconds * 1000,
+      evictAt: now + (ttlSeconds + staleSeconds) * 1000,
+      bytes: this.estimateBytes(fullKey, data),
+    };
+
+    this.lru.set(fullKey, entry);
+    this.totalBytes += entry.bytes;
+
+    let partition = this.partitions.get(userId);
+    if (!partition) {
+      partition = new Set();
+      this.partitions.set(userId, partition);
+    }
+    partition.add(fullKey);
+
+    this.evictOverflow();
+  }
+
+  /**
+   * 清除单个用户的全部条目
+   */
+  deleteUser(userId: string): number {
+    this.generations.delete(userId);
+    this.generations.set(userId, ++this.generationClock);
+    if (this.generations.size > this.maxEntries) {
+      const [oldestUser, oldestGeneration] = this.generations.entries().next().value;
+      this.generations.delete(oldestUser);
+      this.generationFloor = Math.max(this.generationFloor, oldestGeneration);
+    }
+
+    const partition = this.partitions.get(userId);
+    if (!partition) return 0;
+
+    const count = partition.size;
+    for (const fullKey of partition) {
+      const entry = this.lru.get(fullKey);
+      if (entry) {
+        this.totalBytes -= entry.bytes;
+        this.lru.delete(fullKey);
+      }
+    }
+    this.partitions.delete(userId);
+    return count;
+  }
+
+  /**
+   * 用户当前缓存代数
+   */
+  generation(userId: string): number {
+    return this.generations.get(userId) ?? this.generationFloor;
+  }
+
+  getMetrics(): AnalyticsCacheMetrics {
+    return {
+      entries: this.lru.size,
+      bytes: this.totalBytes,
+      users: this.partitions.size,
+      maxEntries: this.maxEntries,
+      maxBytes: this.maxBytes,
+      hits: this.hits,
+      misses: this.misses,
+      evictions: this.evictions,
+    };
+  }
+
+  private evictOverflow(): void {
+    while (
+      this.lru.size > 0 &&
+      (this.lru.size > this.maxEntries || this.totalBytes > this.maxBytes)
+    ) {
+      const oldestKey = this.lru.keys().next().value;
+      this.remove(this.userOf(oldestKey), oldestKey);
+      this.evictions++;
+    }
+  }
+
+  private remove(userId: string, fullKey: string): void {
+    const entry = this.lru.get(fullKey);
+    if (!entry) return;
+
+    this.lru.delete(fullKey);
+    this.totalBytes -= entry.bytes;
+
+    const partition = this.partitions.get(userId);
+    if (partition) {
+      partition.delete(fullKey);
+      if (partition.size === 0) {
+        this.partitions.delete(userId);
+      }
+    }
+  }
+
+  private fullKey(userId: string, key: string): string {
+    return `${userId}\0${key}`;
+  }
+
+  private userOf(fullKey: string): string {
+    return fullKey.slice(0, fullKey.indexOf('\0'));
+  }
+
+  /**
+   * 估算条目占用的字节数（UTF-16，按 JSON 长度近似）
+   */
+  private estimateBytes(fullKey: string, data: unknown): number {
+    let json = '';
+    try {
+      json = JSON.stringify(data) || '';
+    } catch {
+      // 无法序列化时只计算键
+    }
+    return (fullKey.length + json.length) * 2;
+  }
+}
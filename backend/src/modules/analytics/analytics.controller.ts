@@ -1,6 +1,7 @@
-import { Controller, Get, Query, UseGuards, Request } from '@nestjs/common';
+import { Controller, Get, Query, UseGuards, UseInterceptors, Request } from '@nestjs/common';
 import { ApiTags, ApiOperation, ApiBearerAuth } from '@nestjs/swagger';
 import { JwtAuthGuard } from '../../common/guards/jwt-auth.guard';
+import { ETagInterceptor } from '../../common/interceptors/etag.interceptor';
 import { AnalyticsService } from './analytics.service';
 import {
   GetStatisticsDto,
@@ -15,6 +16,7 @@ import {
 @ApiTags('analytics')
 @Controller('analytics')
 @UseGuards(JwtAuthGuard)
+@UseInterceptors(ETagInterceptor)
 @ApiBearerAuth()
 export class AnalyticsController {
   constructor(private readonly analyticsService: AnalyticsService) {}
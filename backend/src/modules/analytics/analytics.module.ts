@@ -7,10 +7,12 @@ import { Mistake } from '../mistake/entities/mistake.entity';
 import { AnalyticsController } from './analytics.controller';
 import { AnalyticsService } from './analytics.service';
 import { PerformanceAggregator } from './performance-aggregator.service';
+import { StatisticsModule } from '../statistics/statistics.module';
 
 @Module({
   imports: [
     JwtModule,
+    StatisticsModule,
     TypeOrmModule.forFeature([
       ExamRecord,
       ExamAnswer,
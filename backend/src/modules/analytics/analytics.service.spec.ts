@@ -1,6 +1,7 @@
 import { Test, TestingModule } from '@nestjs/testing';
 import { AnalyticsService } from './analytics.service';
 import { PerformanceAggregator } from './performance-aggregator.service';
+import { StatsRollupService } from '../statistics/stats-rollup.service';
 import { getRepositoryToken } from '@nestjs/typeorm';
 import { Repository } from 'typeorm';
 import { ExamRecord } from '../practice/entities/exam-record.entity';
@@ -10,6 +11,7 @@ import { TimeRange, SortBy, SortOrder, SubjectStatistics, TrendDataPoint, Detail
 describe('AnalyticsService', () => {
   let service: AnalyticsService;
   let performanceAggregator: jest.Mocked<PerformanceAggregator>;
+  let statsRollupService: jest.Mocked<StatsRollupService>;
   let examRecordRepository: jest.Mocked<Repository<ExamRecord>>;
   let mistakeRepository: jest.Mocked<Repository<Mistake>>;
 
@@ -25,12 +27,27 @@ describe('AnalyticsService', () => {
           provide: PerformanceAggregator,
           useValue: {
             getUserExamRecords: jest.fn(),
-            getSubjectStatistics: jest.fn(),
+            getRecentExamRecords: jest.fn().mockResolvedValue([]),
+            getExamSummary: jest.fn().mockResolvedValue({
+              examCount: 0,
+              questionCount: 0,
+              correctCount: 0,
+              incorrectCount: 0,
+              timeSpent: 0,
+              studyDays: 0,
+            }),
+            getSubjectStatistics: jest.fn().mockResolvedValue([]),
             getTrendData: jest.fn(),
             getDetailReport: jest.fn(),
             generateStudyAdvice: jest.fn(),
           },
         },
+        {
+          provide: StatsRollupService,
+          useValue: {
+            onUserChange: jest.fn(),
+          },
+        },
         {
           provide: getRepositoryToken(ExamRecord),
           useValue: {
@@ -48,6 +65,7 @@ describe('AnalyticsService', () => {
 
     service = module.get<AnalyticsService>(AnalyticsService);
     performanceAggregator = module.get(PerformanceAggregator);
+    statsRollupService = module.get(StatsRollupService);
     examRecordRepository = module.get(getRepositoryToken(ExamRecord));
     mistakeRepository = module.get(getRepositoryToken(Mistake));
   });
@@ -58,20 +76,16 @@ describe('AnalyticsService', () => {
 
   describe('getStatisticsOverview', () => {
     it('should return overview statistics', async () => {
-      performanceAggregator.getUserExamRecords.mockResolvedValue([]);
-
       const result = await service.getStatisticsOverview(mockUserId, TimeRange.MONTH);
 
       expect(result).toBeDefined();
-      expect(performanceAggregator.getUserExamRecords).toHaveBeenCalledWith(
+      expect(performanceAggregator.getExamSummary).toHaveBeenCalledWith(
         mockUserId,
         TimeRange.MONTH
       );
     });
 
     it('should cache overview results', async () => {
-      performanceAggregator.getUserExamRecords.mockResolvedValue([]);
-
       // First call
       await service.getStatisticsOverview(mockUserId, TimeRange.MONTH);
 
@@ -79,7 +93,7 @@ describe('AnalyticsService', () => {
       await service.getStatisticsOverview(mockUserId, TimeRange.MONTH);
 
       // Should only call the aggregator once due to caching
-      expect(performanceAggregator.getUserExamRecords).toHaveBeenCalledTimes(1);
+      expect(performanceAggregator.getExamSummary).toHaveBeenCalledTimes(1);
     });
   });
 
@@ -336,4 +350,47 @@ describe('AnalyticsService', () => {
       expect(result.overallAdvice).toContain('表现优秀');
     });
   });
+
+  describe('cache', () => {
+    it('should reload after clearing the user cache', async () => {
+      await service.getStatisticsOverview(mockUserId, TimeRange.MONTH);
+      service.clearUserCache(mockUserId);
+      await service.getStatisticsOverview(mockUserId, TimeRange.MONTH);
+
+      expect(performanceAggregator.getExamSummary).toHaveBeenCalledTimes(2);
+    });
+
+    it('should clear the user cache when the stats rollup changes', async () => {
+      await service.getStatisticsOverview(mockUserId, TimeRange.MONTH);
+      const [listener] = statsRollupService.onUserChange.mock.calls[0];
+      listener(mockUserId);
+      await service.getStatisticsOverview(mockUserId, TimeRange.MONTH);
+
+      expect(performanceAggregator.getExamSummary).toHaveBeenCalledTimes(2);
+    });
+
+    it('should only clear entries of the given user', async () => {
+      performanceAggregator.getSubjectStatistics.mockResolvedValue([]);
+
+      await service.getSubjectStatistics(mockUserId, TimeRange.MONTH);
+      await service.getSubjectStatistics('user-456', TimeRange.MONTH);
+      service.clearUserCache(mockUserId);
+
+      const metrics = service.getCacheMetrics();
+      expect(metrics.entries).toBe(1);
+      expect(metrics.users).toBe(1);
+      expect(metrics.bytes).toBeGreaterThan(0);
+    });
+
+    it('should share one load between concurrent misses', async () => {
+      performanceAggregator.getSubjectStatistics.mockResolvedValue([]);
+
+      await Promise.all([
+        service.getSubjectStatistics(mockUserId, TimeRange.MONTH),
+        service.getSubjectStatistics(mockUserId, TimeRange.MONTH),
+      ]);
+
+      expect(performanceAggregator.getSubjectStatistics).toHaveBeenCalledTimes(1);
+    });
+  });
 });
@@ -1,5 +1,8 @@
 import { Injectable, Logger } from '@nestjs/common';
 import { PerformanceAggregator } from './performance-aggregator.service';
+import { SingleFlight } from '../cache/single-flight';
+import { StatsRollupService } from '../statistics/stats-rollup.service';
+import { AnalyticsCache, AnalyticsCacheMetrics } from './analytics-cache';
 import {
   TimeRange,
   StatisticsOverview,
@@ -12,10 +15,12 @@ import {
 } from './dto/analytics.dto';
 
 /**
- * 缓存键前缀
+ * 缓存配置
  */
-const CACHE_PREFIX = 'analytics:';
 const CACHE_TTL = 300; // 5分钟缓存
+const CACHE_STALE_TTL = 120; // 过期后2分钟内先返回旧值并后台刷新
+const CACHE_MAX_ENTRIES = parseInt(process.env.ANALYTICS_CACHE_MAX_ENTRIES, 10) || 10000;
+const CACHE_MAX_BYTES = parseInt(process.env.ANALYTICS_CACHE_MAX_BYTES, 10) || 64 * 1024 * 1024;
 
 /**
  * 分析服务
@@ -24,56 +29,74 @@ const CACHE_TTL = 300; // 5分钟缓存
 @Injectable()
 export class AnalyticsService {
   private readonly logger = new Logger(AnalyticsService.name);
-  private cache = new Map<string, { data: any; expiresAt: number }>();
-
-  constructor(private performanceAggregator: PerformanceAggregator) {}
+  private cache = new AnalyticsCache(CACHE_MAX_ENTRIES, CACHE_MAX_BYTES);
+  private inflight = new SingleFlight<any>();
+
+  constructor(
+    private performanceAggregator: PerformanceAggregator,
+    statsRollupService: StatsRollupService,
+  ) {
+    // 练习完成、错题增删改和复习提交都会写入统计汇总，提交后清除该用户的分析缓存
+    statsRollupService.onUserChange((userId) => this.clearUserCache(userId));
+  }
 
   /**
-   * 获取缓存
+   * 读取缓存，未命中时加载
+   * 并发未命中共享同一次加载；过期不久的数据先返回，同时后台刷新一次
    */
-  private getCache<T>(key: string): T | null {
-    const cached = this.cache.get(key);
-    if (!cached) {
-      return null;
+  private async cached<T>(
+    userId: string,
+    key: string,
+    loader: () => Promise<T>,
+    ttl: number = CACHE_TTL,
+  ): Promise<T> {
+    const entry = this.cache.get<T>(userId, key);
+    if (entry && Date.now() <= entry.expiresAt) {
+      return entry.data;
     }
 
-    if (Date.now() > cached.expiresAt) {
-      this.cache.delete(key);
-      return null;
+    const flightKey = `${userId}:${key}`;
+    const load = () => {
+      const generation = this.cache.generation(userId);
+      return this.inflight.do(flightKey, async () => {
+        const data = await loader();
+        this.cache.set(userId, key, data, ttl, CACHE_STALE_TTL, generation);
+        return data;
+      }) as Promise<T>;
+    };
+
+    if (entry) {
+      if (!this.inflight.has(flightKey)) {
+        load().catch((error) =>
+          this.logger.warn(`Background refresh failed for ${flightKey}: ${error.message}`),
+        );
+      }
+      return entry.data;
     }
 
-    return cached.data as T;
+    return load();
   }
 
   /**
-   * 设置缓存
+   * 生成缓存键（用户维度由缓存分区承担）
    */
-  private setCache<T>(key: string, data: T, ttl: number = CACHE_TTL): void {
-    this.cache.set(key, {
-      data,
-      expiresAt: Date.now() + ttl * 1000,
-    });
+  private cacheKey(method: string, ...params: unknown[]): string {
+    return `${method}:${params.join('|')}`;
   }
 
   /**
-   * 生成缓存键
+   * 清除用户相关缓存
    */
-  private generateCacheKey(userId: string, method: string, params: any = {}): string {
-    const paramsStr = JSON.stringify(params);
-    return `${CACHE_PREFIX}${userId}:${method}:${Buffer.from(paramsStr).toString('base64')}`;
+  clearUserCache(userId: string): void {
+    const count = this.cache.deleteUser(userId);
+    this.logger.debug(`Cleared ${count} cache entries for user ${userId}`);
   }
 
   /**
-   * 清除用户相关缓存
+   * 获取缓存容量指标
    */
-  clearUserCache(userId: string): void {
-    const prefix = `${CACHE_PREFIX}${userId}:`;
-    for (const key of this.cache.keys()) {
-      if (key.startsWith(prefix)) {
-        this.cache.delete(key);
-      }
-    }
-    this.logger.log(`Cleared cache for user ${userId}`);
+  getCacheMetrics(): AnalyticsCacheMetrics {
+    return this.cache.getMetrics();
   }
 
   /**
@@ -83,64 +106,61 @@ export class AnalyticsService {
     userId: string,
     timeRange: TimeRange = TimeRange.ALL,
   ): Promise<StatisticsOverview> {
-    const cacheKey = this.generateCacheKey(userId, 'overview', { timeRange });
-    const cached = this.getCache<StatisticsOverview>(cacheKey);
-    if (cached) {
-      return cached;
-    }
-
-    const examRecords = await this.performanceAggregator.getUserExamRecords(
-      userId,
-      timeRange,
-    );
-
-    // 基础统计
-    const totalExams = examRecords.length;
-    const totalQuestions = examRecords.reduce((sum, r) => sum + r.questionCount, 0);
-    const totalCorrect = examRecords.reduce((sum, r) => sum + r.correctCount, 0);
-    const totalIncorrect = examRecords.reduce((sum, r) => sum + r.incorrectCount, 0);
-    const overallAccuracy =
-      totalQuestions > 0 ? (totalCorrect / totalQuestions) * 100 : 0;
-    const totalTimeSpent = examRecords.reduce((sum, r) => sum + r.timeSpent, 0);
-    const averageTimePerQuestion =
-      totalQuestions > 0 ? totalTimeSpent / totalQuestions : 0;
-
-    // 最近练习
-    const recentExams = examRecords.slice(0, 10).map((r) => ({
-      id: r.id,
-      name: r.examName,
-      accuracy: parseFloat(r.accuracy.toFixed(2)),
-      timeSpent: r.timeSpent,
-      completedAt: r.completedAt!,
-    }));
-
-    // 掌握情况
-    const subjectStats = await this.performanceAggregator.getSubjectStatistics(
-      userId,
-      timeRange,
-    );
-
-    const masteryLevel = {
-      mastered: subjectStats.filter((s) => s.masteryLevel === 'mastered').length,
-      proficient: subjectStats.filter((s) => s.masteryLevel === 'proficient').length,
-      learning: subjectStats.filter((s) => s.masteryLevel === 'learning').length,
-      struggling: subjectStats.filter((s) => s.masteryLevel === 'struggling').length,
-    };
-
-    const result: StatisticsOverview = {
-      totalExams,
-      totalQuestions,
-      totalCorrect,
-      totalIncorrect,
-      overallAccuracy: parseFloat(overallAccuracy.toFixed(2)),
-      averageTimePerQuestion: parseFloat(averageTimePerQuestion.toFixed(2)),
-      totalTimeSpent,
-      recentExams,
-      masteryLevel,
-    };
-
-    this.setCache(cacheKey, result);
-    return result;
+    const cacheKey = this.cacheKey('overview', timeRange);
+    return this.cached(userId, cacheKey, async () => {
+      // 汇总数据来自统计汇总表，最近练习只取前10条
+      const [summary, recentRecords] = await Promise.all([
+        this.performanceAggregator.getExamSummary(userId, timeRange),
+        this.performanceAggregator.getRecentExamRecords(userId, timeRange, 10),
+      ]);
+
+      // 基础统计
+      const totalExams = summary.examCount;
+      const totalQuestions = summary.questionCount;
+      const totalCorrect = summary.correctCount;
+      const totalIncorrect = summary.incorrectCount;
+      const overallAccuracy =
+        totalQuestions > 0 ? (totalCorrect / totalQuestions) * 100 : 0;
+      const totalTimeSpent = summary.timeSpent;
+      const averageTimePerQuestion =
+        totalQuestions > 0 ? totalTimeSpent / totalQuestions : 0;
+
+      // 最近练习
+      const recentExams = recentRecords.map((r) => ({
+        id: r.id,
+        name: r.examName,
+        accuracy: parseFloat(Number(r.accuracy).toFixed(2)),
+        timeSpent: r.timeSpent,
+        completedAt: r.completedAt!,
+      }));
+
+      // 掌握情况
+      const subjectStats = await this.performanceAggregator.getSubjectStatistics(
+        userId,
+        timeRange,
+      );
+
+      const masteryLevel = {
+        mastered: subjectStats.filter((s) => s.masteryLevel === 'mastered').length,
+        proficient: subjectStats.filter((s) => s.masteryLevel === 'proficient').length,
+        learning: subjectStats.filter((s) => s.masteryLevel === 'learning').length,
+        struggling: subjectStats.filter((s) => s.masteryLevel === 'struggling').length,
+      };
+
+      const result: StatisticsOverview = {
+        totalExams,
+        totalQuestions,
+        totalCorrect,
+        totalIncorrect,
+        overallAccuracy: parseFloat(overallAccuracy.toFixed(2)),
+        averageTimePerQuestion: parseFloat(averageTimePerQuestion.toFixed(2)),
+        totalTimeSpent,
+        recentExams,
+        masteryLevel,
+      };
+
+      return result;
+    });
   }
 
   /**
@@ -150,19 +170,10 @@ export class AnalyticsService {
     userId: string,
     timeRange: TimeRange = TimeRange.MONTH,
   ): Promise<SubjectStatistics[]> {
-    const cacheKey = this.generateCacheKey(userId, 'subjects', { timeRange });
-    const cached = this.getCache<SubjectStatistics[]>(cacheKey);
-    if (cached) {
-      return cached;
-    }
-
-    const result = await this.performanceAggregator.getSubjectStatistics(
-      userId,
-      timeRange,
+    const cacheKey = this.cacheKey('subjects', timeRange);
+    return this.cached(userId, cacheKey, () =>
+      this.performanceAggregator.getSubjectStatistics(userId, timeRange),
     );
-
-    this.setCache(cacheKey, result);
-    return result;
   }
 
   /**
@@ -174,48 +185,41 @@ export class AnalyticsService {
     intervalDays: number = 7,
     subjectId?: string,
   ): Promise<TrendsResponse> {
-    const cacheKey = this.generateCacheKey(userId, 'trends', {
-      timeRange,
-      intervalDays,
-      subjectId,
-    });
-    const cached = this.getCache<TrendsResponse>(cacheKey);
-    if (cached) {
-      return cached;
-    }
-
-    const data = await this.performanceAggregator.getTrendData(
-      userId,
-      timeRange,
-      intervalDays,
-    );
-
-    // 计算趋势摘要
-    const startAccuracy = data.length > 0 ? data[0].accuracy : 0;
-    const endAccuracy = data.length > 0 ? data[data.length - 1].accuracy : 0;
-    const improvement = endAccuracy - startAccuracy;
-
-    let trend: 'improving' | 'stable' | 'declining' = 'stable';
-    if (improvement > 5) {
-      trend = 'improving';
-    } else if (improvement < -5) {
-      trend = 'declining';
-    }
-
-    const result: TrendsResponse = {
-      timeRange,
-      intervalDays,
-      data,
-      summary: {
-        startAccuracy: parseFloat(startAccuracy.toFixed(2)),
-        endAccuracy: parseFloat(endAccuracy.toFixed(2)),
-        improvement: parseFloat(improvement.toFixed(2)),
-        trend,
-      },
-    };
+    const cacheKey = this.cacheKey('trends', timeRange, intervalDays, subjectId ?? '');
+    return this.cached(userId, cacheKey, async () => {
+      const data = await this.performanceAggregator.getTrendData(
+        userId,
+        timeRange,
+        intervalDays,
+      );
+
+      // 计算趋势摘要（补齐的空间隔没有练习，不参与首尾比较）
+      const active = data.filter((point) => point.examCount > 0);
+      const startAccuracy = active.length > 0 ? active[0].accuracy : 0;
+      const endAccuracy = active.length > 0 ? active[active.length - 1].accuracy : 0;
+      const improvement = endAccuracy - startAccuracy;
+
+      let trend: 'improving' | 'stable' | 'declining' = 'stable';
+      if (improvement > 5) {
+        trend = 'improving';
+      } else if (improvement < -5) {
+        trend = 'declining';
+      }
 
-    this.setCache(cacheKey, result);
-    return result;
+      const result: TrendsResponse = {
+        timeRange,
+        intervalDays,
+        data,
+        summary: {
+          startAccuracy: parseFloat(startAccuracy.toFixed(2)),
+          endAccuracy: parseFloat(endAccuracy.toFixed(2)),
+          improvement: parseFloat(improvement.toFixed(2)),
+          trend,
+        },
+      };
+
+      return result;
+    });
   }
 
   /**
@@ -229,56 +233,46 @@ export class AnalyticsService {
     page: number = 1,
     limit: number = 20,
   ): Promise<DetailReportResponse> {
-    const cacheKey = this.generateCacheKey(userId, 'detail', {
-      timeRange,
-      sortBy,
-      sortOrder,
-      page,
-      limit,
-    });
-    const cached = this.getCache<DetailReportResponse>(cacheKey);
-    if (cached) {
-      return cached;
-    }
-
-    const { items, total } = await this.performanceAggregator.getDetailReport(
-      userId,
-      timeRange,
-      sortBy,
-      sortOrder,
-      page,
-      limit,
-    );
-
-    // 计算摘要
-    const avgAccuracy =
-      items.length > 0
-        ? items.reduce((sum, item) => sum + item.accuracy, 0) / items.length
-        : 0;
-    const avgTimeSpent =
-      items.length > 0
-        ? items.reduce((sum, item) => sum + item.timeSpent, 0) / items.length
-        : 0;
-
-    const sortedByAccuracy = [...items].sort((a, b) => b.accuracy - a.accuracy);
-    const bestExam = sortedByAccuracy[0];
-    const worstExam = sortedByAccuracy[sortedByAccuracy.length - 1];
-
-    const result: DetailReportResponse = {
-      items,
-      total,
-      page,
-      limit,
-      summary: {
-        averageAccuracy: parseFloat(avgAccuracy.toFixed(2)),
-        averageTimeSpent: parseFloat(avgTimeSpent.toFixed(2)),
-        bestExam,
-        worstExam,
-      },
-    };
-
-    this.setCache(cacheKey, result, 60); // 详细报告缓存1分钟
-    return result;
+    const cacheKey = this.cacheKey('detail', timeRange, sortBy, sortOrder, page, limit);
+    return this.cached(userId, cacheKey, async () => {
+      const { items, total } = await this.performanceAggregator.getDetailReport(
+        userId,
+        timeRange,
+        sortBy,
+        sortOrder,
+        page,
+        limit,
+      );
+
+      // 计算摘要
+      const avgAccuracy =
+        items.length > 0
+          ? items.reduce((sum, item) => sum + item.accuracy, 0) / items.length
+          : 0;
+      const avgTimeSpent =
+        items.length > 0
+          ? items.reduce((sum, item) => sum + item.timeSpent, 0) / items.length
+          : 0;
+
+      const sortedByAccuracy = [...items].sort((a, b) => b.accuracy - a.accuracy);
+      const bestExam = sortedByAccuracy[0];
+      const worstExam = sortedByAccuracy[sortedByAccuracy.length - 1];
+
+      const result: DetailReportResponse = {
+        items,
+        total,
+        page,
+        limit,
+        summary: {
+          averageAccuracy: parseFloat(avgAccuracy.toFixed(2)),
+          averageTimeSpent: parseFloat(avgTimeSpent.toFixed(2)),
+          bestExam,
+          worstExam,
+        },
+      };
+
+      return result;
+    }, 60); // 详细报告缓存1分钟
   }
 
   /**
@@ -288,18 +282,12 @@ export class AnalyticsService {
     userId: string,
     timeRange: TimeRange = TimeRange.MONTH,
   ): Promise<StudyAdviceResponse> {
-    const cacheKey = this.generateCacheKey(userId, 'advice', { timeRange });
-    const cached = this.getCache<StudyAdviceResponse>(cacheKey);
-    if (cached) {
-      return cached;
-    }
-
-    const result = await this.performanceAggregator.generateStudyAdvice(
+    const cacheKey = this.cacheKey('advice', timeRange);
+    return this.cached(
       userId,
-      timeRange,
+      cacheKey,
+      () => this.performanceAggregator.generateStudyAdvice(userId, timeRange),
+      600, // 建议缓存10分钟
     );
-
-    this.setCache(cacheKey, result, 600); // 建议缓存10分钟
-    return result;
   }
 }
@@ -4,6 +4,7 @@ import { Repository, In, Between } from 'typeorm';
 import { ExamRecord } from '../practice/entities/exam-record.entity';
 import { ExamAnswer } from '../practice/entities/exam-answer.entity';
 import { Mistake } from '../mistake/entities/mistake.entity';
+import { StatsRollupService, ExamSummary } from '../statistics/stats-rollup.service';
 import {
   TimeRange,
   SubjectStatistics,
@@ -25,6 +26,7 @@ export class PerformanceAggregator {
     private examAnswerRepository: Repository<ExamAnswer>,
     @InjectRepository(Mistake)
     private mistakeRepository: Repository<Mistake>,
+    private statsRollupService: StatsRollupService,
   ) {}
 
   /**
@@ -90,6 +92,36 @@ export class PerformanceAggregator {
     return queryBuilder.orderBy('record.completedAt', 'DESC').getMany();
   }
 
+  /**
+   * 获取最近的已完成练习记录
+   */
+  async getRecentExamRecords(
+    userId: string,
+    timeRange?: TimeRange,
+    limit: number = 10,
+  ): Promise<ExamRecord[]> {
+    const queryBuilder = this.examRecordRepository
+      .createQueryBuilder('record')
+      .where('record.userId = :userId', { userId })
+      .andWhere('record.status = :status', { status: 'completed' });
+
+    if (timeRange) {
+      const { start, end } = this.getDateRange(timeRange);
+      queryBuilder.andWhere('record.completedAt BETWEEN :start AND :end', { start, end });
+    }
+
+    return queryBuilder.orderBy('record.completedAt', 'DESC').limit(limit).getMany();
+  }
+
+  /**
+   * 获取练习汇总（读取统计汇总表）
+   */
+  async getExamSummary(userId: string, timeRange?: TimeRange): Promise<ExamSummary> {
+    const dateRange =
+      timeRange && timeRange !== TimeRange.ALL ? this.getDateRange(timeRange) : undefined;
+    return this.statsRollupService.getExamSummary(userId, dateRange);
+  }
+
   /**
    * 获取科目统计数据
    */
@@ -205,58 +237,74 @@ export class PerformanceAggregator {
     intervalDays: number = 7,
   ): Promise<TrendDataPoint[]> {
     const { start, end } = this.getDateRange(timeRange);
-
-    // 计算时间间隔
     const intervalMs = intervalDays * 24 * 60 * 60 * 1000;
-    const intervals: { start: Date; end: Date }[] = [];
-
-    let currentStart = new Date(start);
-    while (currentStart < end) {
-      const currentEnd = new Date(
-        Math.min(currentStart.getTime() + intervalMs, end.getTime()),
-      );
-      intervals.push({ start: new Date(currentStart), end: new Date(currentEnd) });
-      currentStart = new Date(currentEnd);
+    const lastBucket = Math.max(0, Math.ceil((end.getTime() - start.getTime()) / intervalMs) - 1);
+
+    // 一次分组聚合，按间隔编号汇总各列
+    const rows: Array<{
+      bucket: string;
+      examCount: string;
+      totalQuestions: string;
+      totalCorrect: string;
+      totalTimeSpent: string;
+    }> = await this.examRecordRepository
+      .createQueryBuilder('record')
+      .select(
+        'FLOOR(TIMESTAMPDIFF(SECOND, :start, record.completedAt) / :intervalSeconds)',
+        'bucket',
+      )
+      .addSelect('COUNT(*)', 'examCount')
+      .addSelect('SUM(record.questionCount)', 'totalQuestions')
+      .addSelect('SUM(record.correctCount)', 'totalCorrect')
+      .addSelect('SUM(record.timeSpent)', 'totalTimeSpent')
+      .where('record.userId = :userId', { userId })
+      .andWhere('record.status = :status', { status: 'completed' })
+      .andWhere('record.completedAt BETWEEN :start AND :end', { start, end })
+      .setParameter('intervalSeconds', intervalMs / 1000)
+      .groupBy('bucket')
+      .getRawMany();
+
+    // 在内存中把各组放回对应的时间间隔（最后一个间隔包含结束时间点）
+    const buckets = new Map<
+      number,
+      { examCount: number; totalQuestions: number; totalCorrect: number; totalTimeSpent: number }
+    >();
+    for (const row of rows) {
+      const bucket = Math.min(Number(row.bucket), lastBucket);
+      const stats = buckets.get(bucket) || {
+        examCount: 0,
+        totalQuestions: 0,
+        totalCorrect: 0,
+        totalTimeSpent: 0,
+      };
+      stats.examCount += Number(row.examCount) || 0;
+      stats.totalQuestions += Number(row.totalQuestions) || 0;
+      stats.totalCorrect += Number(row.totalCorrect) || 0;
+      stats.totalTimeSpent += Number(row.totalTimeSpent) || 0;
+      buckets.set(bucket, stats);
     }
 
-    // 为每个间隔获取数据
+    // 补齐没有记录的间隔，保证各间隔连续、横轴对齐；
+    // 全部时间范围的起点是 1970 年，从第一条记录所在的间隔开始
+    const firstBucket =
+      timeRange === TimeRange.ALL ? Math.min(...buckets.keys(), lastBucket + 1) : 0;
     const trendData: TrendDataPoint[] = [];
 
-    for (const interval of intervals) {
-      const records = await this.examRecordRepository
-        .createQueryBuilder('record')
-        .where('record.userId = :userId', { userId })
-        .andWhere('record.status = :status', { status: 'completed' })
-        .andWhere('record.completedAt BETWEEN :start AND :end', {
-          start: interval.start,
-          end: interval.end,
-        })
-        .getMany();
-
-      if (records.length === 0) {
-        continue;
-      }
-
-      const totalQuestions = records.reduce(
-        (sum, r) => sum + r.questionCount,
-        0,
-      );
-      const totalCorrect = records.reduce(
-        (sum, r) => sum + r.correctCount,
-        0,
-      );
-      const totalTimeSpent = records.reduce(
-        (sum, r) => sum + r.timeSpent,
-        0,
-      );
+    for (let bucket = firstBucket; bucket <= lastBucket; bucket++) {
+      const { examCount, totalQuestions, totalCorrect, totalTimeSpent } = buckets.get(bucket) || {
+        examCount: 0,
+        totalQuestions: 0,
+        totalCorrect: 0,
+        totalTimeSpent: 0,
+      };
       const accuracy =
         totalQuestions > 0 ? (totalCorrect / totalQuestions) * 100 : 0;
       const avgTime =
         totalQuestions > 0 ? totalTimeSpent / totalQuestions : 0;
 
       trendData.push({
-        date: interval.start,
-        examCount: records.length,
+        date: new Date(start.getTime() + bucket * intervalMs),
+        examCount,
         totalQuestions,
         accuracy: parseFloat(accuracy.toFixed(2)),
         averageTimePerQuestion: parseFloat(avgTime.toFixed(2)),
@@ -277,53 +325,44 @@ export class PerformanceAggregator {
     page: number = 1,
     limit: number = 20,
   ): Promise<{ items: DetailReportItem[]; total: number }> {
-    const records = await this.getUserExamRecords(userId, timeRange);
-
-    // 排序
-    const sortedRecords = [...records].sort((a, b) => {
-      let comparison = 0;
-
-      switch (sortBy) {
-        case 'accuracy':
-          comparison = a.accuracy - b.accuracy;
-          break;
-        case 'timeSpent':
-          comparison = a.timeSpent - b.timeSpent;
-          break;
-        case 'questionCount':
-          comparison = a.questionCount - b.questionCount;
-          break;
-        case 'date':
-        default:
-          comparison =
-            a.completedAt!.getTime() - b.completedAt!.getTime();
-          break;
-      }
+    const { start, end } = this.getDateRange(timeRange);
 
-      return sortOrder === 'asc' ? comparison : -comparison;
-    });
+    const sortColumns: Record<string, string> = {
+      accuracy: 'record.accuracy',
+      timeSpent: 'record.timeSpent',
+      questionCount: 'record.questionCount',
+      date: 'record.completedAt',
+    };
+    const direction = sortOrder === 'asc' ? 'ASC' : 'DESC';
 
-    // 分页
-    const total = sortedRecords.length;
-    const startIndex = (page - 1) * limit;
-    const paginatedRecords = sortedRecords.slice(
-      startIndex,
-      startIndex + limit,
-    );
+    // 排序和分页在数据库完成，试卷和科目通过关联一次取回
+    const [records, total] = await this.examRecordRepository
+      .createQueryBuilder('record')
+      .leftJoin('record.exam', 'exam')
+      .leftJoin('exam.subject', 'subject')
+      .addSelect(['exam.id', 'exam.subjectId', 'subject.id', 'subject.name'])
+      .where('record.userId = :userId', { userId })
+      .andWhere('record.status = :status', { status: 'completed' })
+      .andWhere('record.completedAt BETWEEN :start AND :end', { start, end })
+      .orderBy(sortColumns[sortBy] || sortColumns.date, direction)
+      .addOrderBy('record.id', direction)
+      // 关联均为多对一，不会放大行数，可直接用 OFFSET/LIMIT
+      .offset((page - 1) * limit)
+      .limit(limit)
+      .getManyAndCount();
 
-    // 获取科目名称
     const items: DetailReportItem[] = [];
 
-    for (const record of paginatedRecords) {
-      const subjectId = await this.getExamSubjectId(record.examId);
+    for (const record of records) {
+      const subjectId = record.exam?.subjectId || 'general';
       items.push({
         examRecordId: record.id,
         examName: record.examName,
         subjectId,
-        subjectName: await this.getSubjectName(subjectId),
+        subjectName: record.exam?.subject?.name || (await this.getSubjectName(subjectId)),
         questionCount: record.questionCount,
         correctCount: record.correctCount,
-        accuracy: parseFloat(record.accuracy.toFixed(2)),
+        accuracy: parseFloat(Number(record.accuracy).toFixed(2)),
         timeSpent: record.timeSpent,
         completedAt: record.completedAt!,
       });
@@ -529,29 +568,4 @@ export class PerformanceAggregator {
 
     return subjectNames[subjectId] || subjectId;
   }
-
-  /**
-   * 获取试卷的主要科目ID
-   */
-  private async getExamSubjectId(examId: string): Promise<string> {
-    const exam = await this.examRecordRepository
-      .createQueryBuilder('record')
-      .leftJoin('record.exam', 'exam')
-      .where('record.examId = :examId', { examId })
-      .getOne();
-
-    if (exam?.exam?.filterConfig) {
-      // filterConfig 已经是解析后的对象
-      const config = exam.exam.filterConfig;
-      if (config.knowledgePoints && config.knowledgePoints.length > 0) {
-        // 尝试从 knowledgePoint 提取 subjectId
-        const subjectId = config.knowledgePoints[0]?.split(':')[0];
-        if (subjectId) {
-          return subjectId;
-        }
-      }
-    }
-
-    return 'general';
-  }
 }
@@ -1,10 +1,11 @@
 import { Module, Global } from '@nestjs/common';
 import { CacheService } from './cache.service';
+import { LockService } from './lock.service';
 
 @Global()
 @Module({
   imports: [],
-  providers: [CacheService],
-  exports: [CacheService],
+  providers: [CacheService, LockService],
+  exports: [CacheService, LockService],
 })
 export class AppCacheModule {}
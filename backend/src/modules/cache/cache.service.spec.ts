@@ -0,0 +1,128 @@
+import { CacheService } from './cache.service';
+import { LruCache } from './lru-cache';
+import { SingleFlight } from './single-flight';
+
+describe('LruCache', () => {
+  it('should evict the least recently used entry when full', () => {
+    const evicted: string[] = [];
+    const cache = new LruCache<number>(2, (key) => evicted.push(key));
+
+    cache.set('a', 1);
+    cache.set('b', 2);
+    cache.get('a'); // a 变为最近使用
+    cache.set('c', 3);
+
+    expect(cache.get('b')).toBeUndefined();
+    expect(cache.get('a')).toBe(1);
+    expect(cache.get('c')).toBe(3);
+    expect(evicted).toEqual(['b']);
+  });
+
+  it('should expire entries after ttl', () => {
+    jest.useFakeTimers().setSystemTime(new Date('2024-01-01T00:00:00Z'));
+    const cache = new LruCache<string>(10);
+
+    cache.set('key', 'value', 1);
+    jest.setSystemTime(new Date('2024-01-01T00:00:02Z'));
+
+    expect(cache.get('key')).toBeUndefined();
+    jest.useRealTimers();
+  });
+});
+
+describe('SingleFlight', () => {
+  it('should share one call between concurrent callers', async () => {
+    const flight = new SingleFlight<number>();
+    const fn = jest.fn().mockResolvedValue(42);
+
+    const results = await Promise.all([flight.do('k', fn), flight.do('k', fn), flight.do('k', fn)]);
+
+    expect(results).toEqual([42, 42, 42]);
+    expect(fn).toHaveBeenCalledTimes(1);
+    expect(flight.shared).toBe(2);
+    expect(flight.has('k')).toBe(false);
+  });
+
+  it('should propagate errors and allow retry', async () => {
+    const flight = new SingleFlight<number>();
+
+    await expect(flight.do('k', () => Promise.reject(new Error('boom')))).rejects.toThrow('boom');
+    await expect(flight.do('k', async () => 1)).resolves.toBe(1);
+  });
+});
+
+describe('CacheService (L1 only)', () => {
+  let service: CacheService;
+
+  beforeEach(() => {
+    service = new CacheService();
+  });
+
+  it('should invalidate entries by tag', async () => {
+    await service.set('analytics:u1:overview', { total: 1 }, 60, { tags: ['user:u1'] });
+    await service.set('analytics:u2:overview', { total: 2 }, 60, { tags: ['user:u2'] });
+
+    await service.invalidateTags(['user:u1']);
+
+    expect(await service.get('analytics:u1:overview')).toBeUndefined();
+    expect(await service.get('analytics:u2:overview')).toEqual({ total: 2 });
+  });
+
+  it('should invalidate entries by prefix', async () => {
+    await service.set('mistake:list:u1:1', [1]);
+    await service.set('mistake:list:u1:2', [2]);
+    await service.set('mistake:1', { id: '1' });
+
+    await service.invalidatePrefix('mistake:list:u1:');
+
+    expect(await service.get('mistake:list:u1:1')).toBeUndefined();
+    expect(await service.get('mistake:list:u1:2')).toBeUndefined();
+    expect(await service.get('mistake:1')).toEqual({ id: '1' });
+  });
+
+  it('should delete many keys at once', async () => {
+    await service.set('mistake:1', { id: '1' });
+    await service.set('mistake:2', { id: '2' });
+    await service.set('mistake:3', { id: '3' });
+
+    await service.delMany(['mistake:1', 'mistake:2']);
+
+    expect(await service.get('mistake:1')).toBeUndefined();
+    expect(await service.get('mistake:2')).toBeUndefined();
+    expect(await service.get('mistake:3')).toEqual({ id: '3' });
+  });
+
+  it('should track hits and misses', async () => {
+    await service.wrap('key', async () => 'value');
+    await service.wrap('key', async () => 'value');
+
+    const stats = service.getStats();
+    expect(stats.l1Hits).toBe(1);
+    expect(stats.misses).toBe(1);
+    expect(stats.l1Size).toBe(1);
+  });
+
+  it('should coalesce concurrent misses in wrap', async () => {
+    const loader = jest.fn().mockResolvedValue('value');
+
+    await Promise.all([service.wrap('key', loader, 60), service.wrap('key', loader, 60)]);
+
+    expect(loader).toHaveBeenCalledTimes(1);
+    expect(service.getStats().coalesced).toBe(1);
+  });
+
+  it('should serve stale values while refreshing in the background', async () => {
+    jest.useFakeTimers().setSystemTime(new Date('2024-01-01T00:00:00Z'));
+    await service.set('key', 'old', 1, { staleTtl: 60 });
+    jest.setSystemTime(new Date('2024-01-01T00:00:05Z'));
+
+    const loader = jest.fn().mockResolvedValue('new');
+    expect(await service.wrap('key', loader, 1, { staleTtl: 60 })).toBe('old');
+    for (let i = 0; i < 10; i++) await Promise.resolve(); // 等待后台刷新完成
+
+    expect(loader).toHaveBeenCalledTimes(1);
+    expect(await service.get('key')).toBe('new');
+    expect(service.getStats().staleHits).toBe(1);
+    jest.useRealTimers();
+  });
+});
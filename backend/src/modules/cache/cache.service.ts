@@ -1,38 +1,405 @@
-import { Injectable, Logger } from '@nestjs/common';
+import { Injectable, Logger, Inject, Optional, OnModuleInit, OnModuleDestroy } from '@nestjs/common';
+import type { Redis } from 'ioredis';
+import { LruCache, LruLookup } from './lru-cache';
+import { SingleFlight } from './single-flight';
 
+/**
+ * Redis 键前缀
+ */
+const KEY_PREFIX = 'cache:';
+const TAG_PREFIX = 'cache:tag:';
+const INVALIDATION_CHANNEL = 'cache:invalidate';
+const SCAN_BATCH_SIZE = 500;
+
+const DEFAULT_L1_MAX_ENTRIES = 5000;
+
+/**
+ * 缓存写入选项
+ */
+export interface CacheSetOptions {
+  tags?: string[];
+  staleTtl?: number; // 过期后仍可返回旧值的秒数，期间由一次后台刷新更新
+}
+
+/**
+ * Redis 中保存的缓存信封
+ */
+interface CacheEnvelope {
+  v: any;
+  s?: number; // 过期（可刷新）时间戳（毫秒）
+  e?: number; // 彻底失效时间戳（毫秒）
+  t?: string[]; // 标签
+}
+
+/**
+ * 跨进程失效消息
+ */
+interface InvalidationMessage {
+  origin: string;
+  keys?: string[];
+  tags?: string[];
+  prefixes?: string[];
+}
+
+/**
+ * 缓存统计
+ */
+export interface CacheStats {
+  l1Hits: number;
+  l2Hits: number;
+  staleHits: number;
+  misses: number;
+  coalesced: number;
+  sets: number;
+  evictions: number;
+  invalidations: number;
+  l1Size: number;
+  hitRate: number;
+}
+
+/**
+ * 两级缓存服务
+ * L1：进程内有界 LRU；L2：Redis（可选，未配置时退化为纯 L1）
+ * 支持按标签/前缀失效，并通过 Redis pub/sub 广播到所有 PM2 工作进程
+ */
 @Injectable()
-export class CacheService {
+export class CacheService implements OnModuleInit, OnModuleDestroy {
   private readonly logger = new Logger(CacheService.name);
-  private cache = new Map<string, { value: any; expiry?: number }>();
+  private readonly instanceId = `${process.pid}-${Math.random().toString(36).substr(2, 9)}`;
+  private readonly l1: LruCache<any>;
+  private readonly tagIndex = new Map<string, Set<string>>();
+  private readonly keyTags = new Map<string, string[]>();
+  private readonly inflight = new SingleFlight<any>();
+  private subscriber: Redis | null = null;
+
+  private readonly stats = {
+    l1Hits: 0,
+    l2Hits: 0,
+    staleHits: 0,
+    misses: 0,
+    sets: 0,
+    evictions: 0,
+    invalidations: 0,
+  };
+
+  constructor(
+    @Optional() @Inject('REDIS_CLIENT') private readonly redis?: Redis,
+  ) {
+    const maxEntries = parseInt(process.env.CACHE_L1_MAX_ENTRIES, 10) || DEFAULT_L1_MAX_ENTRIES;
+    this.l1 = new LruCache<any>(maxEntries, (key) => {
+      this.stats.evictions++;
+      this.untrackKey(key);
+    });
+  }
+
+  async onModuleInit() {
+    if (!this.redis) {
+      this.logger.warn('REDIS_CLIENT 未配置，缓存仅使用进程内 L1');
+      return;
+    }
+
+    try {
+      this.subscriber = this.redis.duplicate();
+      this.subscriber.on('message', (channel: string, message: string) => {
+        if (channel === INVALIDATION_CHANNEL) {
+          this.handleInvalidationMessage(message);
+        }
+      });
+      await this.subscriber.subscribe(INVALIDATION_CHANNEL);
+    } catch (error) {
+      this.logger.warn(`订阅缓存失效频道失败: ${error.message}`);
+    }
+  }
+
+  async onModuleDestroy() {
+    if (this.subscriber) {
+      await this.subscriber.quit().catch(() => undefined);
+      this.subscriber = null;
+    }
+  }
 
   async get<T>(key: string): Promise<T | undefined> {
-    const item = this.cache.get(key);
-    if (!item) return undefined;
-    
-    if (item.expiry && Date.now() > item.expiry) {
-      this.cache.delete(key);
+    const found = await this.lookup<T>(key);
+    if (found?.stale) {
+      this.stats.misses++;
       return undefined;
     }
-    
-    return item.value as T;
+    return found?.value;
   }
 
-  async set(key: string, value: any, ttl?: number): Promise<void> {
-    const expiry = ttl ? Date.now() + ttl * 1000 : undefined;
-    this.cache.set(key, { value, expiry });
+  async set(key: string, value: any, ttl?: number, options: CacheSetOptions = {}): Promise<void> {
+    const tags = options.tags?.length ? options.tags : undefined;
+    const staleTtl = ttl ? options.staleTtl || 0 : 0;
+    this.stats.sets++;
+    this.setL1(key, value, ttl, staleTtl, tags);
+
+    if (!this.redis) return;
+
+    const now = Date.now();
+    const envelope: CacheEnvelope = {
+      v: value,
+      s: ttl ? now + ttl * 1000 : undefined,
+      e: ttl ? now + (ttl + staleTtl) * 1000 : undefined,
+      t: tags,
+    };
+    const redisTtl = ttl ? ttl + staleTtl : undefined;
+
+    try {
+      const pipeline = this.redis.pipeline();
+      if (redisTtl) {
+        pipeline.set(KEY_PREFIX + key, JSON.stringify(envelope), 'EX', redisTtl);
+      } else {
+        pipeline.set(KEY_PREFIX + key, JSON.stringify(envelope));
+      }
+      for (const tag of tags || []) {
+        pipeline.sadd(TAG_PREFIX + tag, key);
+        if (redisTtl) {
+          // 标签集合的过期时间不短于其中最长的键
+          pipeline.expire(TAG_PREFIX + tag, redisTtl, 'NX');
+          pipeline.expire(TAG_PREFIX + tag, redisTtl, 'GT');
+        }
+      }
+      await pipeline.exec();
+    } catch (error) {
+      this.logger.warn(`写入 Redis 缓存失败 ${key}: ${error.message}`);
+    }
   }
 
   async del(key: string): Promise<void> {
-    this.cache.delete(key);
+    this.dropLocalKey(key);
+
+    if (!this.redis) return;
+
+    try {
+      await this.redis.del(KEY_PREFIX + key);
+      await this.publish({ keys: [key] });
+    } catch (error) {
+      this.logger.warn(`删除 Redis 缓存失败 ${key}: ${error.message}`);
+    }
+  }
+
+  /**
+   * 批量删除（一次 UNLINK 和一次广播）
+   */
+  async delMany(keys: string[]): Promise<void> {
+    if (keys.length === 0) return;
+    keys.forEach((key) => this.dropLocalKey(key));
+
+    if (!this.redis) return;
+
+    try {
+      await this.unlinkInBatches(keys.map((key) => KEY_PREFIX + key));
+      await this.publish({ keys });
+    } catch (error) {
+      this.logger.warn(`批量删除 Redis 缓存失败 (${keys.length} 个键): ${error.message}`);
+    }
+  }
+
+  /**
+   * 按标签失效（所有工作进程）
+   */
+  async invalidateTags(tags: string[]): Promise<void> {
+    if (tags.length === 0) return;
+    this.stats.invalidations++;
+    this.dropLocalTags(tags);
+
+    if (!this.redis) return;
+
+    try {
+      const members = await Promise.all(tags.map((tag) => this.redis.smembers(TAG_PREFIX + tag)));
+      const keys = [...new Set(members.flat())].map((key) => KEY_PREFIX + key);
+      await this.unlinkInBatches([...keys, ...tags.map((tag) => TAG_PREFIX + tag)]);
+      await this.publish({ tags });
+    } catch (error) {
+      this.logger.warn(`按标签失效缓存失败 [${tags.join(', ')}]: ${error.message}`);
+    }
+  }
+
+  /**
+   * 按前缀失效（所有工作进程）
+   */
+  async invalidatePrefix(prefix: string): Promise<void> {
+    this.stats.invalidations++;
+    this.dropLocalPrefix(prefix);
+
+    if (!this.redis) return;
+
+    try {
+      const pattern = `${KEY_PREFIX}${prefix.replace(/[*?[\]\\]/g, '\\$&')}*`;
+      let cursor = '0';
+      do {
+        const [next, keys] = await this.redis.scan(cursor, 'MATCH', pattern, 'COUNT', SCAN_BATCH_SIZE);
+        cursor = next;
+        await this.unlinkInBatches(keys);
+      } while (cursor !== '0');
+      await this.publish({ prefixes: [prefix] });
+    } catch (error) {
+      this.logger.warn(`按前缀失效缓存失败 ${prefix}: ${error.message}`);
+    }
   }
 
-  async wrap<T>(key: string, fn: () => Promise<T>, ttl?: number): Promise<T> {
-    const cached = await this.get<T>(key);
-    if (cached !== undefined) {
-      return cached;
+  /**
+   * 读取缓存，未命中时执行 fn 并写入
+   * 同一键的并发未命中共享一次 fn 调用；设置 staleTtl 时过期值会先返回，并在后台刷新一次
+   */
+  async wrap<T>(key: string, fn: () => Promise<T>, ttl?: number, options: CacheSetOptions = {}): Promise<T> {
+    const found = await this.lookup<T>(key);
+    if (found && !found.stale) {
+      return found.value;
+    }
+
+    const load = () =>
+      this.inflight.do(key, async () => {
+        const result = await fn();
+        await this.set(key, result, ttl, options);
+        return result;
+      }) as Promise<T>;
+
+    if (found) {
+      this.stats.staleHits++;
+      if (!this.inflight.has(key)) {
+        load().catch((error) => this.logger.warn(`后台刷新缓存失败 ${key}: ${error.message}`));
+      }
+      return found.value;
+    }
+
+    return load();
+  }
+
+  /**
+   * 获取命中/未命中/淘汰统计
+   */
+  getStats(): CacheStats {
+    const hits = this.stats.l1Hits + this.stats.l2Hits;
+    const lookups = hits + this.stats.misses;
+    return {
+      ...this.stats,
+      coalesced: this.inflight.shared,
+      l1Size: this.l1.size,
+      hitRate: lookups > 0 ? parseFloat(((hits / lookups) * 100).toFixed(2)) : 0,
+    };
+  }
+
+  private async lookup<T>(key: string): Promise<LruLookup<T> | undefined> {
+    const local = this.l1.lookup(key);
+    if (local !== undefined) {
+      if (!local.stale) this.stats.l1Hits++;
+      return local;
+    }
+    this.untrackKey(key);
+
+    const envelope = await this.readL2(key);
+    if (envelope) {
+      const now = Date.now();
+      if (envelope.s !== undefined && now > envelope.s) {
+        return { value: envelope.v, stale: true };
+      }
+
+      this.stats.l2Hits++;
+      const ttl = envelope.s ? Math.max(1, Math.ceil((envelope.s - now) / 1000)) : undefined;
+      const staleTtl = envelope.s && envelope.e ? Math.ceil((envelope.e - envelope.s) / 1000) : 0;
+      this.setL1(key, envelope.v, ttl, staleTtl, envelope.t);
+      return { value: envelope.v, stale: false };
+    }
+
+    this.stats.misses++;
+    return undefined;
+  }
+
+  private async readL2(key: string): Promise<CacheEnvelope | null> {
+    if (!this.redis) return null;
+
+    try {
+      const raw = await this.redis.get(KEY_PREFIX + key);
+      if (!raw) return null;
+
+      const envelope = JSON.parse(raw) as CacheEnvelope;
+      if (envelope.e && Date.now() > envelope.e) return null;
+      return envelope;
+    } catch (error) {
+      this.logger.warn(`读取 Redis 缓存失败 ${key}: ${error.message}`);
+      return null;
+    }
+  }
+
+  private setL1(key: string, value: any, ttl?: number, staleTtl = 0, tags?: string[]): void {
+    this.untrackKey(key);
+    this.l1.set(key, value, ttl, staleTtl);
+
+    if (tags) {
+      this.keyTags.set(key, tags);
+      for (const tag of tags) {
+        let keys = this.tagIndex.get(tag);
+        if (!keys) {
+          keys = new Set();
+          this.tagIndex.set(tag, keys);
+        }
+        keys.add(key);
+      }
+    }
+  }
+
+  private untrackKey(key: string): void {
+    const tags = this.keyTags.get(key);
+    if (!tags) return;
+
+    this.keyTags.delete(key);
+    for (const tag of tags) {
+      const keys = this.tagIndex.get(tag);
+      if (!keys) continue;
+      keys.delete(key);
+      if (keys.size === 0) {
+        this.tagIndex.delete(tag);
+      }
+    }
+  }
+
+  private dropLocalKey(key: string): void {
+    this.l1.delete(key);
+    this.untrackKey(key);
+  }
+
+  private dropLocalTags(tags: string[]): void {
+    for (const tag of tags) {
+      const keys = this.tagIndex.get(tag);
+      if (!keys) continue;
+      for (const key of [...keys]) {
+        this.dropLocalKey(key);
+      }
+    }
+  }
+
+  private dropLocalPrefix(prefix: string): void {
+    for (const key of [...this.l1.keys()]) {
+      if (key.startsWith(prefix)) {
+        this.dropLocalKey(key);
+      }
+    }
+  }
+
+  private async unlinkInBatches(keys: string[]): Promise<void> {
+    for (let i = 0; i < keys.length; i += SCAN_BATCH_SIZE) {
+      await this.redis.unlink(...keys.slice(i, i + SCAN_BATCH_SIZE));
+    }
+  }
+
+  private async publish(message: Omit<InvalidationMessage, 'origin'>): Promise<void> {
+    await this.redis.publish(
+      INVALIDATION_CHANNEL,
+      JSON.stringify({ ...message, origin: this.instanceId }),
+    );
+  }
+
+  private handleInvalidationMessage(raw: string): void {
+    try {
+      const message = JSON.parse(raw) as InvalidationMessage;
+      if (message.origin === this.instanceId) return;
+
+      message.keys?.forEach((key) => this.dropLocalKey(key));
+      if (message.tags) this.dropLocalTags(message.tags);
+      message.prefixes?.forEach((prefix) => this.dropLocalPrefix(prefix));
+    } catch (error) {
+      this.logger.warn(`无法解析缓存失效消息: ${error.message}`);
     }
-    const result = await fn();
-    await this.set(key, result, ttl);
-    return result;
   }
 }
@@ -0,0 +1,93 @@
+import { Injectable, Logger, Inject, Optional } from '@nestjs/common';
+import type { Redis } from 'ioredis';
+
+const LOCK_PREFIX = 'lock:';
+
+// 仅当令牌匹配时才续期/释放，避免误操作其他节点持有的锁
+const RENEW_SCRIPT = `
+if redis.call('get', KEYS[1]) == ARGV[1] then
+  return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0`;
+
+const RELEASE_SCRIPT = `
+if redis.call('get', KEYS[1]) == ARGV[1] then
+  return redis.call('del', KEYS[1])
+end
+return 0`;
+
+/**
+ * 分布式租约锁
+ * 基于 Redis SET NX PX；未配置 Redis 时退化为进程内锁（单节点部署）
+ */
+@Injectable()
+export class LockService {
+  private readonly logger = new Logger(LockService.name);
+  private readonly localLocks = new Map<string, { token: string; expiresAt: number }>();
+
+  constructor(
+    @Optional() @Inject('REDIS_CLIENT') private readonly redis?: Redis,
+  ) {}
+
+  /**
+   * 尝试获取租约，成功返回令牌，否则返回 null
+   */
+  async acquire(name: string, ttlMs: number): Promise<string | null> {
+    const token = `${process.pid}-${Date.now()}-${Math.random().toString(36).substr(2, 9)}`;
+
+    if (!this.redis) {
+      const held = this.localLocks.get(name);
+      if (held && held.expiresAt > Date.now()) {
+        return null;
+      }
+      this.localLocks.set(name, { token, expiresAt: Date.now() + ttlMs });
+      return token;
+    }
+
+    try {
+      const result = await this.redis.set(LOCK_PREFIX + name, token, 'PX', ttlMs, 'NX');
+      return result === 'OK' ? token : null;
+    } catch (error) {
+      this.logger.warn(`获取锁失败 ${name}: ${error.message}`);
+      return null;
+    }
+  }
+
+  /**
+   * 续期租约，返回是否仍持有
+   */
+  async renew(name: string, token: string, ttlMs: number): Promise<boolean> {
+    if (!this.redis) {
+      const held = this.localLocks.get(name);
+      if (!held || held.token !== token) return false;
+      held.expiresAt = Date.now() + ttlMs;
+      return true;
+    }
+
+    try {
+      const result = await this.redis.eval(RENEW_SCRIPT, 1, LOCK_PREFIX + name, token, ttlMs);
+      return result === 1;
+    } catch (error) {
+      this.logger.warn(`续期锁失败 ${name}: ${error.message}`);
+      return false;
+    }
+  }
+
+  /**
+   * 释放租约
+   */
+  async release(name: string, token: string): Promise<void> {
+    if (!this.redis) {
+      if (this.localLocks.get(name)?.token === token) {
+        this.localLocks.delete(name);
+      }
+      return;
+    }
+
+    try {
+      await this.redis.eval(RELEASE_SCRIPT, 1, LOCK_PREFIX + name, token);
+    } catch (error) {
+      this.logger.warn(`释放锁失败 ${name}: ${error.message}`);
+    }
+  }
+}
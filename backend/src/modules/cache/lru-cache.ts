@@ -0,0 +1,92 @@
+/**
+ * LRU 缓存条目
+ */
+interface LruEntry<V> {
+  value: V;
+  staleAt?: number; // 超过该时间视为过期但仍可返回（stale-while-revalidate）
+  expiresAt?: number; // 超过该时间彻底删除
+}
+
+/**
+ * 查找结果
+ */
+export interface LruLookup<V> {
+  value: V;
+  stale: boolean;
+}
+
+/**
+ * 有界 LRU 缓存
+ * 利用 Map 的插入顺序实现 O(1) 的读取、写入和淘汰
+ */
+export class LruCache<V = any> {
+  private readonly entries = new Map<string, LruEntry<V>>();
+
+  constructor(
+    private readonly maxEntries: number,
+    private readonly onEvict?: (key: string, value: V) => void,
+  ) {}
+
+  get size(): number {
+    return this.entries.size;
+  }
+
+  /**
+   * 读取缓存，命中时刷新为最近使用
+   */
+  get(key: string): V | undefined {
+    const found = this.lookup(key);
+    return found && !found.stale ? found.value : undefined;
+  }
+
+  /**
+   * 读取缓存并返回是否已过期（过期但仍在宽限期内的条目也会返回）
+   */
+  lookup(key: string): LruLookup<V> | undefined {
+    const entry = this.entries.get(key);
+    if (!entry) return undefined;
+
+    const now = Date.now();
+    if (entry.expiresAt && now > entry.expiresAt) {
+      this.entries.delete(key);
+      return undefined;
+    }
+
+    this.entries.delete(key);
+    this.entries.set(key, entry);
+    return {
+      value: entry.value,
+      stale: entry.staleAt !== undefined && now > entry.staleAt,
+    };
+  }
+
+  /**
+   * 写入缓存，超出容量时淘汰最久未使用的条目
+   * staleSeconds 为过期后仍可返回旧值的宽限时间
+   */
+  set(key: string, value: V, ttlSeconds?: number, staleSeconds = 0): void {
+    const staleAt = ttlSeconds ? Date.now() + ttlSeconds * 1000 : undefined;
+    const expiresAt = staleAt !== undefined ? staleAt + staleSeconds * 1000 : undefined;
+
+    this.entries.delete(key);
+    this.entries.set(key, { value, staleAt, expiresAt });
+
+    while (this.entries.size > this.maxEntries) {
+      const [oldestKey, oldest] = this.entries.entries().next().value;
+      this.entries.delete(oldestKey);
+      this.onEvict?.(oldestKey, oldest.value);
+    }
+  }
+
+  delete(key: string): boolean {
+    return this.entries.delete(key);
+  }
+
+  clear(): void {
+    this.entries.clear();
+  }
+
+  keys(): IterableIterator<string> {
+    return this.entries.keys();
+  }
+}
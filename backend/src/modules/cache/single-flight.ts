@@ -0,0 +1,51 @@
+/**
+ * 请求合并（single-flight）
+ * 同一个键的并发调用共享同一个进行中的 Promise，只有第一个调用真正执行
+ */
+export class SingleFlight<T = any> {
+  private readonly inflight = new Map<string, Promise<T>>();
+  private sharedCount = 0;
+
+  /**
+   * 执行或加入进行中的调用
+   */
+  do(key: string, fn: () => Promise<T>): Promise<T> {
+    const existing = this.inflight.get(key);
+    if (existing) {
+      this.sharedCount++;
+      return existing;
+    }
+
+    const promise = Promise.resolve()
+      .then(fn)
+      .finally(() => {
+        if (this.inflight.get(key) === promise) {
+          this.inflight.delete(key);
+        }
+      });
+
+    this.inflight.set(key, promise);
+    return promise;
+  }
+
+  /**
+   * 判断键是否有进行中的调用
+   */
+  has(key: string): boolean {
+    return this.inflight.has(key);
+  }
+
+  /**
+   * 进行中的调用数量
+   */
+  get size(): number {
+    return this.inflight.size;
+  }
+
+  /**
+   * 被合并（未实际执行）的调用次数
+   */
+  get shared(): number {
+    return this.sharedCount;
+  }
+}
@@ -1,4 +1,4 @@
-import { IsEnum, IsOptional, IsArray } from 'class-validator';
+import { IsEnum, IsOptional, IsArray, IsBoolean } from 'class-validator';
 import { ApiProperty } from '@nestjs/swagger';
 
 export enum ExportFormat {
@@ -19,6 +19,8 @@ export enum Orientation {
   LANDSCAPE = 'landscape',
 }
 
+export const EXPORT_SECTIONS = ['overview', 'trends', 'subjects', 'details', 'advice'];
+
 export class ExportDto {
   @ApiProperty({ enum: ExportFormat, description: '导出格式' })
   @IsEnum(ExportFormat)
@@ -37,11 +39,23 @@ export class ExportDto {
   @ApiProperty({ description: '包含的章节', required: false, type: [String] })
   @IsArray()
   @IsOptional()
-  includeSections?: string[] = ['overview', 'trends', 'subjects', 'details', 'advice'];
+  includeSections?: string[] = [...EXPORT_SECTIONS];
 
-  @ApiProperty({ description: '是否包含图表 (Excel)', required: false })
+  @ApiProperty({ description: '是否包含图表（仅 PDF，默认包含；Excel 不支持）', required: false })
+  @IsBoolean()
   @IsOptional()
-  includeCharts?: boolean = true;
+  includeCharts?: boolean;
+}
+
+export interface ExportDetailRow {
+  id: string;
+  date: string;
+  subject: string;
+  questionsCount: number;
+  correctCount: number;
+  wrongCount: number;
+  accuracy: number;
+  timeSpent: number;
 }
 
 export interface ExportData {
@@ -72,18 +86,40 @@ export interface ExportData {
     accuracy: number;
     avgTime: number;
   }>;
-  details: Array<{
-    date: string;
-    subject: string;
-    questionsCount: number;
-    correctCount: number;
-    wrongCount: number;
-    accuracy: number;
-    timeSpent: number;
-  }>;
+  // 明细按游标逐行读取，生成器边读边写
+  details?: AsyncIterable<ExportDetailRow>;
   advice: Array<{
     type: string;
     title: string;
     message: string;
   }>;
 }
+
+export enum ExportJobStatus {
+  PENDING = 'pending',
+  RUNNING = 'running',
+  COMPLETED = 'completed',
+  FAILED = 'failed',
+}
+
+/**
+ * 后台导出任务
+ */
+export interface ExportJob {
+  id: string;
+  userId: string;
+  options: ExportDto;
+  artifactKey: string;
+  status: ExportJobStatus;
+  filePath?: string;
+  size?: number;
+  error?: string;
+  cached?: boolean;
+  // 已开始执行的次数（含因节点退出被重新排队的执行）
+  attempts?: number;
+  createdAt: string;
+  startedAt?: string;
+  // 执行中的心跳时间，超过租约时长未更新视为节点已退出
+  heartbeatAt?: string;
+  completedAt?: string;
+}
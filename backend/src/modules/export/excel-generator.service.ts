@@ -1,91 +1,138 @@
 import { Injectable } from '@nestjs/common';
+import { Writable } from 'stream';
+import * as ExcelJS from 'exceljs';
 import { ExportData } from './dto/export.dto';
+import { waitForDrain } from '../../common/utils/stream';
+
+// 每写入多少行检查一次下游背压
+const DRAIN_CHECK_INTERVAL = 200;
 
 /**
  * Excel 生成服务
- * 使用 ExcelJS 生成 Excel 报告
+ * 使用 ExcelJS 流式写入器，逐行提交并直接写入输出流，内存占用与明细行数无关
  */
 @Injectable()
 export class ExcelGeneratorService {
   /**
-   * 生成 Excel 报告
+   * 生成 Excel 报告并写入 output
    */
-  async generateExcel(data: ExportData, options: { includeCharts?: boolean } = {}): Promise<Buffer> {
-    // 注意：实际实现需要安装 exceljs
-    // npm install exceljs
-    // npm install @types/exceljs --save-dev
-
-    // 模拟 Excel 生成（实际应该使用 ExcelJS）
-    const excelContent = this.buildExcelContent(data, options);
-
-    // 在实际实现中，这里应该使用 ExcelJS
-    // const ExcelJS = require('exceljs');
-    // const workbook = new ExcelJS.Workbook();
-    // const worksheet = workbook.addWorksheet('学习报告');
+  async writeExcel(data: ExportData, output: Writable): Promise<void> {
+    // ExcelJS 流式写入器不支持图表，请求图表的 Excel 导出在 ExportService 中即被拒绝
+    const workbook = new ExcelJS.stream.xlsx.WorkbookWriter({
+      stream: output,
+      useStyles: true,
+      useSharedStrings: false,
+    });
+    workbook.creator = 'Mistakery';
+    workbook.created = new Date();
+
+    this.writeOverviewSheet(workbook, data);
+
+    if (data.trends.length > 0) {
+      const sheet = this.addSheet(workbook, '学习趋势', [
+        { header: '日期', key: 'date', width: 15 },
+        { header: '学习时长', key: 'studyTime', width: 15 },
+        { header: '题数', key: 'questionsCount', width: 10 },
+        { header: '正确率', key: 'accuracy', width: 10 },
+      ]);
+      for (const trend of data.trends) {
+        sheet
+          .addRow({ ...trend, studyTime: this.formatTime(trend.studyTime), accuracy: `${trend.accuracy}%` })
+          .commit();
+      }
+      sheet.commit();
+    }
 
-    // 设置列宽
-    // worksheet.columns = [
-    //   { header: '日期', key: 'date', width: 15 },
-    //   { header: '科目', key: 'subject', width: 10 },
-    //   { header: '题数', key: 'count', width: 10 },
-    //   { header: '正确数', key: 'correct', width: 10 },
-    //   { header: '错误数', key: 'wrong', width: 10 },
-    //   { header: '正确率', key: 'accuracy', width: 10 },
-    // ];
+    if (data.subjects.length > 0) {
+      const sheet = this.addSheet(workbook, '科目统计', [
+        { header: '科目', key: 'subject', width: 15 },
+        { header: '错题数', key: 'total', width: 10 },
+        { header: '已掌握', key: 'mastered', width: 10 },
+        { header: '掌握率', key: 'accuracy', width: 10 },
+      ]);
+      for (const subject of data.subjects) {
+        sheet.addRow({ ...subject, accuracy: `${subject.accuracy}%` }).commit();
+      }
+      sheet.commit();
+    }
 
-    // 添加数据行
-    // data.details.forEach((detail) => {
-    //   worksheet.addRow({
-    //     date: detail.date,
-    //     subject: detail.subject,
-    //     count: detail.questionsCount,
-    //     correct: detail.correctCount,
-    //     wrong: detail.wrongCount,
-    //     accuracy: `${detail.accuracy}%`,
-    //   });
-    // });
+    if (data.details) {
+      const sheet = this.addSheet(workbook, '详细记录', [
+        { header: '日期', key: 'date', width: 22 },
+        { header: '练习', key: 'subject', width: 20 },
+        { header: '题数', key: 'questionsCount', width: 10 },
+        { header: '正确数', key: 'correctCount', width: 10 },
+        { header: '错误数', key: 'wrongCount', width: 10 },
+        { header: '正确率', key: 'accuracy', width: 10 },
+        { header: '用时(秒)', key: 'timeSpent', width: 10 },
+      ]);
+
+      let written = 0;
+      for await (const detail of data.details) {
+        sheet.addRow({ ...detail, accuracy: `${detail.accuracy}%` }).commit();
+        if (++written % DRAIN_CHECK_INTERVAL === 0) {
+          await waitForDrain(output);
+        }
+      }
+      sheet.commit();
+    }
 
-    // 生成 Excel 文件
-    // const buffer = await workbook.xlsx.writeBuffer();
+    if (data.advice.length > 0) {
+      const sheet = this.addSheet(workbook, '学习建议', [
+        { header: '类型', key: 'type', width: 10 },
+        { header: '标题', key: 'title', width: 20 },
+        { header: '建议', key: 'message', width: 60 },
+      ]);
+      for (const advice of data.advice) {
+        sheet.addRow(advice).commit();
+      }
+      sheet.commit();
+    }
 
-    // 返回模拟的 Excel 缓冲区
-    return Buffer.from(excelContent);
+    await workbook.commit();
   }
 
   /**
-   * 构建 Excel 内容 (CSV 格式模拟)
+   * 概览工作表
    */
-  private buildExcelContent(data: ExportData, options: { includeCharts?: boolean } = {}): string {
-    const rows: string[] = [];
-
-    // 标题行
-    rows.push('Mistakery 学习报告');
-    rows.push('');
-
-    // 概览
-    rows.push('=== 学习概览 ===');
-    rows.push('指标,数值');
-    rows.push(`总题数,${data.overview?.totalQuestions || 0}`);
-    rows.push(`正确数,${data.overview?.correctCount || 0}`);
-    rows.push(`错误数,${data.overview?.wrongCount || 0}`);
-    rows.push(`正确率,${data.overview?.accuracy || 0}%`);
-    rows.push(`总用时,${this.formatTime(data.overview?.totalTime || 0)}`);
-    rows.push(`学习天数,${data.overview?.studyDays || 0} 天`);
-    rows.push('');
-
-    // 详细记录
-    rows.push('=== 详细记录 ===');
-    rows.push('日期,科目,题数,正确数,错误数,正确率,用时(秒)');
-
-    if (data.details && data.details.length > 0) {
-      data.details.forEach((detail) => {
-        rows.push(
-          `${detail.date},${detail.subject},${detail.questionsCount},${detail.correctCount},${detail.wrongCount},${detail.accuracy}%,${detail.timeSpent}`
-        );
-      });
+  private writeOverviewSheet(workbook: ExcelJS.stream.xlsx.WorkbookWriter, data: ExportData): void {
+    const sheet = workbook.addWorksheet('学习概览');
+    sheet.getColumn(1).width = 20;
+    sheet.getColumn(2).width = 20;
+
+    const title = sheet.addRow(['Mistakery 学习报告']);
+    title.font = { size: 16, bold: true };
+    title.commit();
+    sheet.addRow([]).commit();
+
+    const overview = data.overview;
+    const rows: Array<[string, string | number]> = [
+      ['总题数', overview?.totalQuestions || 0],
+      ['正确数', overview?.correctCount || 0],
+      ['错误数', overview?.wrongCount || 0],
+      ['正确率', `${overview?.accuracy || 0}%`],
+      ['总用时', this.formatTime(overview?.totalTime || 0)],
+      ['学习天数', `${overview?.studyDays || 0} 天`],
+      ['日均用时', this.formatTime(overview?.avgDailyTime || 0)],
+    ];
+    for (const row of rows) {
+      sheet.addRow(row).commit();
     }
+    sheet.commit();
+  }
 
-    return rows.join('\n');
+  /**
+   * 新建带加粗表头的工作表
+   */
+  private addSheet(
+    workbook: ExcelJS.stream.xlsx.WorkbookWriter,
+    name: string,
+    columns: Array<{ header: string; key: string; width: number }>,
+  ): ExcelJS.Worksheet {
+    const sheet = workbook.addWorksheet(name);
+    sheet.columns = columns;
+    sheet.getRow(1).font = { bold: true };
+    return sheet;
   }
 
   /**
@@ -102,67 +149,4 @@ export class ExcelGeneratorService {
       return `${hours}小时${minutes}分钟`;
     }
   }
-
-  /**
-   * 使用 ExcelJS 生成带格式的 Excel 文件
-   */
-  async generateFormattedExcel(data: ExportData): Promise<Buffer> {
-    // 实际实现示例：
-    // const ExcelJS = require('exceljs');
-    // const workbook = new ExcelJS.Workbook();
-
-    // 创建概览工作表
-    // const overviewSheet = workbook.addWorksheet('概览');
-    // overviewSheet.addRow(['Mistakery 学习报告']);
-    // overviewSheet.addRow([]);
-    // overviewSheet.addRow(['总题数', data.overview.totalQuestions]);
-    // overviewSheet.addRow(['正确数', data.overview.correctCount]);
-    // overviewSheet.addRow(['错误数', data.overview.wrongCount]);
-    // overviewSheet.addRow(['正确率', data.overview.accuracy + '%']);
-
-    // 设置样式
-    // overviewSheet.getCell('A1').font = { size: 16, bold: true };
-    // overviewSheet.getColumn(1).width = 20;
-
-    // 创建详细记录工作表
-    // const detailSheet = workbook.addWorksheet('详细记录');
-    // detailSheet.columns = [
-    //   { header: '日期', key: 'date', width: 15 },
-    //   { header: '科目', key: 'subject', width: 10 },
-    //   { header: '题数', key: 'count', width: 10 },
-    //   { header: '正确率', key: 'accuracy', width: 10 },
-    // ];
-    // data.details.forEach(detail => {
-    //   detailSheet.addRow(detail);
-    // });
-
-    // const buffer = await workbook.xlsx.writeBuffer();
-    // return Buffer.from(buffer);
-
-    return Buffer.from('Mock formatted Excel content');
-  }
-
-  /**
-   * 生成带图表的 Excel 文件
-   */
-  async generateExcelWithCharts(data: ExportData): Promise<Buffer> {
-    // ExcelJS 支持添加图表，但需要额外的配置
-    // 这里提供框架代码
-
-    // const ExcelJS = require('exceljs');
-    // const workbook = new ExcelJS.Workbook();
-    // const worksheet = workbook.addWorksheet('数据');
-
-    // 添加数据...
-    // data.subjects.forEach(subject => {
-    //   worksheet.addRow([subject.subject, subject.total, subject.mastered]);
-    // });
-
-    // 添加图表（需要创建单独的图表工作表）
-    // const chartSheet = workbook.addWorksheet('图表');
-
-    // 注意：ExcelJS 的图表功能有限，对于复杂的图表可能需要使用其他库
-
-    return Buffer.from('Mock Excel with charts content');
-  }
 }
@@ -0,0 +1,76 @@
+import { NotFoundException } from '@nestjs/common';
+import { ConfigService } from '@nestjs/config';
+import { ExportJobService } from './export-job.service';
+import { ExportService } from './export.service';
+import { ExportDto, ExportFormat, ExportJobStatus } from './dto/export.dto';
+
+describe('ExportJobService (in-process queue)', () => {
+  let service: ExportJobService;
+  let version: string;
+
+  beforeEach(() => {
+    version = 'v1';
+    const exportService = {
+      normalizeOptions: (options: ExportDto) => options,
+      assertSupported: jest.fn(),
+      getDataVersion: jest.fn(async () => version),
+      getArtifactKey: (userId: string, options: ExportDto, v: string) => `${userId}:${options.format}:${v}`,
+      getReportData: jest.fn().mockResolvedValue({}),
+    } as unknown as ExportService;
+    const configService = { get: (_key: string, fallback: string) => fallback } as unknown as ConfigService;
+
+    service = new ExportJobService(exportService, configService);
+  });
+
+  it('should reuse the pending job for identical requests', async () => {
+    const first = await service.enqueue('user-1', { format: ExportFormat.PDF });
+    const second = await service.enqueue('user-1', { format: ExportFormat.PDF });
+
+    expect(second.id).toBe(first.id);
+    expect(second.cached).toBe(true);
+    expect((await service.dequeue()).id).toBe(first.id);
+    expect(await service.dequeue()).toBeNull();
+  });
+
+  it('should enqueue a new job when the data version changes', async () => {
+    const first = await service.enqueue('user-1', { format: ExportFormat.PDF });
+    version = 'v2';
+    const second = await service.enqueue('user-1', { format: ExportFormat.PDF });
+
+    expect(second.id).not.toBe(first.id);
+    expect(second.cached).toBeUndefined();
+  });
+
+  it('should not reuse a failed job', async () => {
+    const first = await service.enqueue('user-1', { format: ExportFormat.EXCEL });
+    first.status = ExportJobStatus.FAILED;
+    await service.save(first);
+
+    const second = await service.enqueue('user-1', { format: ExportFormat.EXCEL });
+
+    expect(second.id).not.toBe(first.id);
+    expect(second.status).toBe(ExportJobStatus.PENDING);
+  });
+
+  it('should requeue a running job whose lease expired', async () => {
+    const job = await service.enqueue('user-1', { format: ExportFormat.PDF });
+    await service.start(await service.dequeue());
+
+    expect(await service.requeueStale()).toBe(0);
+
+    jest.spyOn(Date, 'now').mockReturnValue(Date.now() + 600001);
+    expect(await service.requeueStale()).toBe(1);
+    jest.restoreAllMocks();
+
+    const requeued = await service.dequeue();
+    expect(requeued.id).toBe(job.id);
+    expect(requeued.status).toBe(ExportJobStatus.PENDING);
+    expect(requeued.attempts).toBe(1);
+  });
+
+  it('should hide jobs owned by other users', async () => {
+    const job = await service.enqueue('user-1', { format: ExportFormat.PDF });
+
+    await expect(service.get('user-2', job.id)).rejects.toThrow(NotFoundException);
+  });
+});
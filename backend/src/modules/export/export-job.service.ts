@@ -0,0 +1,304 @@
+import { Injectable, Logger, Inject, Optional, NotFoundException, ConflictException } from '@nestjs/common';
+import { ConfigService } from '@nestjs/config';
+import type { Redis } from 'ioredis';
+import * as path from 'path';
+import * as fs from 'fs/promises';
+import { v4 as uuidv4 } from 'uuid';
+import { ExportService } from './export.service';
+import { ExportDto, ExportJob, ExportJobStatus } from './dto/export.dto';
+
+const JOB_PREFIX = 'export:job:';
+const ARTIFACT_PREFIX = 'export:artifact:';
+const QUEUE_KEY = 'export:queue';
+// 执行中任务的租约（ZSET，score 为租约到期时间）
+const RUNNING_KEY = 'export:running';
+
+/**
+ * 导出任务队列
+ * 任务与产物索引保存在 Redis（队列为 LIST），未配置 Redis 时退化为进程内队列（单节点部署）
+ * 相同 (用户, 选项, 数据版本) 的请求复用同一个任务及其产物
+ * 执行中的任务持有租约并定期续期，节点退出导致租约过期的任务会被重新排队
+ */
+@Injectable()
+export class ExportJobService {
+  private readonly logger = new Logger(ExportJobService.name);
+  private readonly ttlSeconds = parseInt(process.env.EXPORT_JOB_TTL_SECONDS, 10) || 86400;
+  // 租约时长：超过该时长未续期的执行中任务视为所在节点已退出
+  private readonly staleMs = parseInt(process.env.EXPORT_JOB_STALE_MS, 10) || 600000;
+  private readonly maxAttempts = parseInt(process.env.EXPORT_JOB_MAX_ATTEMPTS, 10) || 3;
+  private readonly localJobs = new Map<string, { job: ExportJob; expiresAt: number }>();
+  private readonly localArtifacts = new Map<string, { jobId: string; expiresAt: number }>();
+  private readonly localQueue: string[] = [];
+  private readonly localLeases = new Map<string, number>();
+
+  readonly artifactDir: string;
+
+  constructor(
+    private exportService: ExportService,
+    configService: ConfigService,
+    @Optional() @Inject('REDIS_CLIENT') private readonly redis?: Redis,
+  ) {
+    this.artifactDir = path.join(configService.get<string>('upload.dest', './uploads'), 'exports');
+  }
+
+  get ttlMs(): number {
+    return this.ttlSeconds * 1000;
+  }
+
+  // 执行期间的续期间隔
+  get heartbeatMs(): number {
+    return Math.max(Math.floor(this.staleMs / 3), 1000);
+  }
+
+  /**
+   * 提交导出任务；已有相同产物（已完成或进行中）时直接返回该任务
+   */
+  async enqueue(userId: string, options: ExportDto): Promise<ExportJob> {
+    const normalized = this.exportService.normalizeOptions(options);
+    this.exportService.assertSupported(normalized);
+    const version = await this.exportService.getDataVersion(userId);
+    const artifactKey = this.exportService.getArtifactKey(userId, normalized, version);
+
+    // 预热汇总数据，预览与任务执行都会命中
+    await this.exportService.getReportData(userId, normalized, version);
+
+    const job: ExportJob = {
+      id: uuidv4(),
+      userId,
+      options: normalized,
+      artifactKey,
+      status: ExportJobStatus.PENDING,
+      createdAt: new Date().toISOString(),
+    };
+
+    for (let attempt = 0; attempt < 2; attempt++) {
+      if (await this.claimArtifact(artifactKey, job.id)) {
+        await this.save(job);
+        await this.push(job.id);
+        return job;
+      }
+
+      const heldJobId = await this.getArtifactJobId(artifactKey);
+      const existing = heldJobId ? await this.findReusable(heldJobId) : null;
+      if (existing) {
+        return { ...existing, cached: true };
+      }
+      // 只删除仍指向该失效任务的登记，不误删并发请求刚登记的任务
+      if (heldJobId) {
+        await this.releaseArtifact(artifactKey, heldJobId);
+      }
+    }
+
+    throw new ConflictException('导出任务提交失败，请重试');
+  }
+
+  /**
+   * 获取用户自己的任务
+   */
+  async get(userId: string, jobId: string): Promise<ExportJob> {
+    const job = await this.load(jobId);
+    if (!job || job.userId !== userId) {
+      throw new NotFoundException('导出任务不存在');
+    }
+    return job;
+  }
+
+  /**
+   * 取出下一个待执行任务
+   */
+  async dequeue(): Promise<ExportJob | null> {
+    while (true) {
+      const jobId = this.redis ? await this.redis.lpop(QUEUE_KEY) : this.localQueue.shift();
+      if (!jobId) return null;
+
+      const job = await this.load(jobId);
+      if (job?.status === ExportJobStatus.PENDING) return job;
+    }
+  }
+
+  /**
+   * 标记任务开始执行并登记租约
+   */
+  async start(job: ExportJob): Promise<void> {
+    const now = new Date().toISOString();
+    job.status = ExportJobStatus.RUNNING;
+    job.startedAt = now;
+    job.heartbeatAt = now;
+    job.attempts = (job.attempts || 0) + 1;
+    await this.save(job);
+    await this.setLease(job.id, false);
+  }
+
+  /**
+   * 续期租约；租约已被清扫（任务已重新排队）时返回 false
+   */
+  async heartbeat(job: ExportJob): Promise<boolean> {
+    if (!(await this.setLease(job.id, true))) return false;
+    job.heartbeatAt = new Date().toISOString();
+    await this.save(job);
+    return true;
+  }
+
+  /**
+   * 保存任务的最终状态并释放租约
+   */
+  async finish(job: ExportJob): Promise<void> {
+    await this.save(job);
+    await this.dropLease(job.id);
+  }
+
+  /**
+   * 重新排队租约已过期的执行中任务，超过最大执行次数的标记为失败
+   */
+  async requeueStale(): Promise<number> {
+    const now = Date.now();
+    const expired = this.redis
+      ? await this.redis.zrangebyscore(RUNNING_KEY, 0, now)
+      : [...this.localLeases].filter(([, expiresAt]) => expiresAt <= now).map(([jobId]) => jobId);
+
+    let requeued = 0;
+    for (const jobId of expired) {
+      // 多个节点同时清扫时，只有成功删除租约的一方处理该任务
+      if (!(await this.dropLease(jobId))) continue;
+
+      const job = await this.load(jobId);
+      if (job?.status !== ExportJobStatus.RUNNING) continue;
+
+      if ((job.attempts || 0) >= this.maxAttempts) {
+        job.status = ExportJobStatus.FAILED;
+        job.error = '导出任务执行多次中断';
+        await this.save(job);
+        await this.releaseArtifact(job.artifactKey, job.id);
+        this.logger.warn(`导出任务 ${job.id} 已中断 ${job.attempts} 次，不再重试`);
+        continue;
+      }
+
+      job.status = ExportJobStatus.PENDING;
+      await this.save(job);
+      await this.push(job.id);
+      requeued++;
+      this.logger.warn(`导出任务 ${job.id} 租约过期，已重新排队`);
+    }
+
+    return requeued;
+  }
+
+  async save(job: ExportJob): Promise<void> {
+    if (!this.redis) {
+      this.localJobs.set(job.id, { job, expiresAt: Date.now() + this.ttlMs });
+      return;
+    }
+    await this.redis.set(JOB_PREFIX + job.id, JSON.stringify(job), 'EX', this.ttlSeconds);
+  }
+
+  /**
+   * 删除产物索引（仅当仍指向 jobId 时，未给出 jobId 则无条件删除）
+   */
+  async releaseArtifact(artifactKey: string, jobId?: string): Promise<void> {
+    if (!this.redis) {
+      const held = this.localArtifacts.get(artifactKey);
+      if (held && (!jobId || held.jobId === jobId)) {
+        this.localArtifacts.delete(artifactKey);
+      }
+      return;
+    }
+
+    if (jobId && (await this.redis.get(ARTIFACT_PREFIX + artifactKey)) !== jobId) return;
+    await this.redis.del(ARTIFACT_PREFIX + artifactKey);
+  }
+
+  private async load(jobId: string): Promise<ExportJob | null> {
+    if (!this.redis) {
+      const entry = this.localJobs.get(jobId);
+      if (!entry) return null;
+      if (entry.expiresAt <= Date.now()) {
+        this.localJobs.delete(jobId);
+        return null;
+      }
+      return entry.job;
+    }
+
+    const raw = await this.redis.get(JOB_PREFIX + jobId);
+    return raw ? JSON.parse(raw) : null;
+  }
+
+  /**
+   * 登记或续期租约；renew 为 true 时仅续期已存在的租约
+   */
+  private async setLease(jobId: string, renew: boolean): Promise<boolean> {
+    const expiresAt = Date.now() + this.staleMs;
+    if (!this.redis) {
+      if (renew && !this.localLeases.has(jobId)) return false;
+      this.localLeases.set(jobId, expiresAt);
+      return true;
+    }
+
+    if (!renew) {
+      await this.redis.zadd(RUNNING_KEY, expiresAt, jobId);
+      return true;
+    }
+    return (await this.redis.zadd(RUNNING_KEY, 'XX', 'CH', expiresAt, jobId)) > 0;
+  }
+
+  /**
+   * 删除租约，返回是否确实删除了
+   */
+  private async dropLease(jobId: string): Promise<boolean> {
+    if (!this.redis) {
+      return this.localLeases.delete(jobId);
+    }
+    return (await this.redis.zrem(RUNNING_KEY, jobId)) > 0;
+  }
+
+  private async getArtifactJobId(artifactKey: string): Promise<string | null> {
+    if (!this.redis) {
+      return this.localArtifacts.get(artifactKey)?.jobId || null;
+    }
+    return this.redis.get(ARTIFACT_PREFIX + artifactKey);
+  }
+
+  private async push(jobId: string): Promise<void> {
+    if (!this.redis) {
+      this.localQueue.push(jobId);
+      return;
+    }
+    await this.redis.rpush(QUEUE_KEY, jobId);
+  }
+
+  /**
+   * 原子地登记产物键，已被其他任务登记时返回 false
+   */
+  private async claimArtifact(artifactKey: string, jobId: string): Promise<boolean> {
+    if (!this.redis) {
+      const held = this.localArtifacts.get(artifactKey);
+      if (held && held.expiresAt > Date.now()) return false;
+      this.localArtifacts.set(artifactKey, { jobId, expiresAt: Date.now() + this.ttlMs });
+      return true;
+    }
+
+    const result = await this.redis.set(ARTIFACT_PREFIX + artifactKey, jobId, 'EX', this.ttlSeconds, 'NX');
+    return result === 'OK';
+  }
+
+  /**
+   * 检查登记的任务能否复用：排队/执行中（租约未过期），或已完成且文件仍在
+   * 租约过期的任务稍后会被清扫重新排队，这里不复用，由新任务重新登记
+   */
+  private async findReusable(jobId: string): Promise<ExportJob | null> {
+    const job = await this.load(jobId);
+    if (!job || job.status === ExportJobStatus.FAILED) return null;
+    if (job.status === ExportJobStatus.PENDING) return job;
+    if (job.status === ExportJobStatus.RUNNING) {
+      const heartbeatAt = new Date(job.heartbeatAt || job.startedAt).getTime();
+      return Date.now() - heartbeatAt < this.staleMs ? job : null;
+    }
+
+    try {
+      await fs.access(job.filePath);
+      return job;
+    } catch {
+      this.logger.warn(`导出产物已被清理: ${job.filePath}`);
+      return null;
+    }
+  }
+}
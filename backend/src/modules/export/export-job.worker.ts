@@ -0,0 +1,173 @@
+import { Injectable, Logger, OnModuleInit, OnModuleDestroy } from '@nestjs/common';
+import * as path from 'path';
+import * as fs from 'fs/promises';
+import { createWriteStream } from 'fs';
+import { finished } from 'stream/promises';
+import { ExportService } from './export.service';
+import { ExportJobService } from './export-job.service';
+import { ExportFormat, ExportJob, ExportJobStatus } from './dto/export.dto';
+
+const CLEANUP_INTERVAL_MS = 3600000;
+
+/**
+ * 导出任务执行器
+ * 定时从队列取任务，以有限并发生成文件；产物先写临时文件再重命名，并定期清理过期产物
+ * 执行期间定期续期任务租约，并定期把租约过期（节点已退出）的任务重新排队
+ */
+@Injectable()
+export class ExportJobWorker implements OnModuleInit, OnModuleDestroy {
+  private readonly logger = new Logger(ExportJobWorker.name);
+  private readonly pollMs = parseInt(process.env.EXPORT_WORKER_POLL_MS, 10) || 1000;
+  private readonly concurrency = parseInt(process.env.EXPORT_WORKER_CONCURRENCY, 10) || 2;
+  private pollTimer: NodeJS.Timeout | null = null;
+  private cleanupTimer: NodeJS.Timeout | null = null;
+  private sweepTimer: NodeJS.Timeout | null = null;
+  private active = 0;
+  private polling = false;
+
+  constructor(
+    private exportService: ExportService,
+    private exportJobService: ExportJobService,
+  ) {}
+
+  onModuleInit() {
+    if (process.env.EXPORT_WORKER_ENABLED === 'false') {
+      return;
+    }
+
+    this.pollTimer = setInterval(() => {
+      this.poll().catch((error) => this.logger.error(`Export poll failed: ${error.message}`));
+    }, this.pollMs);
+    this.pollTimer.unref();
+
+    this.cleanupTimer = setInterval(() => {
+      this.cleanup().catch((error) => this.logger.warn(`Export cleanup failed: ${error.message}`));
+    }, CLEANUP_INTERVAL_MS);
+    this.cleanupTimer.unref();
+
+    this.sweepTimer = setInterval(() => {
+      this.exportJobService
+        .requeueStale()
+        .catch((error) => this.logger.warn(`Export lease sweep failed: ${error.message}`));
+    }, this.exportJobService.heartbeatMs);
+    this.sweepTimer.unref();
+  }
+
+  onModuleDestroy() {
+    if (this.pollTimer) {
+      clearInterval(this.pollTimer);
+      this.pollTimer = null;
+    }
+    if (this.cleanupTimer) {
+      clearInterval(this.cleanupTimer);
+      this.cleanupTimer = null;
+    }
+    if (this.sweepTimer) {
+      clearInterval(this.sweepTimer);
+      this.sweepTimer = null;
+    }
+  }
+
+  /**
+   * 领取任务直到占满并发槽位
+   */
+  async poll(): Promise<void> {
+    if (this.polling) return;
+
+    this.polling = true;
+    try {
+      while (this.active < this.concurrency) {
+        const job = await this.exportJobService.dequeue();
+        if (!job) break;
+
+        this.active++;
+        this.run(job)
+          .catch((error) => this.logger.error(`Export job ${job.id} failed: ${error.message}`))
+          .finally(() => this.active--);
+      }
+    } finally {
+      this.polling = false;
+    }
+  }
+
+  /**
+   * 执行单个任务
+   */
+  async run(job: ExportJob): Promise<void> {
+    await this.exportJobService.start(job);
+    const heartbeat = setInterval(() => {
+      this.exportJobService
+        .heartbeat(job)
+        .catch((error) => this.logger.warn(`Export job ${job.id} heartbeat failed: ${error.message}`));
+    }, this.exportJobService.heartbeatMs);
+    heartbeat.unref();
+
+    const extension = job.options.format === ExportFormat.EXCEL ? 'xlsx' : 'pdf';
+    const filePath = path.join(this.exportJobService.artifactDir, `${job.artifactKey}.${extension}`);
+    // 租约过期后任务可能在其他节点重跑，临时文件按执行次数区分
+    const tempPath = `${filePath}.${job.id}.${job.attempts}.tmp`;
+
+    try {
+      await fs.mkdir(this.exportJobService.artifactDir, { recursive: true });
+      const output = createWriteStream(tempPath);
+      try {
+        if (extension === 'xlsx') {
+          await this.exportService.exportToExcel(job.userId, job.options, output);
+        } else {
+          await this.exportService.exportToPdf(job.userId, job.options, output);
+        }
+        await finished(output);
+      } catch (error) {
+        output.destroy();
+        throw error;
+      }
+
+      await fs.rename(tempPath, filePath);
+      const { size } = await fs.stat(filePath);
+
+      job.status = ExportJobStatus.COMPLETED;
+      job.filePath = filePath;
+      job.size = size;
+      job.completedAt = new Date().toISOString();
+      this.logger.log(`Export job ${job.id} completed (${size} bytes) in ${Date.now() - new Date(job.startedAt).getTime()}ms`);
+    } catch (error) {
+      await fs.unlink(tempPath).catch(() => undefined);
+      await this.exportJobService.releaseArtifact(job.artifactKey, job.id);
+      job.status = ExportJobStatus.FAILED;
+      job.error = error.message;
+      this.logger.error(`Export job ${job.id} failed: ${error.message}`);
+    } finally {
+      clearInterval(heartbeat);
+    }
+
+    await this.exportJobService.finish(job);
+  }
+
+  /**
+   * 删除超过任务保留期的产物文件
+   */
+  async cleanup(): Promise<number> {
+    let entries: string[];
+    try {
+      entries = await fs.readdir(this.exportJobService.artifactDir);
+    } catch {
+      return 0;
+    }
+
+    const expiredBefore = Date.now() - this.exportJobService.ttlMs;
+    let removed = 0;
+    for (const entry of entries) {
+      const filePath = path.join(this.exportJobService.artifactDir, entry);
+      const stat = await fs.stat(filePath).catch(() => null);
+      if (stat?.isFile() && stat.mtimeMs < expiredBefore) {
+        await fs.unlink(filePath).catch(() => undefined);
+        removed++;
+      }
+    }
+
+    if (removed > 0) {
+      this.logger.log(`Removed ${removed} expired export artifacts`);
+    }
+    return removed;
+  }
+}
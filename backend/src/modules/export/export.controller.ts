@@ -1,16 +1,32 @@
-import { Controller, Post, Body, UseGuards, Request, Res, HttpStatus } from '@nestjs/common';
+import {
+  Controller,
+  Get,
+  Post,
+  Body,
+  Param,
+  UseGuards,
+  Request,
+  Res,
+  HttpStatus,
+  HttpException,
+  BadRequestException,
+} from '@nestjs/common';
 import { ApiTags, ApiOperation, ApiBearerAuth, ApiConsumes, ApiProduces } from '@nestjs/swagger';
 import { Response } from 'express';
 import { JwtAuthGuard } from '../../common/guards/jwt-auth.guard';
 import { ExportService } from './export.service';
-import { ExportDto, ExportFormat } from './dto/export.dto';
+import { ExportJobService } from './export-job.service';
+import { ExportDto, ExportFormat, ExportJob, ExportJobStatus } from './dto/export.dto';
 
 @ApiTags('export')
 @Controller('export')
 @UseGuards(JwtAuthGuard)
 @ApiBearerAuth()
 export class ExportController {
-  constructor(private readonly exportService: ExportService) {}
+  constructor(
+    private readonly exportService: ExportService,
+    private readonly exportJobService: ExportJobService,
+  ) {}
 
   /**
    * 导出为 PDF
@@ -24,26 +40,9 @@ export class ExportController {
     @Body() options: ExportDto,
     @Res() res: Response,
   ) {
-    try {
-      const pdfBuffer = await this.exportService.exportToPdf(req.user.sub, {
-        ...options,
-        format: ExportFormat.PDF,
-      });
-
-      res.setHeader('Content-Type', 'application/pdf');
-      res.setHeader(
-        'Content-Disposition',
-        `attachment; filename="mistakery-report-${new Date().toISOString().split('T')[0]}.pdf"`
-      );
-      res.setHeader('Content-Length', pdfBuffer.length);
-
-      res.send(pdfBuffer);
-    } catch (error) {
-      res.status(HttpStatus.INTERNAL_SERVER_ERROR).json({
-        message: 'PDF 生成失败',
-        error: error.message,
-      });
-    }
+    await this.streamExport(res, 'application/pdf', 'pdf', 'PDF 生成失败', () =>
+      this.exportService.exportToPdf(req.user.sub, { ...options, format: ExportFormat.PDF }, res),
+    );
   }
 
   /**
@@ -60,33 +59,17 @@ export class ExportController {
     @Body() options: ExportDto,
     @Res() res: Response,
   ) {
-    try {
-      const excelBuffer = await this.exportService.exportToExcel(req.user.sub, {
-        ...options,
-        format: ExportFormat.EXCEL,
-      });
-
-      res.setHeader(
-        'Content-Type',
-        'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-      );
-      res.setHeader(
-        'Content-Disposition',
-        `attachment; filename="mistakery-report-${new Date().toISOString().split('T')[0]}.xlsx"`
-      );
-      res.setHeader('Content-Length', excelBuffer.length);
-
-      res.send(excelBuffer);
-    } catch (error) {
-      res.status(HttpStatus.INTERNAL_SERVER_ERROR).json({
-        message: 'Excel 生成失败',
-        error: error.message,
-      });
-    }
+    await this.streamExport(
+      res,
+      'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+      'xlsx',
+      'Excel 生成失败',
+      () => this.exportService.exportToExcel(req.user.sub, { ...options, format: ExportFormat.EXCEL }, res),
+    );
   }
 
   /**
-   * 获取导出模板（用于前端预览）
+   * 获取导出预览（与导出任务共用同一份汇总数据）
    */
   @Post('preview')
   @ApiOperation({ summary: '预览导出数据' })
@@ -95,17 +78,16 @@ export class ExportController {
     @Body() options: ExportDto,
   ) {
     try {
-      // 返回预览数据（不实际生成文件）
-      const previewData = {
-        sections: options.includeSections || [],
-        timeRange: options.timeRange || 'month',
-        estimatedSize: '2MB',
-        estimatedTime: '3秒',
-      };
+      const normalized = this.exportService.normalizeOptions(options);
+      const data = await this.exportService.getReportData(req.user.sub, normalized);
 
       return {
         success: true,
-        data: previewData,
+        data: {
+          sections: normalized.includeSections,
+          timeRange: normalized.timeRange,
+          ...data,
+        },
       };
     } catch (error) {
       return {
@@ -115,4 +97,104 @@ export class ExportController {
       };
     }
   }
+
+  /**
+   * 提交后台导出任务
+   */
+  @Post('jobs')
+  @ApiOperation({ summary: '提交后台导出任务' })
+  async createJob(
+    @Request() req,
+    @Body() options: ExportDto,
+  ) {
+    const job = await this.exportJobService.enqueue(req.user.sub, options);
+    return this.toJobResponse(job);
+  }
+
+  /**
+   * 查询导出任务状态
+   */
+  @Get('jobs/:id')
+  @ApiOperation({ summary: '查询导出任务状态' })
+  async getJob(@Request() req, @Param('id') id: string) {
+    const job = await this.exportJobService.get(req.user.sub, id);
+    return this.toJobResponse(job);
+  }
+
+  /**
+   * 下载导出任务产物
+   */
+  @Get('jobs/:id/download')
+  @ApiOperation({ summary: '下载导出文件' })
+  async downloadJob(
+    @Request() req,
+    @Param('id') id: string,
+    @Res() res: Response,
+  ) {
+    const job = await this.exportJobService.get(req.user.sub, id);
+    if (job.status !== ExportJobStatus.COMPLETED) {
+      throw new BadRequestException('导出任务尚未完成');
+    }
+
+    const extension = job.options.format === ExportFormat.EXCEL ? 'xlsx' : 'pdf';
+    res.download(
+      job.filePath,
+      `mistakery-report-${job.completedAt.split('T')[0]}.${extension}`,
+      (error) => {
+        if (error && !res.headersSent) {
+          res.status(HttpStatus.NOT_FOUND).json({ message: '导出文件已过期，请重新导出' });
+        }
+      },
+    );
+  }
+
+  private toJobResponse(job: ExportJob) {
+    return {
+      id: job.id,
+      status: job.status,
+      format: job.options.format,
+      cached: !!job.cached,
+      size: job.size,
+      error: job.error,
+      createdAt: job.createdAt,
+      completedAt: job.completedAt,
+    };
+  }
+
+  /**
+   * 边生成边输出（分块传输，无 Content-Length）
+   * 开始输出前失败时返回 JSON 错误；输出过程中失败只能中断连接
+   */
+  private async streamExport(
+    res: Response,
+    contentType: string,
+    extension: string,
+    failureMessage: string,
+    write: () => Promise<void>,
+  ) {
+    res.setHeader('Content-Type', contentType);
+    res.setHeader(
+      'Content-Disposition',
+      `attachment; filename="mistakery-report-${new Date().toISOString().split('T')[0]}.${extension}"`
+    );
+
+    try {
+      await write();
+    } catch (error) {
+      if (res.headersSent) {
+        res.destroy(error);
+        return;
+      }
+      res.removeHeader('Content-Disposition');
+      res.removeHeader('Content-Type');
+      // 参数校验、字体缺失等已知错误保留原状态码
+      if (error instanceof HttpException) {
+        throw error;
+      }
+      res.status(HttpStatus.INTERNAL_SERVER_ERROR).json({
+        message: failureMessage,
+        error: error.message,
+      });
+    }
+  }
 }
@@ -3,15 +3,19 @@ import { TypeOrmModule } from '@nestjs/typeorm';
 import { JwtModule } from '@nestjs/jwt';
 import { ExportController } from './export.controller';
 import { ExportService } from './export.service';
+import { ExportJobService } from './export-job.service';
+import { ExportJobWorker } from './export-job.worker';
 import { PdfGeneratorService } from './pdf-generator.service';
 import { ExcelGeneratorService } from './excel-generator.service';
 import { ExamRecord } from '../practice/entities/exam-record.entity';
 import { Mistake } from '../mistake/entities/mistake.entity';
 import { Review } from '../review/entities/review.entity';
+import { StatisticsModule } from '../statistics/statistics.module';
 
 @Module({
   imports: [
     JwtModule,
+    StatisticsModule,
     TypeOrmModule.forFeature([
       ExamRecord,
       Mistake,
@@ -21,6 +25,8 @@ import { Review } from '../review/entities/review.entity';
   controllers: [ExportController],
   providers: [
     ExportService,
+    ExportJobService,
+    ExportJobWorker,
     PdfGeneratorService,
     ExcelGeneratorService,
   ],
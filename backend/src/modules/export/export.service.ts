@@ -1,16 +1,32 @@
-import { Injectable, NotFoundException } from '@nestjs/common';
+import { BadRequestException, Injectable } from '@nestjs/common';
 import { InjectRepository } from '@nestjs/typeorm';
 import { Repository, Between } from 'typeorm';
+import { ReadStream } from 'typeorm/platform/PlatformTools';
+import { Writable } from 'stream';
+import { createHash } from 'crypto';
 import { ExamRecord } from '../practice/entities/exam-record.entity';
 import { Mistake } from '../mistake/entities/mistake.entity';
 import { Review } from '../review/entities/review.entity';
-import { ExportDto, ExportData, TimeRange } from './dto/export.dto';
+import {
+  ExportDto,
+  ExportData,
+  ExportDetailRow,
+  ExportFormat,
+  Orientation,
+  TimeRange,
+  EXPORT_SECTIONS,
+} from './dto/export.dto';
 import { PdfGeneratorService } from './pdf-generator.service';
 import { ExcelGeneratorService } from './excel-generator.service';
+import { StatsRollupService } from '../statistics/stats-rollup.service';
+import { CacheService } from '../cache/cache.service';
+
+const DATA_CACHE_PREFIX = 'export:data:';
 
 /**
  * 导出服务
- * 负责收集数据并调用对应的生成器
+ * 负责收集数据并调用对应的生成器；明细通过数据库游标逐行流向生成器
+ * 汇总章节按 (用户, 章节, 时间范围, 数据版本) 缓存，预览与导出任务共用
  */
 @Injectable()
 export class ExportService {
@@ -23,40 +39,153 @@ export class ExportService {
     private reviewRepository: Repository<Review>,
     private pdfGenerator: PdfGeneratorService,
     private excelGenerator: ExcelGeneratorService,
+    private statsRollupService: StatsRollupService,
+    private cacheService: CacheService,
   ) {}
 
+  private readonly dataCacheTtl = parseInt(process.env.EXPORT_DATA_CACHE_TTL, 10) || 600;
+
   /**
-   * 导出为 PDF
+   * 导出为 PDF，直接写入 output
    */
-  async exportToPdf(userId: string, options: ExportDto): Promise<Buffer> {
-    const data = await this.collectExportData(userId, options);
-
-    return this.pdfGenerator.generatePdf(data, {
-      orientation: options.orientation,
+  async exportToPdf(userId: string, options: ExportDto, output: Writable): Promise<void> {
+    const normalized = this.normalizeOptions(options);
+    this.assertSupported(normalized);
+    const data = await this.collectExportData(userId, normalized);
+
+    await this.pdfGenerator.writePdf(data, output, {
+      orientation: normalized.orientation,
+      includeCharts: normalized.includeCharts,
     });
   }
 
   /**
-   * 导出为 Excel
+   * 导出为 Excel，直接写入 output
    */
-  async exportToExcel(userId: string, options: ExportDto): Promise<Buffer> {
-    const data = await this.collectExportData(userId, options);
+  async exportToExcel(userId: string, options: ExportDto, output: Writable): Promise<void> {
+    const normalized = this.normalizeOptions(options);
+    this.assertSupported(normalized);
+    const data = await this.collectExportData(userId, normalized);
 
-    return this.excelGenerator.generateExcel(data, {
-      includeCharts: options.includeCharts,
-    });
+    await this.excelGenerator.writeExcel(data, output);
   }
 
   /**
-   * 收集导出数据
+   * 统一导出选项（补默认值、章节去重排序），用于计算缓存键
+   * 图表仅 PDF 支持：PDF 默认包含，Excel 默认不含
+   */
+  normalizeOptions(options: ExportDto): ExportDto {
+    const format = options.format || ExportFormat.PDF;
+    const sections = options.includeSections?.length ? options.includeSections : [...EXPORT_SECTIONS];
+    return {
+      format,
+      timeRange: options.timeRange || TimeRange.MONTH,
+      orientation: options.orientation || Orientation.PORTRAIT,
+      includeSections: [...new Set(sections)].sort(),
+      includeCharts: options.includeCharts ?? format === ExportFormat.PDF,
+    };
+  }
+
+  /**
+   * 校验导出选项在当前环境下可以生成，开始输出或入队之前调用
+   */
+  assertSupported(options: ExportDto): void {
+    if (options.format === ExportFormat.EXCEL && options.includeCharts) {
+      throw new BadRequestException('Excel 导出不支持图表，请将 includeCharts 设为 false');
+    }
+    if (options.format === ExportFormat.PDF) {
+      this.pdfGenerator.assertFontAvailable();
+    }
+  }
+
+  /**
+   * 用户导出相关数据的版本号
+   * 任一来源表的行数或最后修改时间变化都会改变版本；日期参与计算，因为时间范围以“今天”为终点
+   */
+  async getDataVersion(userId: string): Promise<string> {
+    const [row] = await this.examRecordRepository.query(
+      `SELECT
+         (SELECT CONCAT(COUNT(*), ':', IFNULL(UNIX_TIMESTAMP(MAX(updated_at)), 0)) FROM exam_records WHERE user_id = ?) AS records,
+         (SELECT CONCAT(COUNT(*), ':', IFNULL(UNIX_TIMESTAMP(MAX(updated_at)), 0)) FROM mistakes WHERE user_id = ?) AS mistakes,
+         (SELECT CONCAT(COUNT(*), ':', IFNULL(UNIX_TIMESTAMP(MAX(created_at)), 0)) FROM reviews WHERE user_id = ?) AS reviews`,
+      [userId, userId, userId],
+    );
+
+    return this.hash([new Date().toDateString(), row.records, row.mistakes, row.reviews]);
+  }
+
+  /**
+   * 导出产物的缓存键：相同用户、选项与数据版本得到相同的键
+   */
+  getArtifactKey(userId: string, options: ExportDto, version: string): string {
+    const normalized = this.normalizeOptions(options);
+    return this.hash([
+      userId,
+      normalized.format,
+      normalized.timeRange,
+      normalized.orientation,
+      normalized.includeSections.join(','),
+      String(normalized.includeCharts),
+      version,
+    ]);
+  }
+
+  /**
+   * 获取汇总章节数据（不含明细），供预览与导出共用
+   */
+  async getReportData(userId: string, options: ExportDto, version?: string): Promise<ExportData> {
+    const { timeRange, includeSections } = this.normalizeOptions(options);
+    const dataVersion = version || (await this.getDataVersion(userId));
+    const key = `${DATA_CACHE_PREFIX}${userId}:${this.hash([timeRange, includeSections.join(','), dataVersion])}`;
+
+    return this.cacheService.wrap(
+      key,
+      () => this.collectReportData(userId, timeRange, includeSections),
+      this.dataCacheTtl,
+    );
+  }
+
+  /**
+   * 收集导出数据：汇总章节取自缓存，明细为惰性游标
    */
   private async collectExportData(userId: string, options: ExportDto): Promise<ExportData> {
-    const { timeRange = TimeRange.MONTH, includeSections = [] } = options;
+    const { timeRange, includeSections } = this.normalizeOptions(options);
+    const data = { ...(await this.getReportData(userId, options)) };
+
+    // 详细记录（惰性游标，生成器写到该章节时才开始查询）
+    if (includeSections.includes('details')) {
+      data.details = this.streamDetailsData(userId, this.getDateRange(timeRange));
+    }
 
+    return data;
+  }
+
+  /**
+   * 并发查询各汇总章节
+   */
+  private async collectReportData(
+    userId: string,
+    timeRange: TimeRange,
+    includeSections: string[],
+  ): Promise<ExportData> {
     const dateRange = this.getDateRange(timeRange);
+    const include = (section: string) => includeSections.includes(section);
 
-    const data: ExportData = {
-      overview: {
+    // 概览读取统计汇总（按完成日），建议复用同一份结果；只有趋势需要逐条记录按天聚合
+    const summary =
+      include('overview') || include('advice')
+        ? this.getOverviewData(userId, dateRange)
+        : Promise.resolve(null);
+
+    const [overview, trends, subjects, advice] = await Promise.all([
+      include('overview') ? summary : null,
+      include('trends') ? this.getTrendsData(userId, dateRange) : [],
+      include('subjects') ? this.getSubjectsData(userId, dateRange) : [],
+      include('advice') ? this.getAdviceData(userId, dateRange, summary) : [],
+    ]);
+
+    return {
+      overview: overview || {
         totalQuestions: 0,
         correctCount: 0,
         wrongCount: 0,
@@ -66,62 +195,24 @@ export class ExportService {
         avgDailyTime: 0,
         subjectStats: [],
       },
-      trends: [],
-      subjects: [],
-      details: [],
-      advice: [],
+      trends,
+      subjects,
+      advice,
     };
-
-    // 概览数据
-    if (includeSections.includes('overview')) {
-      data.overview = await this.getOverviewData(userId, dateRange);
-    }
-
-    // 趋势数据
-    if (includeSections.includes('trends')) {
-      data.trends = await this.getTrendsData(userId, dateRange);
-    }
-
-    // 科目数据
-    if (includeSections.includes('subjects')) {
-      data.subjects = await this.getSubjectsData(userId, dateRange);
-    }
-
-    // 详细记录
-    if (includeSections.includes('details')) {
-      data.details = await this.getDetailsData(userId, dateRange);
-    }
-
-    // 学习建议
-    if (includeSections.includes('advice')) {
-      data.advice = await this.getAdviceData(userId, dateRange);
-    }
-
-    return data;
   }
 
   /**
    * 获取概览数据
    */
   private async getOverviewData(userId: string, dateRange: { start: Date; end: Date }) {
-    const records = await this.examRecordRepository
-      .createQueryBuilder('record')
-      .where('record.userId = :userId', { userId })
-      .andWhere('record.startedAt BETWEEN :start AND :end', {
-        start: dateRange.start,
-        end: dateRange.end,
-      })
-      .getMany();
+    // 读取统计汇总（已完成的练习，按天粒度）
+    const summary = await this.statsRollupService.getExamSummary(userId, dateRange);
 
-    const totalQuestions = records.reduce((sum, r) => sum + (r.questionCount || 0), 0);
-    const correctCount = records.reduce((sum, r) => sum + (r.correctCount || 0), 0);
+    const totalQuestions = summary.questionCount;
+    const correctCount = summary.correctCount;
     const wrongCount = totalQuestions - correctCount;
-    const totalTime = records.reduce((sum, r) => sum + (r.timeSpent || 0), 0);
-
-    // 统计学习天数
-    const studyDays = new Set(
-      records.map(r => new Date(r.startedAt).toDateString())
-    ).size;
+    const totalTime = summary.timeSpent;
+    const studyDays = summary.studyDays;
 
     return {
       totalQuestions,
@@ -136,131 +227,137 @@ export class ExportService {
   }
 
   /**
-   * 获取趋势数据
+   * 获取趋势数据（按天聚合，包含未完成的练习）
    */
   private async getTrendsData(userId: string, dateRange: { start: Date; end: Date }) {
-    const records = await this.examRecordRepository
+    const rows = await this.examRecordRepository
       .createQueryBuilder('record')
+      .select("DATE_FORMAT(record.startedAt, '%Y-%m-%d')", 'date')
+      .addSelect('SUM(record.timeSpent)', 'studyTime')
+      .addSelect('SUM(record.questionCount)', 'questionsCount')
+      .addSelect('SUM(record.correctCount)', 'correctCount')
       .where('record.userId = :userId', { userId })
       .andWhere('record.startedAt BETWEEN :start AND :end', dateRange)
-      .orderBy('record.startedAt', 'ASC')
-      .getMany();
-
-    // 按日期聚合
-    const dailyStats = new Map<string, {
-      studyTime: number;
-      questionsCount: number;
-      correctCount: number;
-    }>();
-
-    records.forEach(record => {
-      const date = new Date(record.startedAt).toISOString().split('T')[0];
-      const stats = dailyStats.get(date) || { studyTime: 0, questionsCount: 0, correctCount: 0 };
-      stats.studyTime += record.timeSpent || 0;
-      stats.questionsCount += record.questionCount || 0;
-      stats.correctCount += record.correctCount || 0;
-      dailyStats.set(date, stats);
+      .groupBy('date')
+      .orderBy('date', 'ASC')
+      .getRawMany();
+
+    return rows.map((row) => {
+      const questionsCount = Number(row.questionsCount) || 0;
+      const correctCount = Number(row.correctCount) || 0;
+      return {
+        date: row.date,
+        studyTime: Number(row.studyTime) || 0,
+        questionsCount,
+        accuracy: questionsCount > 0 ? Math.round((correctCount / questionsCount) * 100) : 0,
+      };
     });
-
-    return Array.from(dailyStats.entries()).map(([date, stats]) => ({
-      date,
-      studyTime: stats.studyTime,
-      questionsCount: stats.questionsCount,
-      accuracy: stats.questionsCount > 0
-        ? Math.round((stats.correctCount / stats.questionsCount) * 100)
-        : 0,
-    }));
   }
 
   /**
-   * 获取科目数据
+   * 获取科目数据（按科目聚合）
    */
   private async getSubjectsData(userId: string, dateRange: { start: Date; end: Date }) {
-    const mistakes = await this.mistakeRepository
+    const rows = await this.mistakeRepository
       .createQueryBuilder('mistake')
-      .leftJoinAndSelect('mistake.subject', 'subject')
+      .leftJoin('mistake.subject', 'subject')
+      .select("COALESCE(subject.name, '未分类')", 'subjectName')
+      .addSelect('COUNT(*)', 'total')
+      .addSelect("SUM(mistake.masteryLevel = 'mastered')", 'mastered')
       .where('mistake.userId = :userId', { userId })
       .andWhere('mistake.createdAt BETWEEN :start AND :end', {
         start: dateRange.start,
         end: dateRange.end,
       })
-      .getMany();
-
-    // 按科目分组
-    const subjectStats = new Map<string, {
-      total: number;
-      mastered: number;
-      correctCount: number;
-    }>();
-
-    mistakes.forEach(mistake => {
-      const subjectName = mistake.subject?.name || '未分类';
-      const stats = subjectStats.get(subjectName) || {
-        total: 0,
-        mastered: 0,
-        correctCount: 0,
+      .groupBy('subjectName')
+      .getRawMany();
+
+    return rows.map((row) => {
+      const total = Number(row.total) || 0;
+      const mastered = Number(row.mastered) || 0;
+      return {
+        subject: row.subjectName,
+        total,
+        mastered,
+        accuracy: total > 0 ? Math.round((mastered / total) * 100) : 0,
+        avgTime: 0, // Mistake doesn't have timeSpent property
       };
-      stats.total++;
-      if (mistake.masteryLevel === 'mastered') {
-        stats.mastered++;
-      }
-      stats.correctCount += mistake.correctCount || 0;
-      subjectStats.set(subjectName, stats);
     });
-
-    return Array.from(subjectStats.entries()).map(([subject, stats]) => ({
-      subject,
-      total: stats.total,
-      mastered: stats.mastered,
-      accuracy: stats.total > 0 ? Math.round((stats.mastered / stats.total) * 100) : 0,
-      avgTime: 0, // Mistake doesn't have timeSpent property
-    }));
   }
 
   /**
-   * 获取详细记录
+   * 逐行读取详细记录
+   * 使用独占连接的流式查询；消费方中途退出（如客户端断开）时销毁连接，避免把读到一半的连接还回连接池
    */
-  private async getDetailsData(userId: string, dateRange: { start: Date; end: Date }) {
-    const records = await this.examRecordRepository
-      .createQueryBuilder('record')
-      .leftJoinAndSelect('record.exam', 'exam')
-      .where('record.userId = :userId', { userId })
-      .andWhere('record.startedAt BETWEEN :start AND :end', dateRange)
-      .orderBy('record.startedAt', 'DESC')
-      .limit(1000)
-      .getMany();
-
-    return records.map(record => ({
-      id: record.id,
-      date: record.startedAt.toISOString(),
-      subject: record.examName || '未分类',
-      questionsCount: record.questionCount || 0,
-      correctCount: record.correctCount || 0,
-      wrongCount: (record.questionCount || 0) - (record.correctCount || 0),
-      accuracy: record.questionCount > 0
-        ? Math.round(((record.correctCount || 0) / record.questionCount) * 100)
-        : 0,
-      timeSpent: record.timeSpent || 0,
-    }));
+  private async *streamDetailsData(
+    userId: string,
+    dateRange: { start: Date; end: Date },
+  ): AsyncGenerator<ExportDetailRow> {
+    const queryRunner = this.examRecordRepository.manager.connection.createQueryRunner();
+    let stream: ReadStream;
+    let completed = false;
+
+    try {
+      stream = await this.examRecordRepository
+        .createQueryBuilder('record', queryRunner)
+        .select('record.id', 'id')
+        .addSelect('record.startedAt', 'startedAt')
+        .addSelect('record.examName', 'examName')
+        .addSelect('record.questionCount', 'questionCount')
+        .addSelect('record.correctCount', 'correctCount')
+        .addSelect('record.timeSpent', 'timeSpent')
+        .where('record.userId = :userId', { userId })
+        .andWhere('record.startedAt BETWEEN :start AND :end', dateRange)
+        .orderBy('record.startedAt', 'DESC')
+        .stream();
+
+      for await (const row of stream) {
+        const questionCount = Number(row.questionCount) || 0;
+        const correctCount = Number(row.correctCount) || 0;
+        yield {
+          id: row.id,
+          date: new Date(row.startedAt).toISOString(),
+          subject: row.examName || '未分类',
+          questionsCount: questionCount,
+          correctCount,
+          wrongCount: questionCount - correctCount,
+          accuracy: questionCount > 0 ? Math.round((correctCount / questionCount) * 100) : 0,
+          timeSpent: Number(row.timeSpent) || 0,
+        };
+      }
+      completed = true;
+    } finally {
+      if (!completed) {
+        stream?.destroy();
+        (queryRunner as any).databaseConnection?.destroy();
+      }
+      await queryRunner.release();
+    }
   }
 
   /**
    * 获取学习建议
    */
-  private async getAdviceData(userId: string, dateRange: { start: Date; end: Date }) {
-    const mistakes = await this.mistakeRepository.count({
-      where: {
-        userId,
-        createdAt: Between(dateRange.start, dateRange.end),
-      },
-    });
-
-    const reviews = await this.reviewRepository.count({
-      where: {
-        userId,
-        createdAt: Between(dateRange.start, dateRange.end),
-      },
-    });
+  private async getAdviceData(
+    userId: string,
+    dateRange: { start: Date; end: Date },
+    summary: Promise<ExportData['overview']>,
+  ) {
+    const [mistakes, reviews, overview] = await Promise.all([
+      this.mistakeRepository.count({
+        where: {
+          userId,
+          createdAt: Between(dateRange.start, dateRange.end),
+        },
+      }),
+      this.reviewRepository.count({
+        where: {
+          userId,
+          createdAt: Between(dateRange.start, dateRange.end),
+        },
+      }),
+      summary,
+    ]);
 
     const advice: Array<{ type: string; title: string; message: string }> = [];
 
@@ -273,6 +370,14 @@ export class ExportService {
       });
     }
 
+    if (overview.totalQuestions >= 20 && overview.accuracy < 60) {
+      advice.push({
+        type: 'warning',
+        title: '正确率偏低',
+        message: `本周期练习正确率为 ${overview.accuracy}%，建议先复习错题再做新题`,
+      });
+    }
+
     if (reviews < 10) {
       advice.push({
         type: 'info',
@@ -323,4 +428,8 @@ export class ExportService {
 
     return { start, end };
   }
+
+  private hash(parts: string[]): string {
+    return createHash('sha256').update(parts.join('|')).digest('hex').slice(0, 32);
+  }
 }
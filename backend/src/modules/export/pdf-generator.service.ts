@@ -1,96 +1,167 @@
-import { Injectable } from '@nestjs/common';
+import { Injectable, Logger, OnModuleInit, ServiceUnavailableException } from '@nestjs/common';
+import { existsSync } from 'fs';
+import { Writable } from 'stream';
+import PDFDocument = require('pdfkit');
 import { ExportData, Orientation } from './dto/export.dto';
+import { waitForDrain } from '../../common/utils/stream';
+
+// 每写入多少行检查一次下游背压
+const DRAIN_CHECK_INTERVAL = 100;
+const CJK_FONT = 'cjk';
+const CHART_HEIGHT = 120;
 
 /**
  * PDF 生成服务
- * 使用 jsPDF 和 html2canvas 生成 PDF 报告
+ * 使用 PDFKit 边生成边输出：页面写满即刷出，内存占用与明细行数无关
+ * 中文需要通过 EXPORT_PDF_FONT_PATH 指定 CJK 字体（如 NotoSansSC-Regular.ttf），未配置时拒绝生成
  */
 @Injectable()
-export class PdfGeneratorService {
-  /**
-   * 生成 PDF 报告
-   */
-  async generatePdf(data: ExportData, options: { orientation?: Orientation } = {}): Promise<Buffer> {
-    // 注意：实际实现需要安装 jsPDF 和相关依赖
-    // 这里提供实现框架
-
-    const { orientation = Orientation.PORTRAIT } = options;
-
-    // 模拟 PDF 生成（实际应该使用 jsPDF 或 puppeteer）
-    const pdfContent = this.buildPdfContent(data, orientation);
+export class PdfGeneratorService implements OnModuleInit {
+  private readonly logger = new Logger(PdfGeneratorService.name);
+  private readonly fontPath = process.env.EXPORT_PDF_FONT_PATH;
 
-    // 在实际实现中，这里应该使用 jsPDF 或类似库
-    // const jsPDF = require('jspdf');
-    // const doc = new jsPDF({
-    //   orientation: orientation,
-    //   unit: 'mm',
-    //   format: 'a4'
-    // });
-
-    // 添加内容到 PDF
-    // doc.setFontSize(18);
-    // doc.text('Mistakery 学习报告', 20, 20);
-
-    // ... 添加更多内容
-
-    // const pdfBuffer = Buffer.from(doc.output('arraybuffer'));
-
-    // 返回模拟的 PDF 缓冲区
-    return Buffer.from(pdfContent);
+  onModuleInit() {
+    if (!this.hasFont()) {
+      this.logger.warn('EXPORT_PDF_FONT_PATH 未配置或文件不存在，PDF 导出不可用');
+    }
   }
 
   /**
-   * 构建 PDF 内容
+   * 检查 CJK 字体是否可用；内置字体无法显示中文，不生成乱码报告
    */
-  private buildPdfContent(data: ExportData, orientation: Orientation): string {
-    const sections: string[] = [];
+  assertFontAvailable(): void {
+    if (!this.hasFont()) {
+      throw new ServiceUnavailableException('PDF 导出未配置中文字体（EXPORT_PDF_FONT_PATH），请改用 Excel 导出');
+    }
+  }
 
-    // 标题
-    sections.push('%PDF-1.4');
-    sections.push('% Mistakery 学习报告');
+  /**
+   * 生成 PDF 报告并写入 output
+   */
+  async writePdf(
+    data: ExportData,
+    output: Writable,
+    options: { orientation?: Orientation; includeCharts?: boolean } = {},
+  ): Promise<void> {
+    const { orientation = Orientation.PORTRAIT, includeCharts = false } = options;
+    this.assertFontAvailable();
+
+    const doc = new PDFDocument({ size: 'A4', layout: orientation, margin: 50 });
+    const finished = new Promise<void>((resolve, reject) => {
+      output.once('finish', resolve);
+      output.once('error', reject);
+      doc.once('error', reject);
+    });
+    doc.pipe(output);
+
+    doc.registerFont(CJK_FONT, this.fontPath);
+    doc.font(CJK_FONT);
+
+    doc.fontSize(18).text('Mistakery 学习报告', { align: 'center' });
+    doc.moveDown();
 
     // 概览部分
     if (data.overview) {
-      sections.push('');
-      sections.push('=== 学习概览 ===');
-      sections.push(`总题数: ${data.overview.totalQuestions}`);
-      sections.push(`正确数: ${data.overview.correctCount}`);
-      sections.push(`错误数: ${data.overview.wrongCount}`);
-      sections.push(`正确率: ${data.overview.accuracy}%`);
-      sections.push(`总用时: ${this.formatTime(data.overview.totalTime)}`);
-      sections.push(`学习天数: ${data.overview.studyDays} 天`);
+      this.heading(doc, '学习概览');
+      doc.text(`总题数: ${data.overview.totalQuestions}`);
+      doc.text(`正确数: ${data.overview.correctCount}`);
+      doc.text(`错误数: ${data.overview.wrongCount}`);
+      doc.text(`正确率: ${data.overview.accuracy}%`);
+      doc.text(`总用时: ${this.formatTime(data.overview.totalTime)}`);
+      doc.text(`学习天数: ${data.overview.studyDays} 天`);
     }
 
     // 趋势部分
-    if (data.trends && data.trends.length > 0) {
-      sections.push('');
-      sections.push('=== 学习趋势 ===');
-      data.trends.forEach((trend, index) => {
-        if (index < 10) { // 限制显示数量
-          sections.push(`${trend.date}: ${trend.questionsCount} 题, ${trend.accuracy}%`);
-        }
-      });
+    if (data.trends.length > 0) {
+      this.heading(doc, '学习趋势');
+      if (includeCharts) {
+        this.trendChart(doc, data.trends);
+      }
+      for (const trend of data.trends) {
+        doc.text(`${trend.date}: ${trend.questionsCount} 题, ${trend.accuracy}%, ${this.formatTime(trend.studyTime)}`);
+      }
     }
 
     // 科目统计
-    if (data.subjects && data.subjects.length > 0) {
-      sections.push('');
-      sections.push('=== 科目统计 ===');
-      data.subjects.forEach((subject) => {
-        sections.push(`${subject.subject}: ${subject.mastered}/${subject.total} 已掌握, ${subject.accuracy}%`);
-      });
+    if (data.subjects.length > 0) {
+      this.heading(doc, '科目统计');
+      for (const subject of data.subjects) {
+        doc.text(`${subject.subject}: ${subject.mastered}/${subject.total} 已掌握, ${subject.accuracy}%`);
+      }
+    }
+
+    // 详细记录（逐行读取）
+    if (data.details) {
+      this.heading(doc, '详细记录');
+      let written = 0;
+      for await (const detail of data.details) {
+        doc.text(
+          `${detail.date.slice(0, 16).replace('T', ' ')}  ${detail.subject}  ` +
+            `${detail.correctCount}/${detail.questionsCount} 题  ${detail.accuracy}%  ${this.formatTime(detail.timeSpent)}`,
+        );
+        if (++written % DRAIN_CHECK_INTERVAL === 0) {
+          await waitForDrain(output);
+        }
+      }
+      if (written === 0) {
+        doc.text('暂无记录');
+      }
     }
 
     // 学习建议
-    if (data.advice && data.advice.length > 0) {
-      sections.push('');
-      sections.push('=== 学习建议 ===');
-      data.advice.forEach((advice) => {
-        sections.push(`[${advice.type}] ${advice.title}: ${advice.message}`);
-      });
+    if (data.advice.length > 0) {
+      this.heading(doc, '学习建议');
+      for (const advice of data.advice) {
+        doc.text(`[${advice.type}] ${advice.title}: ${advice.message}`);
+      }
+    }
+
+    doc.end();
+    await finished;
+  }
+
+  /**
+   * 章节标题
+   */
+  private heading(doc: PDFKit.PDFDocument, title: string): void {
+    doc.moveDown();
+    doc.fontSize(14).text(title);
+    doc.moveDown(0.5);
+    doc.fontSize(10);
+  }
+
+  /**
+   * 每日题数柱状图（矢量绘制，宽度铺满版心）
+   */
+  private trendChart(doc: PDFKit.PDFDocument, trends: ExportData['trends']): void {
+    const { left, right, bottom: marginBottom } = doc.page.margins;
+    if (doc.y + CHART_HEIGHT + 30 > doc.page.height - marginBottom) {
+      doc.addPage();
     }
 
-    return sections.join('\n');
+    const width = doc.page.width - left - right;
+    const top = doc.y;
+    const baseline = top + CHART_HEIGHT;
+    const max = trends.reduce((value, trend) => Math.max(value, trend.questionsCount), 0) || 1;
+    const slot = width / trends.length;
+    const barWidth = Math.max(slot * 0.7, 0.5);
+
+    doc.save();
+    doc.moveTo(left, baseline).lineTo(left + width, baseline).lineWidth(0.5).strokeColor('#999999').stroke();
+    trends.forEach((trend, index) => {
+      const barHeight = (trend.questionsCount / max) * CHART_HEIGHT;
+      if (barHeight > 0) {
+        doc.rect(left + index * slot + (slot - barWidth) / 2, baseline - barHeight, barWidth, barHeight).fill('#4a90d9');
+      }
+    });
+    doc.restore();
+
+    doc.fillColor('black').text(`每日题数（最高 ${max} 题）`, left, baseline + 4);
+    doc.moveDown();
+  }
+
+  private hasFont(): boolean {
+    return !!this.fontPath && existsSync(this.fontPath);
   }
 
   /**
@@ -107,36 +178,4 @@ export class PdfGeneratorService {
       return `${hours}小时${minutes}分钟`;
     }
   }
-
-  /**
-   * 使用 Puppeteer 生成 PDF（推荐用于复杂报告）
-   */
-  async generatePdfWithPuppeteer(htmlContent: string, options: { orientation?: Orientation } = {}): Promise<Buffer> {
-    // 实际实现需要安装 puppeteer
-    // import puppeteer from 'puppeteer';
-
-    // const browser = await puppeteer.launch();
-    // const page = await browser.newPage();
-
-    // await page.setContent(htmlContent);
-
-    // const pdfBuffer = await page.pdf({
-    //   format: 'A4',
-    //   orientation: options.orientation || 'portrait',
-    //   printBackground: true,
-    //   margin: {
-    //     top: '20px',
-    //     right: '20px',
-    //     bottom: '20px',
-    //     left: '20px',
-    //   },
-    // });
-
-    // await browser.close();
-
-    // return pdfBuffer;
-
-    // 返回模拟数据
-    return Buffer.from('Mock PDF content');
-  }
 }
@@ -1,5 +1,6 @@
 import { ApiProperty } from '@nestjs/swagger';
-import { IsString, IsNotEmpty, IsOptional, IsEnum, IsArray, MaxLength } from 'class-validator';
+import { IsString, IsNotEmpty, IsOptional, IsEnum, IsArray, MaxLength, IsBoolean } from 'class-validator';
+import { Transform } from 'class-transformer';
 
 export class CreateMistakeDto {
   @ApiProperty({ description: '科目ID', example: 'uuid-math' })
@@ -151,15 +152,30 @@ export class QueryMistakeDto {
   @IsOptional()
   keyword?: string;
 
-  @ApiProperty({ description: '排序方式', required: false, enum: ['recent', 'oldest', 'difficulty', 'reviewCount'] })
+  @ApiProperty({
+    description: '排序方式（有关键词且未指定时按相关度）',
+    required: false,
+    enum: ['recent', 'oldest', 'difficulty', 'reviewCount', 'relevance'],
+  })
   @IsString()
   @IsOptional()
-  sortBy?: 'recent' | 'oldest' | 'difficulty' | 'reviewCount';
+  sortBy?: 'recent' | 'oldest' | 'difficulty' | 'reviewCount' | 'relevance';
 
   @ApiProperty({ description: '时间范围', required: false })
   @IsString()
   @IsOptional()
   timeRange?: string;
+
+  @ApiProperty({ description: '分页游标：首页传空字符串，之后传上一页返回的 nextCursor；传入时忽略 page', required: false })
+  @IsString()
+  @IsOptional()
+  cursor?: string;
+
+  @ApiProperty({ description: '游标分页时是否返回总数', required: false, default: false })
+  @Transform(({ obj, key }) => obj[key] === true || obj[key] === 'true')
+  @IsBoolean()
+  @IsOptional()
+  withTotal?: boolean;
 }
 
 export class ParseMistakeDto {
@@ -182,11 +198,14 @@ export interface ParsedMistake {
 }
 
 export interface MistakeListResponse {
+  items: any[];
   data: any[];
-  total: number;
-  page: number;
+  total?: number; // 游标分页且未请求总数时不返回
+  page?: number;
   limit: number;
-  totalPages: number;
+  totalPages?: number;
+  nextCursor?: string | null;
+  hasMore?: boolean;
 }
 
 export interface MistakeStatsResponse {
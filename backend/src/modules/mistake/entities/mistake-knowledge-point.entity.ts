@@ -0,0 +1,27 @@
+import { Entity, PrimaryColumn, Column, ManyToOne, JoinColumn, Index } from 'typeorm';
+import { Mistake } from './mistake.entity';
+
+/**
+ * 错题 × 知识点 关联表
+ * mistakes.knowledge_points JSON 列的规范化副本，用于按知识点筛选和计数走索引
+ */
+@Entity('mistake_knowledge_points')
+@Index(['userId', 'subjectId', 'name'])
+export class MistakeKnowledgePoint {
+  @PrimaryColumn({ name: 'mistake_id', type: 'varchar', length: 36 })
+  mistakeId: string;
+
+  @PrimaryColumn({ type: 'varchar', length: 100 })
+  name: string;
+
+  @ManyToOne(() => Mistake, { onDelete: 'CASCADE' })
+  @JoinColumn({ name: 'mistake_id' })
+  mistake: Mistake;
+
+  // 冗余用户和科目，计数时无需回表
+  @Column({ name: 'user_id', type: 'varchar', length: 36 })
+  userId: string;
+
+  @Column({ name: 'subject_id', type: 'varchar', length: 64 })
+  subjectId: string;
+}
@@ -6,11 +6,18 @@ import {
   UpdateDateColumn,
   ManyToOne,
   JoinColumn,
+  Index,
+  BeforeInsert,
+  BeforeUpdate,
 } from 'typeorm';
 import { User } from '../../user/entities/user.entity';
 import { Subject } from '../../subject/entities/subject.entity';
 
 @Entity('mistakes')
+@Index(['userId', 'createdAt'])
+@Index(['userId', 'subjectId', 'masteryLevel'])
+@Index(['userId', 'subjectId', 'randomKey'])
+@Index('ft_mistakes_search', ['content', 'question', 'knowledgeText'], { fulltext: true, parser: 'ngram' })
 export class Mistake {
   @PrimaryGeneratedColumn('uuid')
   id: string;
@@ -57,6 +64,10 @@ export class Mistake {
   @Column({ name: 'knowledge_points', type: 'json', nullable: true })
   knowledgePoints: string[];
 
+  // 知识点的纯文本副本，仅供全文索引使用
+  @Column({ name: 'knowledge_text', type: 'text', nullable: true, select: false })
+  knowledgeText: string;
+
   @Column({ name: 'difficulty_level', type: 'enum', enum: ['easy', 'medium', 'hard'], default: 'medium' })
   difficultyLevel: string;
 
@@ -84,9 +95,29 @@ export class Mistake {
   @Column({ name: 'tags', type: 'json', nullable: true })
   tags: string[];
 
+  // 随机抽题键：插入时生成 [0, 1) 均匀随机数，抽题时按随机起点在索引上定位
+  // 列默认值兜底 insert() / 查询构建器插入（不触发 @BeforeInsert）
+  @Column({ name: 'random_key', type: 'double', default: () => '(RAND())' })
+  randomKey: number;
+
   @CreateDateColumn({ name: 'created_at' })
   createdAt: Date;
 
   @UpdateDateColumn({ name: 'updated_at' })
   updatedAt: Date;
+
+  @BeforeInsert()
+  @BeforeUpdate()
+  syncKnowledgeText() {
+    if (this.knowledgePoints !== undefined) {
+      this.knowledgeText = Array.isArray(this.knowledgePoints) ? this.knowledgePoints.join(' ') : null;
+    }
+  }
+
+  @BeforeInsert()
+  assignRandomKey() {
+    if (!this.randomKey) {
+      this.randomKey = Math.random();
+    }
+  }
 }
@@ -0,0 +1,159 @@
+import { Injectable, Logger } from '@nestjs/common';
+import { InjectRepository } from '@nestjs/typeorm';
+import { Repository, EntityManager, SelectQueryBuilder } from 'typeorm';
+import { Mistake } from './entities/mistake.entity';
+import { MistakeKnowledgePoint } from './entities/mistake-knowledge-point.entity';
+
+const NAME_MAX_LENGTH = 100;
+
+/**
+ * 知识点索引服务
+ * 在错题写入的同一事务中维护 mistake_knowledge_points，筛选和计数都走该表的索引
+ */
+@Injectable()
+export class KnowledgePointIndexService {
+  private readonly logger = new Logger(KnowledgePointIndexService.name);
+
+  constructor(
+    @InjectRepository(MistakeKnowledgePoint)
+    private knowledgePointRepository: Repository<MistakeKnowledgePoint>,
+  ) {}
+
+  /**
+   * 用错题当前的知识点覆盖关联行
+   */
+  async sync(
+    manager: EntityManager,
+    mistake: Pick<Mistake, 'id' | 'userId' | 'subjectId' | 'knowledgePoints'>,
+  ): Promise<void> {
+    const repository = manager.getRepository(MistakeKnowledgePoint);
+    await repository.delete({ mistakeId: mistake.id });
+
+    const names = this.normalize(mistake.knowledgePoints);
+    if (names.length === 0) return;
+
+    // 忽略仅大小写不同的重复项（列排序规则不区分大小写）
+    await repository
+      .createQueryBuilder()
+      .insert()
+      .into(MistakeKnowledgePoint)
+      .values(
+        names.map((name) => ({
+          mistakeId: mistake.id,
+          name,
+          userId: mistake.userId,
+          subjectId: mistake.subjectId,
+        })),
+      )
+      .orIgnore()
+      .execute();
+  }
+
+  /**
+   * 知识点或科目是否变化（决定是否需要重写关联行）
+   */
+  hasChanged(
+    before: Pick<Mistake, 'subjectId' | 'knowledgePoints'>,
+    after: Pick<Mistake, 'subjectId' | 'knowledgePoints'>,
+  ): boolean {
+    if (before.subjectId !== after.subjectId) return true;
+
+    const previous = this.normalize(before.knowledgePoints);
+    const current = this.normalize(after.knowledgePoints);
+    return previous.length !== current.length || previous.some((name, index) => name !== current[index]);
+  }
+
+  /**
+   * 追加“包含任一知识点”的筛选条件（EXISTS 走关联表主键）
+   */
+  applyFilter<T>(queryBuilder: SelectQueryBuilder<T>, alias: string, knowledgePoints: string[]): SelectQueryBuilder<T> {
+    const names = this.normalize(knowledgePoints);
+    if (names.length === 0) return queryBuilder;
+
+    return queryBuilder.andWhere(
+      (qb) => {
+        const subQuery = qb
+          .subQuery()
+          .select('1')
+          .from(MistakeKnowledgePoint, 'kp')
+          .where(`kp.mistakeId = ${alias}.id`)
+          .andWhere('kp.name IN (:...knowledgePointNames)')
+          .getQuery();
+        return `EXISTS ${subQuery}`;
+      },
+      { knowledgePointNames: names },
+    );
+  }
+
+  /**
+   * 按知识点统计科目下的错题数量（降序）
+   */
+  async countByPoint(userId: string, subjectId: string): Promise<Array<{ name: string; count: number }>> {
+    const rows = await this.knowledgePointRepository
+      .createQueryBuilder('kp')
+      .select('kp.name', 'name')
+      .addSelect('COUNT(*)', 'count')
+      .where('kp.userId = :userId', { userId })
+      .andWhere('kp.subjectId = :subjectId', { subjectId })
+      .groupBy('kp.name')
+      .orderBy('count', 'DESC')
+      .getRawMany();
+
+    return rows.map((row) => ({ name: row.name, count: parseInt(row.count, 10) || 0 }));
+  }
+
+  /**
+   * 从 mistakes.knowledge_points 重建关联表和 knowledge_text（不传 userId 时重建全部用户）
+   */
+  async rebuild(userId?: string): Promise<number> {
+    const params = userId ? [userId] : [];
+
+    const rows = await this.knowledgePointRepository.manager.transaction(async (manager) => {
+      await manager.query(
+        `DELETE FROM mistake_knowledge_points WHERE 1 = 1 ${userId ? 'AND user_id = ?' : ''}`,
+        params,
+      );
+
+      const result = await manager.query(
+        `INSERT IGNORE INTO mistake_knowledge_points (mistake_id, name, user_id, subject_id)
+         SELECT m.id, LEFT(TRIM(jt.name), ${NAME_MAX_LENGTH}), m.user_id, m.subject_id
+         FROM mistakes m,
+              JSON_TABLE(m.knowledge_points, '$[*]' COLUMNS (name VARCHAR(255) PATH '$')) jt
+         WHERE m.knowledge_points IS NOT NULL AND TRIM(jt.name) <> '' ${userId ? 'AND m.user_id = ?' : ''}`,
+        params,
+      );
+
+      // 同步全文索引使用的纯文本副本
+      await manager.query(
+        `UPDATE mistakes m
+         SET m.knowledge_text = (
+               SELECT GROUP_CONCAT(jt.name SEPARATOR ' ')
+               FROM JSON_TABLE(m.knowledge_points, '$[*]' COLUMNS (name VARCHAR(255) PATH '$')) jt
+             ),
+             m.updated_at = m.updated_at
+         WHERE 1 = 1 ${userId ? 'AND m.user_id = ?' : ''}`,
+        params,
+      );
+
+      return result?.affectedRows ?? 0;
+    });
+
+    this.logger.log(`Rebuilt ${rows} knowledge point rows${userId ? ` for user ${userId}` : ''}`);
+    return rows;
+  }
+
+  /**
+   * 去空白、去重、截断到列宽，并保持原有顺序
+   */
+  private normalize(knowledgePoints?: string[] | null): string[] {
+    if (!Array.isArray(knowledgePoints)) return [];
+
+    const names = new Set<string>();
+    for (const point of knowledgePoints) {
+      if (typeof point !== 'string') continue;
+      const name = point.trim().slice(0, NAME_MAX_LENGTH);
+      if (name) names.add(name);
+    }
+    return [...names];
+  }
+}
@@ -0,0 +1,83 @@
+import { Injectable, Logger } from '@nestjs/common';
+import { ObjectLiteral, SelectQueryBuilder } from 'typeorm';
+
+// 与 ngram_token_size 默认值一致，更短的词无法命中全文索引
+const MIN_TERM_LENGTH = 2;
+const MAX_TERMS = 8;
+// 布尔模式的保留字符
+const BOOLEAN_OPERATORS = /[+\-<>()~*"@]/g;
+
+export const SEARCH_SCORE_ALIAS = 'search_score';
+
+/**
+ * 错题全文检索
+ * 基于 (content, question, knowledge_text) 上的 ngram FULLTEXT 索引，按相关度排序，检索耗时单独记录
+ */
+@Injectable()
+export class MistakeSearchService {
+  private readonly logger = new Logger(MistakeSearchService.name);
+  private readonly slowMs = parseInt(process.env.MISTAKE_SEARCH_SLOW_MS, 10) || 200;
+
+  /**
+   * 追加关键词条件，返回是否使用了全文索引
+   * ranked 为 true 时额外选出相关度得分（别名 SEARCH_SCORE_ALIAS）
+   */
+  applyKeyword<T extends ObjectLiteral>(
+    queryBuilder: SelectQueryBuilder<T>,
+    alias: string,
+    keyword: string,
+    ranked = false,
+  ): boolean {
+    const booleanQuery = this.toBooleanQuery(keyword);
+
+    if (!booleanQuery) {
+      // 单字关键词无法走 ngram 索引，退回模糊匹配
+      queryBuilder.andWhere(`(${alias}.content LIKE :keyword OR ${alias}.question LIKE :keyword)`, {
+        keyword: `%${keyword.trim()}%`,
+      });
+      return false;
+    }
+
+    const match = `MATCH(${alias}.content, ${alias}.question, ${alias}.knowledgeText) AGAINST (:searchQuery IN BOOLEAN MODE)`;
+    queryBuilder.andWhere(match, { searchQuery: booleanQuery });
+    if (ranked) {
+      queryBuilder.addSelect(match, SEARCH_SCORE_ALIAS);
+    }
+    return true;
+  }
+
+  /**
+   * 执行检索并记录耗时；超过阈值时以 warn 级别输出
+   */
+  async measure<T>(userId: string, keyword: string, run: () => Promise<T>, hits: (result: T) => number): Promise<T> {
+    const startedAt = Date.now();
+    const result = await run();
+    const elapsed = Date.now() - startedAt;
+
+    const message = `search user=${userId} terms=${this.terms(keyword).length} hits=${hits(result)} ${elapsed}ms`;
+    if (elapsed >= this.slowMs) {
+      this.logger.warn(message);
+    } else {
+      this.logger.debug(message);
+    }
+
+    return result;
+  }
+
+  /**
+   * 关键词转为布尔模式查询：每个词作为必须命中的短语
+   */
+  private toBooleanQuery(keyword: string): string | null {
+    const terms = this.terms(keyword).filter((term) => [...term].length >= MIN_TERM_LENGTH);
+    if (terms.length === 0) return null;
+    return terms.map((term) => `+"${term}"`).join(' ');
+  }
+
+  private terms(keyword: string): string[] {
+    return (keyword || '')
+      .replace(BOOLEAN_OPERATORS, ' ')
+      .split(/\s+/)
+      .filter(Boolean)
+      .slice(0, MAX_TERMS);
+  }
+}
@@ -1,7 +1,8 @@
-import { Controller, Post, Body, Get, Put, Delete, Param, Query, UseGuards, Request } from '@nestjs/common';
+import { Controller, Post, Body, Get, Put, Delete, Param, Query, UseGuards, UseInterceptors, Request } from '@nestjs/common';
 import { ApiTags, ApiOperation, ApiBearerAuth } from '@nestjs/swagger';
 import { MistakeService } from './mistake.service';
 import { JwtAuthGuard } from '../../common/guards/jwt-auth.guard';
+import { ETagInterceptor } from '../../common/interceptors/etag.interceptor';
 import { CreateMistakeDto, UpdateMistakeDto, QueryMistakeDto, ParseMistakeDto } from './dto/mistake.dto';
 
 @ApiTags('mistake')
@@ -30,6 +31,7 @@ export class MistakeController {
   }
 
   @Get()
+  @UseInterceptors(ETagInterceptor)
   @ApiOperation({ summary: '获取错题列表' })
   async findAll(@Request() req, @Query() query: QueryMistakeDto) {
     return this.mistakeService.findAll(req.user.sub, query);
@@ -4,14 +4,18 @@ import { JwtModule } from '@nestjs/jwt';
 import { MistakeController } from './mistake.controller';
 import { MistakeService } from './mistake.service';
 import { QuestionParserService } from './question-parser.service';
+import { KnowledgePointIndexService } from './knowledge-point-index.service';
+import { MistakeSearchService } from './mistake-search.service';
 import { Mistake } from './entities/mistake.entity';
+import { MistakeKnowledgePoint } from './entities/mistake-knowledge-point.entity';
 import { Subject } from '../subject/entities/subject.entity';
 import { User } from '../user/entities/user.entity';
+import { StatisticsModule } from '../statistics/statistics.module';
 
 @Module({
-  imports: [TypeOrmModule.forFeature([Mistake, Subject, User]), JwtModule],
+  imports: [TypeOrmModule.forFeature([Mistake, MistakeKnowledgePoint, Subject, User]), JwtModule, StatisticsModule],
   controllers: [MistakeController],
-  providers: [MistakeService, QuestionParserService],
-  exports: [MistakeService],
+  providers: [MistakeService, QuestionParserService, KnowledgePointIndexService, MistakeSearchService],
+  exports: [MistakeService, KnowledgePointIndexService],
 })
 export class MistakeModule {}
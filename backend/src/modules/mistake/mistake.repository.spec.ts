@@ -6,12 +6,18 @@ import { Mistake } from './entities/mistake.entity';
 import { Subject } from '../subject/entities/subject.entity';
 import { NotFoundException } from '@nestjs/common';
 import { QuestionParserService } from './question-parser.service';
+import { CacheService } from '../cache/cache.service';
+import { StatsRollupService } from '../statistics/stats-rollup.service';
+import { KnowledgePointIndexService } from './knowledge-point-index.service';
+import { MistakeSearchService } from './mistake-search.service';
 
 describe('MistakeService', () => {
   let service: MistakeService;
   let mistakeRepository: jest.Mocked<Repository<Mistake>>;
   let subjectRepository: jest.Mocked<Repository<Subject>>;
   let questionParser: jest.Mocked<QuestionParserService>;
+  let statsRollupService: jest.Mocked<StatsRollupService>;
+  let knowledgePointIndex: jest.Mocked<KnowledgePointIndexService>;
 
   const mockSubject: Subject = {
     id: 'subject-123',
@@ -47,6 +53,7 @@ describe('MistakeService', () => {
     userAnswer: 'A',
     analysis: '1+1=2',
     knowledgePoints: ['加法'],
+    knowledgeText: '加法',
     difficultyLevel: 'easy',
     masteryLevel: 'unknown',
     reviewCount: 0,
@@ -56,15 +63,19 @@ describe('MistakeService', () => {
     source: 'practice',
     isFavorite: false,
     tags: [],
+    randomKey: 0.5,
     createdAt: new Date(),
     updatedAt: new Date(),
     user: null as any,
+    syncKnowledgeText: jest.fn(),
+    assignRandomKey: jest.fn(),
   };
 
   beforeEach(async () => {
     const module: TestingModule = await Test.createTestingModule({
       providers: [
         MistakeService,
+        MistakeSearchService,
         {
           provide: getRepositoryToken(Mistake),
           useValue: {
@@ -77,6 +88,10 @@ describe('MistakeService', () => {
             update: jest.fn(),
             remove: jest.fn(),
             createQueryBuilder: jest.fn(),
+            manager: {
+              transaction: jest.fn(),
+              getRepository: jest.fn(),
+            },
           },
         },
         {
@@ -92,6 +107,29 @@ describe('MistakeService', () => {
             parse: jest.fn(),
           },
         },
+        {
+          provide: CacheService,
+          useValue: {
+            del: jest.fn(),
+            invalidatePrefix: jest.fn(),
+          },
+        },
+        {
+          provide: StatsRollupService,
+          useValue: {
+            applyMistakeChange: jest.fn(),
+            applyMistakeChanges: jest.fn(),
+            getMistakeSummary: jest.fn(),
+          },
+        },
+        {
+          provide: KnowledgePointIndexService,
+          useValue: {
+            sync: jest.fn(),
+            hasChanged: jest.fn().mockReturnValue(false),
+            countByPoint: jest.fn(),
+          },
+        },
       ],
     }).compile();
 
@@ -99,6 +137,15 @@ describe('MistakeService', () => {
     mistakeRepository = module.get(getRepositoryToken(Mistake));
     subjectRepository = module.get(getRepositoryToken(Subject));
     questionParser = module.get(QuestionParserService);
+    statsRollupService = module.get(StatsRollupService);
+    knowledgePointIndex = module.get(KnowledgePointIndexService);
+
+    // 事务内的仓库指向同一组 mock
+    const manager = mistakeRepository.manager as any;
+    manager.getRepository.mockImplementation((entity: any) =>
+      entity === Subject ? subjectRepository : mistakeRepository,
+    );
+    manager.transaction.mockImplementation((work: any) => work(manager));
   });
 
   afterEach(() => {
@@ -126,6 +173,12 @@ describe('MistakeService', () => {
       expect(subjectRepository.findOne).toHaveBeenCalledWith({
         where: { id: createDto.subjectId },
       });
+      expect(statsRollupService.applyMistakeChange).toHaveBeenCalledWith(
+        expect.anything(),
+        null,
+        mockMistake,
+      );
+      expect(knowledgePointIndex.sync).toHaveBeenCalledWith(expect.anything(), mockMistake);
     });
 
     it('should throw NotFoundException if subject not found', async () => {
@@ -169,6 +222,7 @@ describe('MistakeService', () => {
         leftJoinAndSelect: jest.fn().mockReturnThis(),
         andWhere: jest.fn().mockReturnThis(),
         orderBy: jest.fn().mockReturnThis(),
+        addOrderBy: jest.fn().mockReturnThis(),
         skip: jest.fn().mockReturnThis(),
         take: jest.fn().mockReturnThis(),
         getManyAndCount: jest.fn().mockResolvedValue([[mockMistake], 1]),
@@ -182,12 +236,77 @@ describe('MistakeService', () => {
       expect(result.total).toBe(1);
     });
 
+    it('should page by cursor without OFFSET or COUNT', async () => {
+      const second = { ...mockMistake, id: '2' };
+      const mockQueryBuilder = {
+        where: jest.fn().mockReturnThis(),
+        leftJoinAndSelect: jest.fn().mockReturnThis(),
+        andWhere: jest.fn().mockReturnThis(),
+        addSelect: jest.fn().mockReturnThis(),
+        orderBy: jest.fn().mockReturnThis(),
+        addOrderBy: jest.fn().mockReturnThis(),
+        limit: jest.fn().mockReturnThis(),
+        getCount: jest.fn(),
+        getRawAndEntities: jest.fn().mockResolvedValue({
+          entities: [mockMistake, second],
+          raw: [
+            { mistake_id: '1', keyset_cursor_value: '2024-01-02 00:00:00.000001' },
+            { mistake_id: '2', keyset_cursor_value: '2024-01-01 00:00:00.000000' },
+          ],
+        }),
+      };
+
+      jest.spyOn(mistakeRepository, 'createQueryBuilder').mockReturnValue(mockQueryBuilder as any);
+
+      const first = await service.findAll('user-123', { limit: 1, cursor: '' });
+
+      expect(first.items).toEqual([mockMistake]);
+      expect(first.hasMore).toBe(true);
+      expect(first.total).toBeUndefined();
+      expect(mockQueryBuilder.limit).toHaveBeenCalledWith(2);
+      expect(mockQueryBuilder.getCount).not.toHaveBeenCalled();
+
+      await service.findAll('user-123', { limit: 1, cursor: first.nextCursor });
+
+      expect(mockQueryBuilder.andWhere).toHaveBeenCalledWith(
+        expect.stringContaining(':keysetValue'),
+        { keysetValue: '2024-01-02 00:00:00.000001', keysetId: '1' },
+      );
+    });
+
+    it('should rank keyword searches by full-text relevance', async () => {
+      const mockQueryBuilder = {
+        where: jest.fn().mockReturnThis(),
+        leftJoinAndSelect: jest.fn().mockReturnThis(),
+        andWhere: jest.fn().mockReturnThis(),
+        addSelect: jest.fn().mockReturnThis(),
+        orderBy: jest.fn().mockReturnThis(),
+        addOrderBy: jest.fn().mockReturnThis(),
+        offset: jest.fn().mockReturnThis(),
+        limit: jest.fn().mockReturnThis(),
+        clone: jest.fn(),
+        getMany: jest.fn().mockResolvedValue([mockMistake]),
+      };
+      mockQueryBuilder.clone.mockReturnValue({ getCount: jest.fn().mockResolvedValue(1) });
+
+      jest.spyOn(mistakeRepository, 'createQueryBuilder').mockReturnValue(mockQueryBuilder as any);
+
+      const result = await service.findAll('user-123', { keyword: '勾股 定理' });
+
+      expect(mockQueryBuilder.andWhere).toHaveBeenCalledWith(expect.stringContaining('MATCH('), {
+        searchQuery: '+"勾股" +"定理"',
+      });
+      expect(mockQueryBuilder.orderBy).toHaveBeenCalledWith('search_score', 'DESC');
+      expect(result.total).toBe(1);
+    });
+
     it('should filter by subjectId', async () => {
       const mockQueryBuilder = {
         where: jest.fn().mockReturnThis(),
         leftJoinAndSelect: jest.fn().mockReturnThis(),
         andWhere: jest.fn().mockReturnThis(),
         orderBy: jest.fn().mockReturnThis(),
+        addOrderBy: jest.fn().mockReturnThis(),
         skip: jest.fn().mockReturnThis(),
         take: jest.fn().mockReturnThis(),
         getManyAndCount: jest.fn().mockResolvedValue([[mockMistake], 1]),
@@ -209,6 +328,7 @@ describe('MistakeService', () => {
         leftJoinAndSelect: jest.fn().mockReturnThis(),
         andWhere: jest.fn().mockReturnThis(),
         orderBy: jest.fn().mockReturnThis(),
+        addOrderBy: jest.fn().mockReturnThis(),
         skip: jest.fn().mockReturnThis(),
         take: jest.fn().mockReturnThis(),
         getManyAndCount: jest.fn().mockResolvedValue([[mockMistake], 1]),
@@ -289,30 +409,15 @@ describe('MistakeService', () => {
   });
 
   describe('getStatsOverview', () => {
-    it('should return statistics overview', async () => {
-      mistakeRepository.count
-        .mockResolvedValueOnce(10) // total
-        .mockResolvedValueOnce(3)  // mastered
-        .mockResolvedValueOnce(4)  // familiar
-        .mockResolvedValueOnce(3)  // unknown
-        .mockResolvedValueOnce(2); // favorite
-
-      const mockRawResult = {
-        subjectId: 'subject-123',
-        subjectName: '数学',
-        count: '10',
-      };
-
-      const mockQueryBuilder = {
-        select: jest.fn().mockReturnThis(),
-        addSelect: jest.fn().mockReturnThis(),
-        leftJoin: jest.fn().mockReturnThis(),
-        where: jest.fn().mockReturnThis(),
-        groupBy: jest.fn().mockReturnThis(),
-        getRawMany: jest.fn().mockResolvedValue([mockRawResult]),
-      };
-
-      jest.spyOn(mistakeRepository, 'createQueryBuilder').mockReturnValue(mockQueryBuilder as any);
+    it('should return statistics overview from the rollup', async () => {
+      statsRollupService.getMistakeSummary.mockResolvedValue({
+        total: 10,
+        masteredCount: 3,
+        familiarCount: 4,
+        unknownCount: 3,
+        favoriteCount: 2,
+        subjectStats: [{ subjectId: 'subject-123', subjectName: '数学', count: 10 }],
+      });
 
       const result = await service.getStatsOverview('user-123');
 
@@ -321,6 +426,8 @@ describe('MistakeService', () => {
       expect(result.familiarCount).toBe(4);
       expect(result.unknownCount).toBe(3);
       expect(result.favoriteCount).toBe(2);
+      expect(result.masteryRate).toBe('30.00');
+      expect(mistakeRepository.count).not.toHaveBeenCalled();
     });
   });
 });
@@ -1,11 +1,37 @@
 import { Injectable, NotFoundException, BadRequestException, Inject } from '@nestjs/common';
 import { InjectRepository } from '@nestjs/typeorm';
-import { Repository } from 'typeorm';
+import { Repository, SelectQueryBuilder } from 'typeorm';
 import { Mistake } from './entities/mistake.entity';
 import { Subject } from '../subject/entities/subject.entity';
 import { QuestionParserService } from './question-parser.service';
-import { CreateMistakeDto, UpdateMistakeDto, QueryMistakeDto, ParsedMistake } from './dto/mistake.dto';
+import { CreateMistakeDto, UpdateMistakeDto, QueryMistakeDto, ParsedMistake, MistakeListResponse } from './dto/mistake.dto';
 import { CacheService } from '../cache/cache.service';
+import { StatsRollupService } from '../statistics/stats-rollup.service';
+import { KnowledgePointIndexService } from './knowledge-point-index.service';
+import { MistakeSearchService, SEARCH_SCORE_ALIAS } from './mistake-search.service';
+import { paginateByKeyset, datetimeCursorValue } from '../../common/utils/keyset';
+
+// 各排序方式：column 用于页码分页，sortKey/cursorValue 用于游标分页
+const MISTAKE_SORTS: Record<
+  string,
+  { column: string; sortKey: string; cursorValue?: string; order: 'ASC' | 'DESC' }
+> = {
+  recent: {
+    column: 'mistake.createdAt',
+    sortKey: 'mistake.createdAt',
+    cursorValue: datetimeCursorValue('mistake.createdAt'),
+    order: 'DESC',
+  },
+  oldest: {
+    column: 'mistake.createdAt',
+    sortKey: 'mistake.createdAt',
+    cursorValue: datetimeCursorValue('mistake.createdAt'),
+    order: 'ASC',
+  },
+  // 枚举按定义顺序排序，游标比较同样取序号
+  difficulty: { column: 'mistake.difficultyLevel', sortKey: '(mistake.difficultyLevel + 0)', order: 'DESC' },
+  reviewCount: { column: 'mistake.reviewCount', sortKey: 'mistake.reviewCount', order: 'DESC' },
+};
 
 @Injectable()
 export class MistakeService {
@@ -16,6 +42,9 @@ export class MistakeService {
     private subjectRepository: Repository<Subject>,
     private questionParser: QuestionParserService,
     private cacheService: CacheService,
+    private statsRollupService: StatsRollupService,
+    private knowledgePointIndex: KnowledgePointIndexService,
+    private mistakeSearch: MistakeSearchService,
   ) {}
 
   async parseContent(content: string): Promise<ParsedMistake> {
@@ -73,13 +102,18 @@ export class MistakeService {
       ...createDto,
     });
 
-    const saved = await this.mistakeRepository.save(mistake);
+    return this.mistakeRepository.manager.transaction(async (manager) => {
+      const saved = await manager.getRepository(Mistake).save(mistake);
 
-    // 更新科目的错题数量
-    subject.mistakeCount += 1;
-    await this.subjectRepository.save(subject);
+      // 更新科目的错题数量
+      subject.mistakeCount += 1;
+      await manager.getRepository(Subject).save(subject);
 
-    return saved;
+      await this.statsRollupService.applyMistakeChange(manager, null, saved);
+      await this.knowledgePointIndex.sync(manager, saved);
+
+      return saved;
+    });
   }
 
   async parseAndSave(userId: string, content: string) {
@@ -96,7 +130,7 @@ export class MistakeService {
     return this.create(userId, parsed as any);
   }
 
-  async findAll(userId: string, query: QueryMistakeDto) {
+  async findAll(userId: string, query: QueryMistakeDto): Promise<MistakeListResponse> {
     const {
       subjectId,
       type,
@@ -108,6 +142,8 @@ export class MistakeService {
       keyword,
       sortBy = 'recent',
       timeRange,
+      cursor,
+      withTotal,
     } = query;
 
     const queryBuilder = this.mistakeRepository
@@ -115,23 +151,7 @@ export class MistakeService {
       .where('mistake.userId = :userId', { userId })
       .leftJoinAndSelect('mistake.subject', 'subject');
 
-    // 根据 sortBy 参数设置排序
-    switch (sortBy) {
-      case 'recent':
-        queryBuilder.orderBy('mistake.createdAt', 'DESC');
-        break;
-      case 'oldest':
-        queryBuilder.orderBy('mistake.createdAt', 'ASC');
-        break;
-      case 'difficulty':
-        queryBuilder.orderBy('mistake.difficultyLevel', 'DESC');
-        break;
-      case 'reviewCount':
-        queryBuilder.orderBy('mistake.reviewCount', 'DESC');
-        break;
-      default:
-        queryBuilder.orderBy('mistake.createdAt', 'DESC');
-    }
+    const sort = MISTAKE_SORTS[sortBy] || MISTAKE_SORTS.recent;
 
     if (subjectId) {
       queryBuilder.andWhere('mistake.subjectId = :subjectId', { subjectId });
@@ -153,11 +173,11 @@ export class MistakeService {
       queryBuilder.andWhere('mistake.isFavorite = :isFavorite', { isFavorite });
     }
 
+    // 关键词走全文索引；未指定排序时按相关度排序（游标分页仍按所选排序键）
+    let ranked = false;
     if (keyword) {
-      queryBuilder.andWhere(
-        '(mistake.content LIKE :keyword OR mistake.question LIKE :keyword)',
-        { keyword: `%${keyword}%` },
-      );
+      const wantsRelevance = cursor === undefined && (!query.sortBy || query.sortBy === 'relevance');
+      ranked = this.mistakeSearch.applyKeyword(queryBuilder, 'mistake', keyword, wantsRelevance) && wantsRelevance;
     }
 
     // 处理时间范围筛选
@@ -187,7 +207,70 @@ export class MistakeService {
       }
     }
 
+    const run = () => this.paginateList(queryBuilder, sort, { page, limit, cursor, withTotal }, ranked);
+    if (!keyword) {
+      return run();
+    }
+    return this.mistakeSearch.measure(userId, keyword, run, (result) => result.items.length);
+  }
+
+  /**
+   * 错题列表分页：游标 / 相关度 / 页码三种方式
+   */
+  private async paginateList(
+    queryBuilder: SelectQueryBuilder<Mistake>,
+    sort: (typeof MISTAKE_SORTS)[string],
+    options: { page: number; limit: number; cursor?: string; withTotal?: boolean },
+    ranked: boolean,
+  ): Promise<MistakeListResponse> {
+    const { page, limit, cursor, withTotal } = options;
+
+    // 游标分页：不做 OFFSET 扫描，总数按需计算
+    if (cursor !== undefined) {
+      const total = withTotal ? await queryBuilder.clone().getCount() : undefined;
+      const { items, nextCursor, hasMore } = await paginateByKeyset(queryBuilder, {
+        alias: 'mistake',
+        sortKey: sort.sortKey,
+        cursorValue: sort.cursorValue,
+        order: sort.order,
+        limit,
+        cursor,
+      });
+
+      return {
+        items,
+        data: items,
+        total,
+        limit,
+        nextCursor,
+        hasMore,
+      };
+    }
+
+    if (ranked) {
+      // 按相关度排序；科目为多对一关联，可直接 OFFSET/LIMIT
+      const total = await queryBuilder.clone().getCount();
+      const items = await queryBuilder
+        .orderBy(SEARCH_SCORE_ALIAS, 'DESC')
+        .addOrderBy('mistake.createdAt', 'DESC')
+        .addOrderBy('mistake.id', 'DESC')
+        .offset((page - 1) * limit)
+        .limit(limit)
+        .getMany();
+
+      return {
+        items,
+        data: items,
+        total,
+        page,
+        limit,
+        totalPages: Math.ceil(total / limit),
+      };
+    }
+
     const [items, total] = await queryBuilder
+      .orderBy(sort.column, sort.order)
+      .addOrderBy('mistake.id', sort.order)
       .skip((page - 1) * limit)
       .take(limit)
       .getManyAndCount();
@@ -222,12 +305,13 @@ export class MistakeService {
       throw new NotFoundException('错题不存在');
     }
 
+    const before = { ...mistake };
     Object.assign(mistake, updateDto);
-    const result = await this.mistakeRepository.save(mistake);
+    const result = await this.saveWithRollup(before, mistake);
 
     // 使缓存失效
     await this.cacheService.del(`mistake:${id}`);
-    // await this.cacheService.del(`mistake:list:*`); // TODO: 实现模式删除
+    await this.cacheService.invalidatePrefix(`mistake:list:${mistake.userId}:`);
 
     return result;
   }
@@ -239,8 +323,9 @@ export class MistakeService {
       throw new NotFoundException('错题不存在');
     }
 
+    const before = { ...mistake };
     mistake.masteryLevel = masteryLevel;
-    return this.mistakeRepository.save(mistake);
+    return this.saveWithRollup(before, mistake);
   }
 
   async toggleFavorite(id: string) {
@@ -250,8 +335,9 @@ export class MistakeService {
       throw new NotFoundException('错题不存在');
     }
 
+    const before = { ...mistake };
     mistake.isFavorite = !mistake.isFavorite;
-    return this.mistakeRepository.save(mistake);
+    return this.saveWithRollup(before, mistake);
   }
 
   async remove(id: string) {
@@ -261,77 +347,97 @@ export class MistakeService {
       throw new NotFoundException('错题不存在');
     }
 
-    await this.mistakeRepository.remove(mistake);
+    await this.mistakeRepository.manager.transaction(async (manager) => {
+      await manager.getRepository(Mistake).remove(mistake);
 
-    // 更新科目的错题数量
-    const subject = await this.subjectRepository.findOne({
-      where: { id: mistake.subjectId },
-    });
+      // 更新科目的错题数量
+      const subjectRepository = manager.getRepository(Subject);
+      const subject = await subjectRepository.findOne({
+        where: { id: mistake.subjectId },
+      });
 
-    if (subject && subject.mistakeCount > 0) {
-      subject.mistakeCount -= 1;
-      await this.subjectRepository.save(subject);
-    }
+      if (subject && subject.mistakeCount > 0) {
+        subject.mistakeCount -= 1;
+        await subjectRepository.save(subject);
+      }
+
+      await this.statsRollupService.applyMistakeChange(manager, mistake, null);
+    });
 
     return { success: true };
   }
 
   async batchRemove(ids: string[]) {
-    const mistakes = await this.mistakeRepository.findBy({ id: ids as any });
-
-    // 统计每个科目的错题数量变化
-    const subjectCountMap = new Map<string, number>();
-    for (const mistake of mistakes) {
-      const count = subjectCountMap.get(mistake.subjectId) || 0;
-      subjectCountMap.set(mistake.subjectId, count + 1);
+    const uniqueIds = [...new Set(ids || [])];
+    if (uniqueIds.length === 0) {
+      return { success: true, count: 0 };
     }
 
-    await this.mistakeRepository.remove(mistakes);
-
-    // 更新科目的错题数量
-    for (const [subjectId, count] of subjectCountMap) {
-      const subject = await this.subjectRepository.findOne({
-        where: { id: subjectId },
-      });
-
-      if (subject && subject.mistakeCount >= count) {
-        subject.mistakeCount -= count;
-        await this.subjectRepository.save(subject);
+    const mistakes = await this.mistakeRepository.manager.transaction(async (manager) => {
+      // 只取统计需要的列，并锁定待删除的行
+      const rows = await manager
+        .getRepository(Mistake)
+        .createQueryBuilder('mistake')
+        .select([
+          'mistake.id',
+          'mistake.userId',
+          'mistake.subjectId',
+          'mistake.masteryLevel',
+          'mistake.isFavorite',
+          'mistake.createdAt',
+        ])
+        .where('mistake.id IN (:...ids)', { ids: uniqueIds })
+        .setLock('pessimistic_write')
+        .getMany();
+
+      if (rows.length === 0) {
+        return rows;
       }
-    }
 
-    return { success: true, count: mistakes.length };
-  }
+      await manager
+        .createQueryBuilder()
+        .delete()
+        .from(Mistake)
+        .whereInIds(rows.map((mistake) => mistake.id))
+        .execute();
+
+      // 统计每个科目的错题数量变化，一条 UPDATE 完成递减
+      const subjectCountMap = new Map<string, number>();
+      for (const mistake of rows) {
+        subjectCountMap.set(mistake.subjectId, (subjectCountMap.get(mistake.subjectId) || 0) + 1);
+      }
 
-  async getStatsOverview(userId: string) {
-    const total = await this.mistakeRepository.count({ where: { userId } });
+      const cases = [...subjectCountMap.keys()].map(() => 'WHEN ? THEN ?').join(' ');
+      const caseParams = [...subjectCountMap.entries()].flat();
+      const subjectIds = [...subjectCountMap.keys()];
+      await manager.query(
+        `UPDATE subjects
+         SET mistake_count = GREATEST(mistake_count - (CASE id ${cases} ELSE 0 END), 0)
+         WHERE id IN (${subjectIds.map(() => '?').join(', ')})`,
+        [...caseParams, ...subjectIds],
+      );
 
-    const masteredCount = await this.mistakeRepository.count({
-      where: { userId, masteryLevel: 'mastered' },
-    });
+      await this.statsRollupService.applyMistakeChanges(
+        manager,
+        rows.map((before) => ({ before, after: null })),
+      );
 
-    const familiarCount = await this.mistakeRepository.count({
-      where: { userId, masteryLevel: 'familiar' },
+      return rows;
     });
 
-    const unknownCount = await this.mistakeRepository.count({
-      where: { userId, masteryLevel: 'unknown' },
-    });
+    // 批量使缓存失效
+    await this.cacheService.delMany(mistakes.map((mistake) => `mistake:${mistake.id}`));
+    for (const userId of new Set(mistakes.map((mistake) => mistake.userId))) {
+      await this.cacheService.invalidatePrefix(`mistake:list:${userId}:`);
+    }
 
-    const favoriteCount = await this.mistakeRepository.count({
-      where: { userId, isFavorite: true },
-    });
+    return { success: true, count: mistakes.length };
+  }
 
-    // 按科目统计
-    const subjectStats = await this.mistakeRepository
-      .createQueryBuilder('mistake')
-      .select('mistake.subjectId', 'subjectId')
-      .addSelect('subject.name', 'subjectName')
-      .addSelect('COUNT(*)', 'count')
-      .leftJoin('mistake.subject', 'subject')
-      .where('mistake.userId = :userId', { userId })
-      .groupBy('mistake.subjectId')
-      .getRawMany();
+  async getStatsOverview(userId: string) {
+    // 读取汇总表，避免每次扫描错题表
+    const summary = await this.statsRollupService.getMistakeSummary(userId);
+    const { total, masteredCount, familiarCount, unknownCount, favoriteCount } = summary;
 
     return {
       total,
@@ -340,43 +446,31 @@ export class MistakeService {
       unknownCount,
       favoriteCount,
       masteryRate: total > 0 ? ((masteredCount / total) * 100).toFixed(2) : '0',
-      subjectStats: subjectStats.map(s => ({
-        subjectId: s.subjectId,
-        subjectName: s.subjectName,
-        count: parseInt(s.count),
-      })),
+      subjectStats: summary.subjectStats,
     };
   }
 
   async getStatsBySubject(userId: string, subjectId: string) {
-    // 获取该科目下所有错题的知识点分布
-    const mistakes = await this.mistakeRepository
-      .createQueryBuilder('mistake')
-      .select('mistake.knowledgePoints', 'knowledgePoints')
-      .where('mistake.userId = :userId', { userId })
-      .andWhere('mistake.subjectId = :subjectId', { subjectId })
-      .getMany();
-
-    // 统计知识点
-    const knowledgePointMap = new Map<string, number>();
-
-    mistakes.forEach((mistake) => {
-      const points = mistake.knowledgePoints || [];
-      points.forEach((point) => {
-        const current = knowledgePointMap.get(point) || 0;
-        knowledgePointMap.set(point, current + 1);
-      });
-    });
-
-    // 转换为数组格式
-    const knowledgePoints = Array.from(knowledgePointMap.entries()).map(([name, count]) => ({
-      name,
-      count,
-    }));
+    // 知识点分布直接按关联表分组计数
+    const knowledgePoints = await this.knowledgePointIndex.countByPoint(userId, subjectId);
 
     return {
       subjectId,
       knowledgePoints,
     };
   }
+
+  /**
+   * 保存错题并在同一事务中更新统计汇总和知识点索引
+   */
+  private async saveWithRollup(before: Mistake, mistake: Mistake) {
+    return this.mistakeRepository.manager.transaction(async (manager) => {
+      const saved = await manager.getRepository(Mistake).save(mistake);
+      await this.statsRollupService.applyMistakeChange(manager, before, saved);
+      if (this.knowledgePointIndex.hasChanged(before, saved)) {
+        await this.knowledgePointIndex.sync(manager, saved);
+      }
+      return saved;
+    });
+  }
 }
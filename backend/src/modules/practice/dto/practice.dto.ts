@@ -1,6 +1,6 @@
 import { ApiProperty, ApiPropertyOptional } from '@nestjs/swagger';
-import { IsString, IsNotEmpty, IsNumber, IsOptional, IsBoolean, Min, Max, IsArray, ValidateNested } from 'class-validator';
-import { Type } from 'class-transformer';
+import { IsString, IsNotEmpty, IsNumber, IsOptional, IsBoolean, Min, Max, IsArray, ValidateNested, IsIn } from 'class-validator';
+import { Type, Transform } from 'class-transformer';
 
 // 筛选配置
 export class FilterConfigDto {
@@ -37,6 +37,9 @@ export class FilterConfigDto {
   excludeIds?: string[];
 }
 
+// 分层抽样维度
+export type StratifyBy = 'difficulty' | 'type';
+
 // 创建试卷DTO
 export class CreateExamDto {
   @ApiProperty({ description: '科目ID' })
@@ -71,6 +74,11 @@ export class CreateExamDto {
   @IsNumber()
   @Min(0)
   timeLimit?: number;
+
+  @ApiPropertyOptional({ description: '按难度或题型分层抽题，各层题量与可用题目分布成比例', enum: ['difficulty', 'type'] })
+  @IsOptional()
+  @IsIn(['difficulty', 'type'])
+  stratifyBy?: StratifyBy;
 }
 
 // 获取可用题目数量DTO
@@ -93,6 +101,11 @@ export class StartExamDto {
   @IsOptional()
   @IsBoolean()
   shuffleAnswers?: boolean;
+
+  @ApiPropertyOptional({ description: '是否开启答案写缓冲（答案先写入 Redis，批量落库）', default: false })
+  @IsOptional()
+  @IsBoolean()
+  bufferAnswers?: boolean;
 }
 
 // 提交答案DTO
@@ -143,6 +156,17 @@ export class QueryExamDto {
   @Min(1)
   @Max(100)
   limit?: number;
+
+  @ApiPropertyOptional({ description: '分页游标：首页传空字符串，之后传上一页返回的 nextCursor；传入时忽略 page' })
+  @IsOptional()
+  @IsString()
+  cursor?: string;
+
+  @ApiPropertyOptional({ description: '游标分页时是否返回总数', default: false })
+  @IsOptional()
+  @Transform(({ obj, key }) => obj[key] === true || obj[key] === 'true')
+  @IsBoolean()
+  withTotal?: boolean;
 }
 
 // 添加笔记DTO
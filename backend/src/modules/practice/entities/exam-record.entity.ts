@@ -14,8 +14,10 @@ import { Exam } from './exam.entity';
 import { ExamAnswer } from './exam-answer.entity';
 
 @Entity('exam_records')
-@Index(['userId', 'status'])
+@Index(['userId', 'status', 'completedAt'])
+@Index(['userId', 'startedAt'])
 @Index(['examId'])
+@Index(['status', 'deadlineAt'])
 export class ExamRecord {
   @PrimaryGeneratedColumn('uuid')
   id: string;
@@ -74,6 +76,9 @@ export class ExamRecord {
   @Column({ name: 'completed_at', nullable: true })
   completedAt: Date;
 
+  @Column({ name: 'deadline_at', type: 'datetime', nullable: true })
+  deadlineAt: Date | null; // 限时练习的截止时间，超时扫描按此列查找
+
   @OneToMany(() => ExamAnswer, answer => answer.examRecord)
   answers: ExamAnswer[];
 }
@@ -12,7 +12,7 @@ import { User } from '../../user/entities/user.entity';
 import { Subject } from '../../subject/entities/subject.entity';
 
 @Entity('exams')
-@Index(['userId', 'status'])
+@Index(['userId', 'status', 'createdAt'])
 @Index(['userId', 'createdAt'])
 export class Exam {
   @PrimaryGeneratedColumn('uuid')
@@ -0,0 +1,281 @@
+import { Injectable, Logger, Inject, Optional } from '@nestjs/common';
+import { InjectRepository } from '@nestjs/typeorm';
+import { Repository, EntityManager } from 'typeorm';
+import type { Redis } from 'ioredis';
+import { v4 as uuidv4 } from 'uuid';
+import { ExamRecord } from './entities/exam-record.entity';
+import { ExamAnswer } from './entities/exam-answer.entity';
+
+const SESSIONS_KEY = 'practice:answer-buffer:sessions';
+const DIRTY_KEY = 'practice:answer-buffer:dirty';
+const BUFFER_PREFIX = 'practice:answer-buffer:';
+// 缓冲区的兜底过期时间，防止异常情况下残留
+const BUFFER_TTL_SECONDS = 2 * 24 * 3600;
+const UPSERT_CHUNK_SIZE = 500;
+
+// 仅当练习的缓冲仍开启时写入：与 close 在 Redis 内串行，关闭之后到达的答案不会落入缓冲
+const PUT_SCRIPT = `
+if redis.call('sismember', KEYS[1], ARGV[1]) == 0 then
+  return 0
+end
+redis.call('hset', KEYS[2], ARGV[2], ARGV[3])
+redis.call('expire', KEYS[2], ARGV[4])
+redis.call('sadd', KEYS[3], ARGV[1])
+return 1`;
+
+/**
+ * 缓冲区中的单题答案
+ */
+export interface BufferedAnswer {
+  userAnswer: string;
+  correctAnswer: string;
+  isCorrect: boolean | null;
+  timeSpent: number;
+  answeredAt: string;
+}
+
+/**
+ * 练习答案写缓冲
+ * 开启缓冲的练习，答案先写入 Redis 哈希（每个练习记录一个），再由定时任务批量落库；
+ * 交卷/超时前先关闭缓冲再强制落库，缓冲数据在交卷成功后才删除。落库在练习记录行锁内进行，多节点同时刷写同一练习时串行执行
+ */
+@Injectable()
+export class ExamAnswerBufferService {
+  private readonly logger = new Logger(ExamAnswerBufferService.name);
+
+  constructor(
+    @InjectRepository(ExamRecord)
+    private examRecordRepository: Repository<ExamRecord>,
+    @Optional() @Inject('REDIS_CLIENT') private readonly redis?: Redis,
+  ) {}
+
+  /**
+   * 缓冲依赖 Redis，未配置时不可用
+   */
+  isAvailable(): boolean {
+    return !!this.redis;
+  }
+
+  /**
+   * 为练习开启缓冲
+   */
+  async enable(examRecordId: string): Promise<boolean> {
+    if (!this.redis) return false;
+    await this.redis.sadd(SESSIONS_KEY, examRecordId);
+    return true;
+  }
+
+  /**
+   * 缓冲是否仍接受写入
+   */
+  async isBuffered(examRecordId: string): Promise<boolean> {
+    if (!this.redis) return false;
+    return (await this.redis.sismember(SESSIONS_KEY, examRecordId)) === 1;
+  }
+
+  /**
+   * 是否仍有缓冲答案（与是否接受写入无关：关闭后、交卷成功 discard 前依然存在）
+   * 读取合并与刷写以此为准，交卷刷写失败后的重试不会漏掉缓冲数据
+   */
+  async hasPending(examRecordId: string): Promise<boolean> {
+    if (!this.redis) return false;
+    return (await this.redis.exists(BUFFER_PREFIX + examRecordId)) === 1;
+  }
+
+  /**
+   * 写入单题答案（覆盖同题旧答案）并标记待落库
+   * 缓冲未开启或已关闭时不写入并返回 false，由调用方直接落库
+   */
+  async put(examRecordId: string, questionId: string, answer: BufferedAnswer): Promise<boolean> {
+    if (!this.redis) return false;
+    const result = await this.redis.eval(
+      PUT_SCRIPT,
+      3,
+      SESSIONS_KEY,
+      BUFFER_PREFIX + examRecordId,
+      DIRTY_KEY,
+      examRecordId,
+      questionId,
+      JSON.stringify(answer),
+      BUFFER_TTL_SECONDS,
+    );
+    return result === 1;
+  }
+
+  /**
+   * 关闭练习的缓冲：之后的 put 均被拒绝，已写入的答案保留待落库（交卷前调用，再做最后一次刷写）
+   */
+  async close(examRecordId: string): Promise<void> {
+    if (!this.redis) return;
+    await this.redis.srem(SESSIONS_KEY, examRecordId);
+  }
+
+  /**
+   * 读取练习的全部缓冲答案（题目 ID → 答案）
+   */
+  async read(examRecordId: string): Promise<Map<string, BufferedAnswer>> {
+    const result = new Map<string, BufferedAnswer>();
+    if (!this.redis) return result;
+
+    const raw = await this.redis.hgetall(BUFFER_PREFIX + examRecordId);
+    for (const [questionId, value] of Object.entries(raw)) {
+      result.set(questionId, JSON.parse(value));
+    }
+    return result;
+  }
+
+  /**
+   * 将缓冲答案落库并按 exam_answers 重新计算练习计数，返回是否写入了数据
+   * 先移出待落库集合再读取缓冲：刷写期间到达的答案会重新标记，由下一次刷写处理
+   */
+  async flush(examRecordId: string): Promise<boolean> {
+    if (!this.redis) return false;
+
+    try {
+      return await this.examRecordRepository.manager.transaction(async (manager) => {
+        const record = await manager.findOne(ExamRecord, {
+          where: { id: examRecordId },
+          select: ['id', 'questionCount'],
+          lock: { mode: 'pessimistic_write' },
+        });
+        if (!record) {
+          // 练习记录已删除，缓冲无处落库
+          await this.discard(examRecordId);
+          return false;
+        }
+
+        if ((await this.redis.srem(DIRTY_KEY, examRecordId)) === 0) {
+          return false;
+        }
+
+        const answers = await this.read(examRecordId);
+        if (answers.size === 0) return false;
+
+        await this.upsertAnswers(manager, examRecordId, answers);
+        await this.recount(manager, record);
+        return true;
+      });
+    } catch (error) {
+      await this.redis.sadd(DIRTY_KEY, examRecordId);
+      throw error;
+    }
+  }
+
+  /**
+   * 刷写所有待落库的练习，返回写入的练习数
+   */
+  async flushAll(): Promise<number> {
+    if (!this.redis) return 0;
+
+    let flushed = 0;
+    for (const examRecordId of await this.redis.smembers(DIRTY_KEY)) {
+      try {
+        if (await this.flush(examRecordId)) flushed++;
+      } catch (error) {
+        this.logger.error(`刷写答案缓冲失败 ${examRecordId}: ${error.message}`);
+      }
+    }
+    return flushed;
+  }
+
+  /**
+   * 启动时回放：刷写上次退出前未落库的缓冲，并清理已结束练习的残留缓冲
+   */
+  async recover(): Promise<{ flushed: number; discarded: number }> {
+    if (!this.redis) return { flushed: 0, discarded: 0 };
+
+    const flushed = await this.flushAll();
+
+    const sessions = await this.redis.smembers(SESSIONS_KEY);
+    if (sessions.length === 0) return { flushed, discarded: 0 };
+
+    const active = await this.examRecordRepository
+      .createQueryBuilder('record')
+      .select('record.id', 'id')
+      .where('record.id IN (:...sessions)', { sessions })
+      .andWhere('record.status = :status', { status: 'in-progress' })
+      .getRawMany();
+    const activeIds = new Set(active.map((row) => row.id));
+
+    let discarded = 0;
+    for (const examRecordId of sessions) {
+      if (!activeIds.has(examRecordId) && !(await this.redis.sismember(DIRTY_KEY, examRecordId))) {
+        await this.discard(examRecordId);
+        discarded++;
+      }
+    }
+    return { flushed, discarded };
+  }
+
+  /**
+   * 关闭练习的缓冲并删除缓冲数据（应在最后一次刷写之后调用）
+   */
+  async discard(examRecordId: string): Promise<void> {
+    if (!this.redis) return;
+    await this.redis
+      .multi()
+      .srem(SESSIONS_KEY, examRecordId)
+      .srem(DIRTY_KEY, examRecordId)
+      .del(BUFFER_PREFIX + examRecordId)
+      .exec();
+  }
+
+  /**
+   * 按主键 upsert：已有答案沿用原 ID（保留收藏与笔记），新答案生成 ID
+   */
+  private async upsertAnswers(
+    manager: EntityManager,
+    examRecordId: string,
+    answers: Map<string, BufferedAnswer>,
+  ): Promise<void> {
+    const existing = await manager.find(ExamAnswer, {
+      where: { examRecordId },
+      select: ['id', 'questionId'],
+    });
+    const ids = new Map(existing.map((answer) => [answer.questionId, answer.id]));
+
+    const rows = [...answers].map(([questionId, answer]) => ({
+      id: ids.get(questionId) || uuidv4(),
+      examRecordId,
+      questionId,
+      userAnswer: answer.userAnswer,
+      correctAnswer: answer.correctAnswer,
+      isCorrect: answer.isCorrect,
+      timeSpent: answer.timeSpent,
+      answeredAt: new Date(answer.answeredAt),
+    }));
+
+    for (let i = 0; i < rows.length; i += UPSERT_CHUNK_SIZE) {
+      await manager
+        .createQueryBuilder()
+        .insert()
+        .into(ExamAnswer)
+        .values(rows.slice(i, i + UPSERT_CHUNK_SIZE))
+        .orUpdate(['userAnswer', 'isCorrect', 'timeSpent', 'answered_at'], ['id'])
+        .execute();
+    }
+  }
+
+  /**
+   * 按已落库答案重新计算练习计数（每批一次，而非每题一次）
+   */
+  private async recount(manager: EntityManager, record: ExamRecord): Promise<void> {
+    const counts = await manager
+      .createQueryBuilder(ExamAnswer, 'answer')
+      .select("COALESCE(SUM(answer.userAnswer <> '' AND answer.isCorrect = 1), 0)", 'correct')
+      .addSelect("COALESCE(SUM(answer.userAnswer <> '' AND answer.isCorrect = 0), 0)", 'incorrect')
+      .addSelect("COALESCE(SUM(answer.userAnswer <> ''), 0)", 'answered')
+      .where('answer.examRecordId = :examRecordId', { examRecordId: record.id })
+      .getRawOne();
+
+    const correct = Number(counts.correct) || 0;
+    const answered = Number(counts.answered) || 0;
+
+    await manager.update(ExamRecord, record.id, {
+      correctCount: correct,
+      incorrectCount: Number(counts.incorrect) || 0,
+      unansweredCount: record.questionCount - answered,
+      accuracy: answered > 0 ? (correct / answered) * 100 : 0,
+    });
+  }
+}
@@ -0,0 +1,59 @@
+import { Injectable, Logger, OnModuleInit, OnModuleDestroy } from '@nestjs/common';
+import { ExamAnswerBufferService } from './exam-answer-buffer.service';
+
+/**
+ * 答案缓冲定时落库
+ * 启动时先回放上次退出前未落库的缓冲，之后按固定间隔批量刷写
+ */
+@Injectable()
+export class ExamAnswerFlushScheduler implements OnModuleInit, OnModuleDestroy {
+  private readonly logger = new Logger(ExamAnswerFlushScheduler.name);
+  private readonly intervalMs = parseInt(process.env.EXAM_ANSWER_FLUSH_INTERVAL_MS, 10) || 5000;
+  private timer: NodeJS.Timeout | null = null;
+  private running = false;
+
+  constructor(private answerBuffer: ExamAnswerBufferService) {}
+
+  async onModuleInit() {
+    if (!this.answerBuffer.isAvailable()) {
+      return;
+    }
+
+    this.answerBuffer
+      .recover()
+      .then(({ flushed, discarded }) => {
+        if (flushed > 0 || discarded > 0) {
+          this.logger.log(`答案缓冲回放完成：落库 ${flushed} 个，清理 ${discarded} 个`);
+        }
+      })
+      .catch((error) => this.logger.warn(`答案缓冲回放失败: ${error.message}`));
+
+    this.timer = setInterval(() => {
+      this.flush().catch((error) => this.logger.error(`答案缓冲刷写失败: ${error.message}`));
+    }, this.intervalMs);
+    this.timer.unref();
+  }
+
+  async onModuleDestroy() {
+    if (this.timer) {
+      clearInterval(this.timer);
+      this.timer = null;
+    }
+    // 正常停机时尽量把缓冲写完
+    await this.flush().catch((error) => this.logger.warn(`停机前刷写答案缓冲失败: ${error.message}`));
+  }
+
+  /**
+   * 执行一次刷写；上一次尚未结束时跳过
+   */
+  async flush(): Promise<number> {
+    if (this.running) return 0;
+
+    this.running = true;
+    try {
+      return await this.answerBuffer.flushAll();
+    } finally {
+      this.running = false;
+    }
+  }
+}
@@ -4,6 +4,7 @@ import { Repository } from 'typeorm';
 import { Exam } from './entities/exam.entity';
 import { CreateExamDto } from './dto/practice.dto';
 import { QuestionFilterService } from './question-filter.service';
+import { paginateByKeyset, datetimeCursorValue } from '../../common/utils/keyset';
 
 /**
  * 智能组卷服务
@@ -21,7 +22,7 @@ export class ExamGeneratorService {
    * 创建试卷（智能组卷）
    */
   async createExam(userId: string, createExamDto: CreateExamDto): Promise<Exam> {
-    const { subjectId, name, filterConfig, questionCount, shuffleQuestions, timeLimit } = createExamDto;
+    const { subjectId, name, filterConfig, questionCount, shuffleQuestions, timeLimit, stratifyBy } = createExamDto;
 
     // 检查可用题目数量
     const availableCount = await this.questionFilterService.getAvailableCount(userId, subjectId, filterConfig);
@@ -36,13 +37,16 @@ export class ExamGeneratorService {
       );
     }
 
-    // 获取题目ID列表
-    const questions = await this.questionFilterService.getRandomQuestions(
-      userId,
-      subjectId,
-      questionCount,
-      filterConfig,
-    );
+    // 获取题目ID列表（指定分层维度时按分布比例抽题）
+    const questions = stratifyBy
+      ? await this.questionFilterService.getStratifiedRandomQuestions(
+          userId,
+          subjectId,
+          questionCount,
+          stratifyBy,
+          filterConfig,
+        )
+      : await this.questionFilterService.getRandomQuestions(userId, subjectId, questionCount, filterConfig);
 
     const questionIds = questions.map((q) => q.id);
 
@@ -91,9 +95,9 @@ export class ExamGeneratorService {
    */
   async getUserExams(
     userId: string,
-    options: { status?: string; page?: number; limit?: number } = {},
-  ): Promise<{ data: Exam[]; total: number }> {
-    const { status, page = 1, limit = 20 } = options;
+    options: { status?: string; page?: number; limit?: number; cursor?: string; withTotal?: boolean } = {},
+  ): Promise<{ data: Exam[]; total?: number; nextCursor?: string | null; hasMore?: boolean }> {
+    const { status, page = 1, limit = 20, cursor, withTotal } = options;
 
     const queryBuilder = this.examRepository.createQueryBuilder('exam');
 
@@ -103,7 +107,22 @@ export class ExamGeneratorService {
       queryBuilder.andWhere('exam.status = :status', { status });
     }
 
-    queryBuilder.orderBy('exam.createdAt', 'DESC');
+    // 游标分页：按 (createdAt, id) 续读，总数按需计算
+    if (cursor !== undefined) {
+      const total = withTotal ? await queryBuilder.clone().getCount() : undefined;
+      const { items, nextCursor, hasMore } = await paginateByKeyset(queryBuilder, {
+        alias: 'exam',
+        sortKey: 'exam.createdAt',
+        cursorValue: datetimeCursorValue('exam.createdAt'),
+        order: 'DESC',
+        limit,
+        cursor,
+      });
+
+      return { data: items, total, nextCursor, hasMore };
+    }
+
+    queryBuilder.orderBy('exam.createdAt', 'DESC').addOrderBy('exam.id', 'DESC');
 
     const total = await queryBuilder.getCount();
 
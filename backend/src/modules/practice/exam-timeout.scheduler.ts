@@ -0,0 +1,94 @@
+import { Injectable, Logger, OnModuleInit, OnModuleDestroy } from '@nestjs/common';
+import { PracticeService } from './practice.service';
+import { LockService } from '../cache/lock.service';
+
+const SWEEP_LOCK = 'practice:timeout-sweep';
+const BACKFILL_LOCK = 'practice:deadline-backfill';
+
+/**
+ * 练习超时扫描
+ * 定时自动提交已超过截止时间的练习；多节点部署时通过租约保证同一时刻只有一个节点在扫描
+ */
+@Injectable()
+export class ExamTimeoutScheduler implements OnModuleInit, OnModuleDestroy {
+  private readonly logger = new Logger(ExamTimeoutScheduler.name);
+  private readonly intervalMs = parseInt(process.env.EXAM_TIMEOUT_SWEEP_INTERVAL_MS, 10) || 30000;
+  private readonly concurrency = parseInt(process.env.EXAM_TIMEOUT_CONCURRENCY, 10) || 8;
+  private readonly batchSize = parseInt(process.env.EXAM_TIMEOUT_BATCH_SIZE, 10) || 500;
+  private timer: NodeJS.Timeout | null = null;
+  private running = false;
+
+  constructor(
+    private practiceService: PracticeService,
+    private lockService: LockService,
+  ) {}
+
+  async onModuleInit() {
+    if (process.env.EXAM_TIMEOUT_SWEEP_ENABLED === 'false') {
+      return;
+    }
+
+    this.backfill().catch((error) =>
+      this.logger.warn(`Deadline backfill failed: ${error.message}`),
+    );
+
+    this.timer = setInterval(() => {
+      this.sweep().catch((error) => this.logger.error(`Timeout sweep failed: ${error.message}`));
+    }, this.intervalMs);
+    this.timer.unref();
+  }
+
+  onModuleDestroy() {
+    if (this.timer) {
+      clearInterval(this.timer);
+      this.timer = null;
+    }
+  }
+
+  /**
+   * 执行一次扫描，未获得租约时直接返回
+   */
+  async sweep(): Promise<number> {
+    if (this.running) return 0;
+
+    // 租约时长为扫描间隔的两倍，每批结束后续期
+    const leaseMs = this.intervalMs * 2;
+    const token = await this.lockService.acquire(SWEEP_LOCK, leaseMs);
+    if (!token) return 0;
+
+    this.running = true;
+    const startedAt = Date.now();
+    try {
+      const results = await this.practiceService.checkAllTimeouts({
+        batchSize: this.batchSize,
+        concurrency: this.concurrency,
+        shouldContinue: () => this.lockService.renew(SWEEP_LOCK, token, leaseMs),
+      });
+
+      if (results.length > 0) {
+        this.logger.log(`Auto-submitted ${results.length} expired exams in ${Date.now() - startedAt}ms`);
+      }
+      return results.length;
+    } finally {
+      this.running = false;
+      await this.lockService.release(SWEEP_LOCK, token);
+    }
+  }
+
+  /**
+   * 启动时为旧记录补齐截止时间（只需一个节点执行）
+   */
+  private async backfill(): Promise<void> {
+    const token = await this.lockService.acquire(BACKFILL_LOCK, 60000);
+    if (!token) return;
+
+    try {
+      const updated = await this.practiceService.backfillDeadlines();
+      if (updated > 0) {
+        this.logger.log(`Backfilled deadlines for ${updated} in-progress exam records`);
+      }
+    } finally {
+      await this.lockService.release(BACKFILL_LOCK, token);
+    }
+  }
+}
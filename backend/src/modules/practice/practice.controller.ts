@@ -170,8 +170,15 @@ export class PracticeController {
     @Request() req,
     @Query('page') page?: number,
     @Query('limit') limit?: number,
+    @Query('cursor') cursor?: string,
+    @Query('withTotal') withTotal?: string,
   ) {
-    return this.practiceService.getExamRecords(req.user.sub, { page, limit });
+    return this.practiceService.getExamRecords(req.user.sub, {
+      page,
+      limit,
+      cursor,
+      withTotal: withTotal === 'true',
+    });
   }
 
   /**
@@ -5,14 +5,21 @@ import { PracticeController } from './practice.controller';
 import { PracticeService } from './practice.service';
 import { ExamGeneratorService } from './exam-generator.service';
 import { QuestionFilterService } from './question-filter.service';
+import { ExamTimeoutScheduler } from './exam-timeout.scheduler';
+import { ExamAnswerBufferService } from './exam-answer-buffer.service';
+import { ExamAnswerFlushScheduler } from './exam-answer-flush.scheduler';
 import { Exam } from './entities/exam.entity';
 import { ExamRecord } from './entities/exam-record.entity';
 import { ExamAnswer } from './entities/exam-answer.entity';
 import { Mistake } from '../mistake/entities/mistake.entity';
+import { StatisticsModule } from '../statistics/statistics.module';
+import { MistakeModule } from '../mistake/mistake.module';
 
 @Module({
   imports: [
     JwtModule,
+    StatisticsModule,
+    MistakeModule,
     TypeOrmModule.forFeature([
       Exam,
       ExamRecord,
@@ -25,6 +32,9 @@ import { Mistake } from '../mistake/entities/mistake.entity';
     PracticeService,
     ExamGeneratorService,
     QuestionFilterService,
+    ExamTimeoutScheduler,
+    ExamAnswerBufferService,
+    ExamAnswerFlushScheduler,
   ],
   exports: [
     PracticeService,
@@ -0,0 +1,172 @@
+import { Test, TestingModule } from '@nestjs/testing';
+import { getRepositoryToken } from '@nestjs/typeorm';
+import { Repository } from 'typeorm';
+import { BadRequestException, NotFoundException } from '@nestjs/common';
+import { PracticeService } from './practice.service';
+import { Exam } from './entities/exam.entity';
+import { ExamRecord } from './entities/exam-record.entity';
+import { ExamAnswer } from './entities/exam-answer.entity';
+import { Mistake } from '../mistake/entities/mistake.entity';
+import { ExamGeneratorService } from './exam-generator.service';
+import { QuestionFilterService } from './question-filter.service';
+import { StatsRollupService } from '../statistics/stats-rollup.service';
+import { CacheService } from '../cache/cache.service';
+import { ExamAnswerBufferService } from './exam-answer-buffer.service';
+
+describe('PracticeService', () => {
+  let service: PracticeService;
+  let examRecordRepository: jest.Mocked<Repository<ExamRecord>>;
+  let answerBuffer: jest.Mocked<ExamAnswerBufferService>;
+  let manager: {
+    findOne: jest.Mock;
+    create: jest.Mock;
+    save: jest.Mock;
+    update: jest.Mock;
+  };
+  let existingAnswer: Partial<ExamAnswer> | null;
+
+  // 10 题：已答 5 题（3 对 2 错），未答 5 题
+  const record = {
+    id: 'record-1',
+    status: 'in-progress',
+    questionCount: 10,
+    correctCount: 3,
+    incorrectCount: 2,
+    unansweredCount: 5,
+  };
+
+  const answerKey = {
+    userId: 'user-123',
+    questions: { 'q-1': { type: 'choice', answer: 'B' } },
+  };
+
+  beforeEach(async () => {
+    existingAnswer = null;
+    manager = {
+      findOne: jest.fn(async (entity: any) => (entity === ExamRecord ? { ...record } : existingAnswer)),
+      create: jest.fn((_entity: any, data: any) => data),
+      save: jest.fn(async (answer: any) => answer),
+      update: jest.fn(),
+    };
+
+    const module: TestingModule = await Test.createTestingModule({
+      providers: [
+        PracticeService,
+        { provide: getRepositoryToken(Exam), useValue: { findOne: jest.fn() } },
+        {
+          provide: getRepositoryToken(ExamRecord),
+          useValue: {
+            findOne: jest.fn(),
+            manager: { transaction: jest.fn((work: any) => work(manager)) },
+          },
+        },
+        {
+          provide: getRepositoryToken(ExamAnswer),
+          useValue: { find: jest.fn(), create: jest.fn((data: any) => data) },
+        },
+        { provide: getRepositoryToken(Mistake), useValue: { find: jest.fn() } },
+        { provide: ExamGeneratorService, useValue: {} },
+        { provide: QuestionFilterService, useValue: {} },
+        { provide: StatsRollupService, useValue: {} },
+        {
+          provide: CacheService,
+          useValue: {
+            get: jest.fn().mockResolvedValue(answerKey),
+            set: jest.fn(),
+            del: jest.fn(),
+          },
+        },
+        {
+          provide: ExamAnswerBufferService,
+          useValue: { put: jest.fn().mockResolvedValue(false) },
+        },
+      ],
+    }).compile();
+
+    service = module.get<PracticeService>(PracticeService);
+    examRecordRepository = module.get(getRepositoryToken(ExamRecord));
+    answerBuffer = module.get(ExamAnswerBufferService);
+  });
+
+  afterEach(() => {
+    jest.clearAllMocks();
+  });
+
+  describe('submitAnswer', () => {
+    const submit = (userAnswer: string, questionId = 'q-1') =>
+      service.submitAnswer('record-1', 'user-123', { questionId, userAnswer, timeSpent: 12 });
+
+    it('should count a first correct answer', async () => {
+      await submit('B');
+
+      expect(manager.update).toHaveBeenCalledWith(ExamRecord, 'record-1', {
+        correctCount: record.correctCount + 1,
+        incorrectCount: record.incorrectCount,
+        unansweredCount: record.unansweredCount - 1,
+        accuracy: (4 / 6) * 100,
+      });
+    });
+
+    it('should move a re-answered question from correct to incorrect', async () => {
+      existingAnswer = { id: 'answer-1', questionId: 'q-1', userAnswer: 'B', isCorrect: true };
+
+      await submit('A');
+
+      expect(manager.update).toHaveBeenCalledWith(ExamRecord, 'record-1', {
+        correctCount: record.correctCount - 1,
+        incorrectCount: record.incorrectCount + 1,
+        unansweredCount: record.unansweredCount,
+        accuracy: 40,
+      });
+    });
+
+    it('should count a cleared answer as unanswered again', async () => {
+      existingAnswer = { id: 'answer-1', questionId: 'q-1', userAnswer: 'A', isCorrect: false };
+
+      await submit('');
+
+      expect(manager.update).toHaveBeenCalledWith(ExamRecord, 'record-1', {
+        correctCount: record.correctCount,
+        incorrectCount: record.incorrectCount - 1,
+        unansweredCount: record.unansweredCount + 1,
+        accuracy: 75,
+      });
+    });
+
+    it('should leave the counts alone when the answer state does not change', async () => {
+      existingAnswer = { id: 'answer-1', questionId: 'q-1', userAnswer: 'B', isCorrect: true };
+
+      await submit(' b ');
+
+      expect(manager.save).toHaveBeenCalled();
+      expect(manager.update).not.toHaveBeenCalled();
+    });
+
+    it('should keep buffered answers out of the database', async () => {
+      answerBuffer.put.mockResolvedValue(true);
+
+      const result = await submit('B');
+
+      expect(result).toMatchObject({ examRecordId: 'record-1', questionId: 'q-1', isCorrect: true });
+      expect(result.answeredAt).toBeInstanceOf(Date);
+      expect(examRecordRepository.manager.transaction).not.toHaveBeenCalled();
+    });
+
+    it('should reject an answer that misses the closed buffer of a completed exam', async () => {
+      manager.findOne.mockImplementation(async (entity: any) =>
+        entity === ExamRecord ? { ...record, status: 'completed' } : null,
+      );
+
+      await expect(submit('B')).rejects.toThrow(BadRequestException);
+
+      expect(manager.save).not.toHaveBeenCalled();
+    });
+
+    it('should reject a question outside the exam without touching the counts', async () => {
+      await expect(submit('B', 'q-other')).rejects.toThrow(NotFoundException);
+
+      expect(examRecordRepository.manager.transaction).not.toHaveBeenCalled();
+      expect(manager.update).not.toHaveBeenCalled();
+    });
+  });
+});
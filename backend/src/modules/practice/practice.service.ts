@@ -1,4 +1,4 @@
-import { Injectable, BadRequestException, NotFoundException } from '@nestjs/common';
+import { Injectable, BadRequestException, NotFoundException, Logger } from '@nestjs/common';
 import { InjectRepository } from '@nestjs/typeorm';
 import { Repository, In } from 'typeorm';
 import { Exam } from './entities/exam.entity';
@@ -8,6 +8,21 @@ import { Mistake } from '../mistake/entities/mistake.entity';
 import { StartExamDto, SubmitAnswerDto, SubmitExamDto } from './dto/practice.dto';
 import { ExamGeneratorService } from './exam-generator.service';
 import { QuestionFilterService } from './question-filter.service';
+import { StatsRollupService } from '../statistics/stats-rollup.service';
+import { CacheService } from '../cache/cache.service';
+import { ExamAnswerBufferService, BufferedAnswer } from './exam-answer-buffer.service';
+import { mapWithConcurrency } from '../../common/utils/concurrency';
+import { paginateByKeyset, datetimeCursorValue } from '../../common/utils/keyset';
+
+const ANSWER_KEY_PREFIX = 'practice:answer-key:';
+
+/**
+ * 练习的标准答案（题目 ID → 题型与答案）
+ */
+interface AnswerKey {
+  userId: string;
+  questions: Record<string, Pick<Mistake, 'type' | 'answer'>>;
+}
 
 /**
  * 练习服务
@@ -15,6 +30,10 @@ import { QuestionFilterService } from './question-filter.service';
  */
 @Injectable()
 export class PracticeService {
+  private readonly logger = new Logger(PracticeService.name);
+  // 无时间限制的练习，标准答案缓存时长（秒）
+  private readonly answerKeyTtl = parseInt(process.env.EXAM_ANSWER_KEY_TTL, 10) || 14400;
+
   constructor(
     @InjectRepository(Exam)
     private examRepository: Repository<Exam>,
@@ -26,6 +45,9 @@ export class PracticeService {
     private mistakeRepository: Repository<Mistake>,
     private examGeneratorService: ExamGeneratorService,
     private questionFilterService: QuestionFilterService,
+    private statsRollupService: StatsRollupService,
+    private cacheService: CacheService,
+    private answerBuffer: ExamAnswerBufferService,
   ) {}
 
   /**
@@ -54,6 +76,7 @@ export class PracticeService {
         examRecordId: existingRecord.id,
         questions: this.shuffleAnswersIfNeeded(questions, startExamDto.shuffleAnswers),
         isResume: true,
+        bufferAnswers: await this.answerBuffer.isBuffered(existingRecord.id),
       };
     }
 
@@ -67,6 +90,7 @@ export class PracticeService {
     }
 
     // 创建练习记录
+    const startedAt = new Date();
     const examRecord = this.examRecordRepository.create({
       examId,
       examName: exam.name,
@@ -78,7 +102,8 @@ export class PracticeService {
       unansweredCount: exam.questionCount,
       accuracy: 0,
       timeSpent: 0,
-      startedAt: new Date(),
+      startedAt,
+      deadlineAt: exam.timeLimit ? new Date(startedAt.getTime() + exam.timeLimit * 60 * 1000) : null,
     });
 
     const savedRecord = await this.examRecordRepository.save(examRecord);
@@ -86,85 +111,108 @@ export class PracticeService {
     // 更新试卷状态
     await this.examGeneratorService.updateExamStatus(examId, 'in-progress');
 
+    // 答案写缓冲（需要 Redis，未配置时按普通模式逐题落库）
+    const bufferAnswers = startExamDto.bufferAnswers ? await this.answerBuffer.enable(savedRecord.id) : false;
+
     return {
       examRecordId: savedRecord.id,
       questions: this.shuffleAnswersIfNeeded(questions, startExamDto.shuffleAnswers),
       isResume: false,
+      bufferAnswers,
     };
   }
 
   /**
    * 提交单题答案
+   * 标准答案按练习缓存；答案写入与练习记录计数的增量更新在同一事务内完成
+   * 开启答案缓冲的练习只写入 Redis，由定时任务或交卷时批量落库
    */
   async submitAnswer(examRecordId: string, userId: string, submitAnswerDto: SubmitAnswerDto) {
     const { questionId, userAnswer, timeSpent = 0 } = submitAnswerDto;
 
-    // 获取练习记录
-    const examRecord = await this.examRecordRepository.findOne({
-      where: { id: examRecordId, userId },
-    });
-
-    if (!examRecord) {
-      throw new NotFoundException('练习记录不存在');
-    }
-
-    if (examRecord.status !== 'in-progress') {
-      throw new BadRequestException('练习已结束，无法提交答案');
-    }
-
-    // 获取题目
-    const question = await this.mistakeRepository.findOne({
-      where: { id: questionId },
-    });
+    const answerKey = await this.getAnswerKey(examRecordId, userId);
+    const question = answerKey.questions[questionId];
 
     if (!question) {
       throw new NotFoundException('题目不存在');
     }
 
-    // 检查是否已经提交过答案
-    const existingAnswer = await this.examAnswerRepository.findOne({
-      where: { examRecordId, questionId },
-    });
-
     // 判断答案是否正确
     const isCorrect = this.checkAnswer(question, userAnswer);
 
-    // 创建或更新答案记录
-    let answer: ExamAnswer;
+    // 缓冲开启时只写入 Redis；交卷会先关闭缓冲，之后的答案改走下方加锁落库的路径，由状态检查拒绝
+    const entry: BufferedAnswer = {
+      userAnswer,
+      correctAnswer: question.answer,
+      isCorrect,
+      timeSpent,
+      answeredAt: new Date().toISOString(),
+    };
+    if (await this.answerBuffer.put(examRecordId, questionId, entry)) {
+      // 与落库路径返回同样的 ExamAnswer 结构（尚未落库，没有 id）
+      return this.mergeBufferedAnswers(examRecordId, [], new Map([[questionId, entry]]))[0];
+    }
 
-    if (existingAnswer) {
-      // 更新已有答案
-      const oldIsCorrect = existingAnswer.isCorrect;
-      existingAnswer.userAnswer = userAnswer;
-      existingAnswer.isCorrect = isCorrect;
-      existingAnswer.timeSpent = timeSpent;
-      existingAnswer.answeredAt = new Date();
+    return this.examRecordRepository.manager.transaction(async (manager) => {
+      // 锁定练习记录：同一练习的答题请求串行执行，交卷后不再接受答案
+      const examRecord = await manager.findOne(ExamRecord, {
+        where: { id: examRecordId, userId },
+        select: ['id', 'status', 'questionCount', 'correctCount', 'incorrectCount', 'unansweredCount'],
+        lock: { mode: 'pessimistic_write' },
+      });
 
-      answer = await this.examAnswerRepository.save(existingAnswer);
+      if (!examRecord) {
+        throw new NotFoundException('练习记录不存在');
+      }
 
-      // 更新统计（如果有变化）
-      if (oldIsCorrect !== isCorrect) {
-        await this.updateExamRecordStats(examRecord);
+      if (examRecord.status !== 'in-progress') {
+        throw new BadRequestException('练习已结束，无法提交答案');
       }
-    } else {
-      // 创建新答案
-      answer = this.examAnswerRepository.create({
-        examRecordId,
-        questionId,
-        userAnswer,
-        correctAnswer: question.answer,
-        isCorrect,
-        timeSpent,
-        answeredAt: new Date(),
-      });
 
-      answer = await this.examAnswerRepository.save(answer);
+      // 检查是否已经提交过答案
+      const existingAnswer = await manager.findOne(ExamAnswer, {
+        where: { examRecordId, questionId },
+      });
+      const before = this.answerCounts(existingAnswer);
+
+      let answer: ExamAnswer;
+      if (existingAnswer) {
+        existingAnswer.userAnswer = userAnswer;
+        existingAnswer.isCorrect = isCorrect;
+        existingAnswer.timeSpent = timeSpent;
+        existingAnswer.answeredAt = new Date();
+        answer = await manager.save(existingAnswer);
+      } else {
+        answer = await manager.save(
+          manager.create(ExamAnswer, {
+            examRecordId,
+            questionId,
+            userAnswer,
+            correctAnswer: question.answer,
+            isCorrect,
+            timeSpent,
+            answeredAt: new Date(),
+          }),
+        );
+      }
 
-      // 更新统计
-      await this.updateExamRecordStats(examRecord);
-    }
+      // 按本题前后状态的差值更新计数（记录已加锁，读到的计数即当前值）
+      const after = this.answerCounts(answer);
+      if (after.correct !== before.correct || after.incorrect !== before.incorrect || after.answered !== before.answered) {
+        const correctCount = examRecord.correctCount + after.correct - before.correct;
+        const unansweredCount = examRecord.unansweredCount - (after.answered - before.answered);
+        const answered = examRecord.questionCount - unansweredCount;
+
+        await manager.update(ExamRecord, examRecordId, {
+          correctCount,
+          incorrectCount: examRecord.incorrectCount + after.incorrect - before.incorrect,
+          unansweredCount,
+          accuracy: answered > 0 ? (correctCount / answered) * 100 : 0,
+        });
+      }
 
-    return answer;
+      return answer;
+    });
   }
 
   /**
@@ -179,10 +227,15 @@ export class PracticeService {
       throw new NotFoundException('练习记录不存在');
     }
 
-    const answers = await this.examAnswerRepository.find({
+    let answers = await this.examAnswerRepository.find({
       where: { examRecordId },
     });
 
+    // 缓冲中的答案覆盖已落库的旧值
+    if (await this.answerBuffer.hasPending(examRecordId)) {
+      answers = this.mergeBufferedAnswers(examRecordId, answers, await this.answerBuffer.read(examRecordId));
+    }
+
     return {
       answeredCount: answers.filter((a) => a.userAnswer).length,
       totalCount: examRecord.questionCount,
@@ -215,24 +268,85 @@ export class PracticeService {
       );
     }
 
-    // 更新练习记录状态
-    examRecord.status = 'completed';
-    examRecord.completedAt = new Date();
+    if (!(await this.completeExam(examRecord))) {
+      throw new BadRequestException('练习已结束');
+    }
+
+    // 返回结果
+    return this.getResult(examRecordId, userId);
+  }
+
+  /**
+   * 将练习标记为完成（仅当仍为进行中时），并更新统计汇总和试卷状态
+   * 返回 false 表示已被其他请求或超时扫描完成
+   */
+  private async completeExam(examRecord: ExamRecord): Promise<boolean> {
+    // 先关闭缓冲再把缓冲中的答案落库，计数以落库后的结果为准；
+    // 关闭之后到达的答案不再进入缓冲，不会在 discard 时丢失。
+    // 是否刷写按缓冲数据判断而非缓冲开关：上次交卷刷写失败时缓冲已关闭，重试仍需刷写
+    await this.answerBuffer.close(examRecord.id);
+    const buffered = await this.answerBuffer.hasPending(examRecord.id);
+    if (buffered) {
+      await this.answerBuffer.flush(examRecord.id);
+      Object.assign(
+        examRecord,
+        await this.examRecordRepository.findOne({
+          where: { id: examRecord.id },
+          select: ['id', 'correctCount', 'incorrectCount', 'unansweredCount', 'accuracy'],
+        }),
+      );
+    }
+
+    const completedAt = new Date();
 
     // 计算总用时
-    const answers = await this.examAnswerRepository.find({
-      where: { examRecordId },
+    const { timeSpent } = await this.examAnswerRepository
+      .createQueryBuilder('answer')
+      .select('COALESCE(SUM(answer.timeSpent), 0)', 'timeSpent')
+      .where('answer.examRecordId = :examRecordId', { examRecordId: examRecord.id })
+      .getRawOne();
+
+    const exam = await this.examRepository.findOne({
+      where: { id: examRecord.examId },
+      select: ['id', 'subjectId'],
     });
 
-    examRecord.timeSpent = answers.reduce((sum, a) => sum + a.timeSpent, 0);
+    const completed = await this.examRecordRepository.manager.transaction(async (manager) => {
+      const result = await manager.update(
+        ExamRecord,
+        { id: examRecord.id, status: 'in-progress' },
+        { status: 'completed', completedAt, timeSpent: Number(timeSpent) || 0 },
+      );
+      if (!result.affected) {
+        return false;
+      }
 
-    await this.examRecordRepository.save(examRecord);
+      await this.statsRollupService.apply(
+        manager,
+        examRecord.userId,
+        exam?.subjectId || 'general',
+        {
+          examCount: 1,
+          questionCount: examRecord.questionCount,
+          correctCount: examRecord.correctCount,
+          incorrectCount: examRecord.incorrectCount,
+          timeSpent: Number(timeSpent) || 0,
+        },
+        completedAt,
+      );
+      return true;
+    });
 
-    // 更新试卷状态
-    await this.examGeneratorService.updateExamStatus(examRecord.examId, 'completed');
+    if (completed) {
+      // 更新试卷状态
+      await this.examGeneratorService.updateExamStatus(examRecord.examId, 'completed');
+      await this.cacheService.del(`${ANSWER_KEY_PREFIX}${examRecord.id}`);
+      if (buffered) {
+        await this.answerBuffer.discard(examRecord.id);
+      }
+    }
 
-    // 返回结果
-    return this.getResult(examRecordId, userId);
+    return completed;
   }
 
   /**
@@ -281,6 +395,8 @@ export class PracticeService {
    * 收藏/取消收藏题目
    */
   async toggleFavorite(examRecordId: string, questionId: string, userId: string) {
+    await this.flushAnswerBuffer(examRecordId);
+
     const answer = await this.examAnswerRepository.findOne({
       where: { examRecordId, questionId },
     });
@@ -297,6 +413,8 @@ export class PracticeService {
    * 添加笔记
    */
   async addNote(examRecordId: string, questionId: string, note: string, userId: string) {
+    await this.flushAnswerBuffer(examRecordId);
+
     const answer = await this.examAnswerRepository.findOne({
       where: { examRecordId, questionId },
     });
@@ -312,13 +430,32 @@ export class PracticeService {
   /**
    * 获取练习记录列表
    */
-  async getExamRecords(userId: string, options: { page?: number; limit?: number } = {}) {
-    const { page = 1, limit = 20 } = options;
+  async getExamRecords(
+    userId: string,
+    options: { page?: number; limit?: number; cursor?: string; withTotal?: boolean } = {},
+  ) {
+    const { page = 1, limit = 20, cursor, withTotal } = options;
 
     const queryBuilder = this.examRecordRepository.createQueryBuilder('record');
 
     queryBuilder.where('record.userId = :userId', { userId });
-    queryBuilder.orderBy('record.startedAt', 'DESC');
+
+    // 游标分页：按 (startedAt, id) 续读，总数按需计算
+    if (cursor !== undefined) {
+      const total = withTotal ? await queryBuilder.clone().getCount() : undefined;
+      const { items, nextCursor, hasMore } = await paginateByKeyset(queryBuilder, {
+        alias: 'record',
+        sortKey: 'record.startedAt',
+        cursorValue: datetimeCursorValue('record.startedAt'),
+        order: 'DESC',
+        limit,
+        cursor,
+      });
+
+      return { data: items, total, nextCursor, hasMore };
+    }
+
+    queryBuilder.orderBy('record.startedAt', 'DESC').addOrderBy('record.id', 'DESC');
 
     const total = await queryBuilder.getCount();
 
@@ -346,21 +483,24 @@ export class PracticeService {
       throw new BadRequestException('练习已结束');
     }
 
-    // 获取试卷信息
-    const exam = await this.examRepository.findOne({
-      where: { id: examRecord.examId },
-    });
+    let deadline = examRecord.deadlineAt;
+    if (!deadline) {
+      // 旧记录没有截止时间，按试卷限时计算
+      const exam = await this.examRepository.findOne({
+        where: { id: examRecord.examId },
+      });
 
-    if (!exam || !exam.timeLimit) {
-      // 没有设置限时
-      return { hasTimeout: false, remainingTime: null };
+      if (!exam || !exam.timeLimit) {
+        // 没有设置限时
+        return { hasTimeout: false, remainingTime: null };
+      }
+
+      deadline = new Date(examRecord.startedAt.getTime() + exam.timeLimit * 60 * 1000);
     }
 
-    // 计算已用时间（秒）
-    const elapsed = Math.floor((Date.now() - examRecord.startedAt.getTime()) / 1000);
-    const timeLimitSeconds = exam.timeLimit * 60;
+    const remainingTime = Math.ceil((deadline.getTime() - Date.now()) / 1000);
 
-    if (elapsed >= timeLimitSeconds) {
+    if (remainingTime <= 0) {
       // 已超时，自动交卷
       return {
         hasTimeout: true,
@@ -372,55 +512,92 @@ export class PracticeService {
     // 未超时，返回剩余时间
     return {
       hasTimeout: false,
-      remainingTime: timeLimitSeconds - elapsed,
+      remainingTime,
     };
   }
 
   /**
-   * 检查所有进行中的练习是否有超时
-   * 可以通过定时任务调用此方法
+   * 自动提交所有已超时的练习
+   * 通过 (status, deadline_at) 索引只读取已到期的记录，分批并以有限并发交卷；
+   * shouldContinue 返回 false 时在当前批次后停止（例如失去租约）
    */
-  async checkAllTimeouts() {
-    // 查找所有进行中的练习记录
-    const inProgressRecords = await this.examRecordRepository.find({
-      where: { status: 'in-progress' },
-      relations: ['exam'],
-    });
+  async checkAllTimeouts(
+    options: {
+      batchSize?: number;
+      concurrency?: number;
+      shouldContinue?: () => Promise<boolean> | boolean;
+    } = {},
+  ) {
+    const { batchSize = 500, concurrency = 8, shouldContinue } = options;
+    const timeoutResults: { examRecordId: string; userId: string; deadlineAt: Date }[] = [];
+    const failed = new Set<string>();
+
+    while (true) {
+      const queryBuilder = this.examRecordRepository
+        .createQueryBuilder('record')
+        .where('record.status = :status', { status: 'in-progress' })
+        .andWhere('record.deadlineAt <= :now', { now: new Date() });
+
+      if (failed.size > 0) {
+        queryBuilder.andWhere('record.id NOT IN (:...failed)', { failed: [...failed] });
+      }
 
-    const timeoutResults = [];
+      const expired = await queryBuilder
+        .orderBy('record.deadlineAt', 'ASC')
+        .limit(batchSize)
+        .getMany();
 
-    for (const record of inProgressRecords) {
-      if (!record.exam || !record.exam.timeLimit) {
-        continue;
+      if (expired.length === 0) {
+        break;
       }
 
-      const elapsed = Math.floor((Date.now() - record.startedAt.getTime()) / 1000);
-      const timeLimitSeconds = record.exam.timeLimit * 60;
+      const results = await mapWithConcurrency(expired, concurrency, (record) =>
+        this.completeExam(record),
+      );
 
-      if (elapsed >= timeLimitSeconds) {
-        // 超时，自动交卷
-        try {
-          const result = await this.submitExam(record.id, record.userId, { force: true });
+      results.forEach(({ value, error }, index) => {
+        const record = expired[index];
+        if (error) {
+          failed.add(record.id);
+          this.logger.error(`Failed to auto-submit exam ${record.id}: ${error.message}`);
+        } else if (value) {
           timeoutResults.push({
             examRecordId: record.id,
             userId: record.userId,
-            elapsed,
-            timeLimit: record.exam.timeLimit,
-            result,
+            deadlineAt: record.deadlineAt,
           });
-        } catch (error) {
-          console.error(`Failed to auto-submit exam ${record.id}:`, error);
         }
+      });
+
+      if (expired.length < batchSize) {
+        break;
+      }
+
+      if (shouldContinue && !(await shouldContinue())) {
+        break;
       }
     }
 
     return timeoutResults;
   }
 
+  /**
+   * 为旧的进行中记录补齐截止时间
+   */
+  async backfillDeadlines(): Promise<number> {
+    const result = await this.examRecordRepository.query(
+      `UPDATE exam_records r
+       JOIN exams e ON e.id = r.exam_id
+       SET r.deadline_at = DATE_ADD(r.started_at, INTERVAL e.timeLimit MINUTE)
+       WHERE r.status = 'in-progress' AND r.deadline_at IS NULL AND e.timeLimit > 0`,
+    );
+    return result?.affectedRows || 0;
+  }
+
   /**
    * 判断答案是否正确
    */
-  private checkAnswer(question: Mistake, userAnswer: string): boolean | null {
+  private checkAnswer(question: Pick<Mistake, 'type' | 'answer'>, userAnswer: string): boolean | null {
     const correctAnswer = question.answer?.trim().toLowerCase();
     const answer = userAnswer.trim().toLowerCase();
 
@@ -463,23 +640,107 @@ export class PracticeService {
   }
 
   /**
-   * 更新练习记录统计
+   * 获取练习的标准答案（按练习缓存，练习结束或截止后失效）
    */
-  private async updateExamRecordStats(examRecord: ExamRecord) {
-    const answers = await this.examAnswerRepository.find({
-      where: { examRecordId: examRecord.id },
+  private async getAnswerKey(examRecordId: string, userId: string): Promise<AnswerKey> {
+    const key = `${ANSWER_KEY_PREFIX}${examRecordId}`;
+    const cached = await this.cacheService.get<AnswerKey>(key);
+    if (cached) {
+      if (cached.userId !== userId) {
+        throw new NotFoundException('练习记录不存在');
+      }
+      return cached;
+    }
+
+    const examRecord = await this.examRecordRepository.findOne({
+      where: { id: examRecordId, userId },
+      select: ['id', 'examId', 'status', 'deadlineAt'],
+    });
+
+    if (!examRecord) {
+      throw new NotFoundException('练习记录不存在');
+    }
+
+    if (examRecord.status !== 'in-progress') {
+      throw new BadRequestException('练习已结束，无法提交答案');
+    }
+
+    const exam = await this.examRepository.findOne({
+      where: { id: examRecord.examId },
+      select: ['id', 'questionIds'],
     });
+    const questions = exam?.questionIds?.length
+      ? await this.mistakeRepository.find({
+          where: { id: In(exam.questionIds) },
+          select: ['id', 'type', 'answer'],
+        })
+      : [];
+
+    const answerKey: AnswerKey = {
+      userId,
+      questions: Object.fromEntries(
+        questions.map((question) => [question.id, { type: question.type, answer: question.answer }]),
+      ),
+    };
+
+    const ttl = examRecord.deadlineAt
+      ? Math.max(60, Math.ceil((new Date(examRecord.deadlineAt).getTime() - Date.now()) / 1000) + 60)
+      : this.answerKeyTtl;
+    await this.cacheService.set(key, answerKey, ttl);
+
+    return answerKey;
+  }
 
-    const answered = answers.filter((a) => a.userAnswer);
-    const correct = answered.filter((a) => a.isCorrect === true);
-    const incorrect = answered.filter((a) => a.isCorrect === false);
+  /**
+   * 缓冲中的练习先落库，保证后续按 exam_answers 的读写能看到最新答案
+   */
+  private async flushAnswerBuffer(examRecordId: string): Promise<void> {
+    if (await this.answerBuffer.hasPending(examRecordId)) {
+      await this.answerBuffer.flush(examRecordId);
+    }
+  }
+
+  /**
+   * 用缓冲答案覆盖已落库的答案（尚未落库的题目补为新对象）
+   */
+  private mergeBufferedAnswers(
+    examRecordId: string,
+    answers: ExamAnswer[],
+    buffered: Map<string, BufferedAnswer>,
+  ): ExamAnswer[] {
+    const merged = new Map(answers.map((answer) => [answer.questionId, answer]));
+
+    for (const [questionId, entry] of buffered) {
+      merged.set(
+        questionId,
+        this.examAnswerRepository.create({
+          ...merged.get(questionId),
+          examRecordId,
+          questionId,
+          userAnswer: entry.userAnswer,
+          correctAnswer: entry.correctAnswer,
+          isCorrect: entry.isCorrect,
+          timeSpent: entry.timeSpent,
+          answeredAt: new Date(entry.answeredAt),
+        }),
+      );
+    }
 
-    examRecord.correctCount = correct.length;
-    examRecord.incorrectCount = incorrect.length;
-    examRecord.unansweredCount = examRecord.questionCount - answered.length;
-    examRecord.accuracy = answered.length > 0 ? (correct.length / answered.length) * 100 : 0;
+    return [...merged.values()];
+  }
 
-    await this.examRecordRepository.save(examRecord);
+  /**
+   * 单个答案对练习计数的贡献
+   */
+  private answerCounts(answer: ExamAnswer | null): { correct: number; incorrect: number; answered: number } {
+    if (!answer?.userAnswer) {
+      return { correct: 0, incorrect: 0, answered: 0 };
+    }
+    return {
+      correct: answer.isCorrect === true ? 1 : 0,
+      incorrect: answer.isCorrect === false ? 1 : 0,
+      answered: 1,
+    };
   }
 
   /**
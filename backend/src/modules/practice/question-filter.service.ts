@@ -1,8 +1,15 @@
 import { Injectable, NotFoundException } from '@nestjs/common';
 import { InjectRepository } from '@nestjs/typeorm';
-import { Repository, In } from 'typeorm';
+import { Repository, SelectQueryBuilder } from 'typeorm';
 import { Mistake } from '../mistake/entities/mistake.entity';
-import { FilterConfigDto } from './dto/practice.dto';
+import { KnowledgePointIndexService } from '../mistake/knowledge-point-index.service';
+import { FilterConfigDto, StratifyBy } from './dto/practice.dto';
+
+// 分层抽样可用的维度
+const STRATIFY_COLUMNS: Record<StratifyBy, string> = {
+  difficulty: 'mistake.difficultyLevel',
+  type: 'mistake.type',
+};
 
 /**
  * 题目筛选服务
@@ -13,6 +20,7 @@ export class QuestionFilterService {
   constructor(
     @InjectRepository(Mistake)
     private mistakeRepository: Repository<Mistake>,
+    private knowledgePointIndex: KnowledgePointIndexService,
   ) {}
 
   /**
@@ -43,6 +51,7 @@ export class QuestionFilterService {
 
   /**
    * 随机获取指定数量的题目
+   * 在 (user_id, subject_id, random_key) 索引上按独立随机起点逐题定位，无需把全部候选 ID 拉回内存
    */
   async getRandomQuestions(
     userId: string,
@@ -51,32 +60,174 @@ export class QuestionFilterService {
     filterConfig?: FilterConfigDto,
     excludeIds: string[] = [],
   ): Promise<Mistake[]> {
-    // 先获取所有符合条件的题目ID
-    const queryBuilder = this.buildFilterQuery(userId, subjectId, filterConfig).select(['mistake.id']);
+    const questions = await this.sampleByRandomKey(
+      () => this.buildSampleQuery(userId, subjectId, filterConfig, excludeIds),
+      count,
+    );
 
-    if (excludeIds.length > 0) {
-      queryBuilder.andWhere('mistake.id NOT IN (:...excludeIds)', { excludeIds });
+    if (questions.length === 0) {
+      throw new NotFoundException('没有找到符合条件的题目');
+    }
+
+    // 抽不满说明候选集已全部取到，此时 questions.length 即可用数量
+    if (questions.length < count) {
+      throw new NotFoundException(`可用题目数量（${questions.length}）少于请求数量（${count}）`);
     }
 
-    const questions = await queryBuilder.getRawMany();
-    const availableIds = questions.map((q: any) => q.mistake_id);
+    return this.sortByCreatedAt(questions);
+  }
+
+  /**
+   * 分层随机抽题
+   * 按难度或题型的分布比例分配题量（最大余数法），各层独立抽样
+   */
+  async getStratifiedRandomQuestions(
+    userId: string,
+    subjectId: string,
+    count: number,
+    stratifyBy: StratifyBy,
+    filterConfig?: FilterConfigDto,
+    excludeIds: string[] = [],
+  ): Promise<Mistake[]> {
+    const column = STRATIFY_COLUMNS[stratifyBy];
+
+    const rows = await this.buildSampleQuery(userId, subjectId, filterConfig, excludeIds)
+      .select(column, 'stratum')
+      .addSelect('COUNT(*)', 'count')
+      .groupBy(column)
+      .getRawMany();
 
-    if (availableIds.length === 0) {
+    const strata = rows.map((row) => ({ value: row.stratum, available: parseInt(row.count, 10) || 0 }));
+    const total = strata.reduce((sum, stratum) => sum + stratum.available, 0);
+
+    if (total === 0) {
       throw new NotFoundException('没有找到符合条件的题目');
     }
 
-    if (availableIds.length < count) {
-      throw new NotFoundException(`可用题目数量（${availableIds.length}）少于请求数量（${count}）`);
+    if (total < count) {
+      throw new NotFoundException(`可用题目数量（${total}）少于请求数量（${count}）`);
     }
 
-    // 随机选择
-    const selectedIds = this.shuffleArray(availableIds).slice(0, count);
+    const allocations = this.allocateStrata(strata, count);
+
+    const groups = await Promise.all(
+      allocations
+        .filter(({ quota }) => quota > 0)
+        .map(({ value, quota }) =>
+          this.sampleByRandomKey(
+            () =>
+              this.buildSampleQuery(userId, subjectId, filterConfig, excludeIds).andWhere(`${column} = :stratum`, {
+                stratum: value,
+              }),
+            quota,
+          ),
+        ),
+    );
+
+    return this.sortByCreatedAt(groups.flat());
+  }
+
+  /**
+   * 每道题各取一个独立的随机起点，命中 random_key 不小于起点的第一条（超出末尾时环绕到最小键）
+   * 同一轮内多个起点落在同一间隔会命中同一题，去重后对缺口再抽一轮，直到抽满或候选集耗尽
+   *
+   * 已知偏差：某题被命中的概率等于它与前一个键之间的间隔长度，而非严格的 1/n。
+   * 键在插入时独立均匀生成，间隔期望均为 1/n，对练习抽题足够；
+   * 为此不在每次组卷后重写 random_key，避免抽题产生写入
+   */
+  private async sampleByRandomKey(
+    buildQuery: () => SelectQueryBuilder<Mistake>,
+    count: number,
+  ): Promise<Mistake[]> {
+    const picked = new Map<string, Mistake>();
+
+    while (picked.size < count) {
+      const pickedIds = [...picked.keys()];
+      const draws = await Promise.all(
+        Array.from({ length: count - picked.size }, () => this.pickAtPivot(buildQuery, Math.random(), pickedIds)),
+      );
+
+      const before = picked.size;
+      for (const mistake of draws) {
+        if (mistake) picked.set(mistake.id, mistake);
+      }
+
+      // 一轮没有新题说明候选集已取尽
+      if (picked.size === before) break;
+    }
+
+    return [...picked.values()];
+  }
+
+  /**
+   * 取 random_key 不小于 pivot 的第一条，没有则环绕取键最小的一条
+   */
+  private async pickAtPivot(
+    buildQuery: () => SelectQueryBuilder<Mistake>,
+    pivot: number,
+    pickedIds: string[],
+  ): Promise<Mistake | null> {
+    const query = () => {
+      const queryBuilder = buildQuery();
+      if (pickedIds.length > 0) {
+        queryBuilder.andWhere('mistake.id NOT IN (:...pickedIds)', { pickedIds });
+      }
+      return queryBuilder.orderBy('mistake.randomKey', 'ASC').limit(1);
+    };
+
+    const next = await query().andWhere('mistake.randomKey >= :pivot', { pivot }).getOne();
 
-    // 获取完整题目信息
-    return this.mistakeRepository.find({
-      where: { id: In(selectedIds) },
-      order: { createdAt: 'DESC' },
+    return next || query().getOne();
+  }
+
+  /**
+   * 按比例分配各层题量：先取整数部分，剩余名额按小数部分从大到小补齐
+   */
+  private allocateStrata(
+    strata: Array<{ value: string; available: number }>,
+    count: number,
+  ): Array<{ value: string; quota: number }> {
+    const total = strata.reduce((sum, stratum) => sum + stratum.available, 0);
+
+    const allocations = strata.map((stratum) => {
+      const exact = (count * stratum.available) / total;
+      return { value: stratum.value, quota: Math.floor(exact), remainder: exact - Math.floor(exact) };
     });
+
+    let remaining = count - allocations.reduce((sum, allocation) => sum + allocation.quota, 0);
+    const byRemainder = [...allocations].sort((a, b) => b.remainder - a.remainder);
+    for (const allocation of byRemainder) {
+      if (remaining <= 0) break;
+      allocation.quota++;
+      remaining--;
+    }
+
+    return allocations.map(({ value, quota }) => ({ value, quota }));
+  }
+
+  /**
+   * 抽题查询：在筛选条件基础上追加排除列表
+   */
+  private buildSampleQuery(
+    userId: string,
+    subjectId: string,
+    filterConfig?: FilterConfigDto,
+    excludeIds: string[] = [],
+  ): SelectQueryBuilder<Mistake> {
+    const queryBuilder = this.buildFilterQuery(userId, subjectId, filterConfig);
+
+    if (excludeIds.length > 0) {
+      queryBuilder.andWhere('mistake.id NOT IN (:...sampleExcludeIds)', { sampleExcludeIds: excludeIds });
+    }
+
+    return queryBuilder;
+  }
+
+  /**
+   * 保持与原先一致的返回顺序（创建时间倒序）
+   */
+  private sortByCreatedAt(questions: Mistake[]): Mistake[] {
+    return questions.sort((a, b) => new Date(b.createdAt).getTime() - new Date(a.createdAt).getTime());
   }
 
   /**
@@ -90,11 +241,9 @@ export class QuestionFilterService {
       .where('mistake.userId = :userId', { userId })
       .andWhere('mistake.subjectId = :subjectId', { subjectId });
 
-    // 知识点筛选
+    // 知识点筛选（走 mistake_knowledge_points 主键）
     if (filterConfig?.knowledgePoints && filterConfig.knowledgePoints.length > 0) {
-      queryBuilder.andWhere('JSON_OVERLAPS(mistake.knowledgePoints, :knowledgePoints)', {
-        knowledgePoints: JSON.stringify(filterConfig.knowledgePoints),
-      });
+      this.knowledgePointIndex.applyFilter(queryBuilder, 'mistake', filterConfig.knowledgePoints);
     }
 
     // 题型筛选
@@ -125,40 +274,11 @@ export class QuestionFilterService {
     return queryBuilder;
   }
 
-  /**
-   * Fisher-Yates 洗牌算法
-   */
-  private shuffleArray<T>(array: T[]): T[] {
-    const result = [...array];
-    for (let i = result.length - 1; i > 0; i--) {
-      const j = Math.floor(Math.random() * (i + 1));
-      [result[i], result[j]] = [result[j], result[i]];
-    }
-    return result;
-  }
-
   /**
    * 获取知识点分布统计
    */
   async getKnowledgePointStats(userId: string, subjectId: string): Promise<Array<{ name: string; count: number }>> {
-    const mistakes = await this.mistakeRepository.find({
-      where: { userId, subjectId },
-      select: ['knowledgePoints'],
-    });
-
-    const stats = new Map<string, number>();
-
-    mistakes.forEach((mistake) => {
-      if (mistake.knowledgePoints) {
-        mistake.knowledgePoints.forEach((point) => {
-          stats.set(point, (stats.get(point) || 0) + 1);
-        });
-      }
-    });
-
-    return Array.from(stats.entries())
-      .map(([name, count]) => ({ name, count }))
-      .sort((a, b) => b.count - a.count);
+    return this.knowledgePointIndex.countByPoint(userId, subjectId);
   }
 
   /**
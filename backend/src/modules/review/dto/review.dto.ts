@@ -1,4 +1,4 @@
-import { IsEnum, IsOptional, IsNumber, IsString, IsBoolean, Min } from 'class-validator';
+import { IsEnum, IsOptional, IsNumber, IsString, IsBoolean, Min, Max } from 'class-validator';
 
 /**
  * Leitner 箱子配置
@@ -119,6 +119,32 @@ export class GetReviewScheduleDto {
   subjectId?: string;
 }
 
+/**
+ * 复习负荷均衡 DTO
+ */
+export class OptimizeScheduleDto {
+  @IsOptional()
+  @IsNumber()
+  @Min(1)
+  @Max(365)
+  days?: number = 30; // 均衡的天数范围
+
+  @IsOptional()
+  @IsNumber()
+  @Min(1)
+  capacity?: number = 50; // 每日复习上限
+
+  @IsOptional()
+  @IsNumber()
+  @Min(0)
+  @Max(1)
+  maxAdvanceRatio?: number = 0.3; // 最多提前复习间隔的比例
+
+  @IsOptional()
+  @IsBoolean()
+  dryRun?: boolean = false; // 只返回方案，不写入
+}
+
 /**
  * 查询待复习错题 DTO
  */
@@ -281,3 +307,21 @@ export interface ReviewHistoryResponse {
     mostDifficultSubject: string;
   };
 }
+
+/**
+ * 复习负荷均衡结果
+ */
+export interface OptimizeScheduleResponse {
+  days: number;
+  capacity: number;
+  moved: number;
+  peakBefore: number;
+  peakAfter: number;
+  overloadedDays: number; // 均衡后仍超过容量的天数（无可提前的复习）
+  applied: boolean;
+  load: {
+    date: Date;
+    before: number;
+    after: number;
+  }[];
+}
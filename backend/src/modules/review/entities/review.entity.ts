@@ -5,10 +5,14 @@ import {
   CreateDateColumn,
   ManyToOne,
   JoinColumn,
+  Index,
 } from 'typeorm';
 import { User } from '../../user/entities/user.entity';
+import { Mistake } from '../../mistake/entities/mistake.entity';
 
 @Entity('reviews')
+@Index(['userId', 'status', 'nextReviewAt', 'stage'])
+@Index(['mistakeId'])
 export class Review {
   @PrimaryGeneratedColumn('uuid')
   id: string;
@@ -23,6 +27,10 @@ export class Review {
   @Column({ name: 'mistake_id' })
   mistakeId: string;
 
+  @ManyToOne(() => Mistake, { createForeignKeyConstraints: false })
+  @JoinColumn({ name: 'mistake_id' })
+  mistake: Mistake;
+
   @Column({ type: 'int', default: 1 })
   stage: number;
 
@@ -41,6 +49,10 @@ export class Review {
   @Column({ type: 'decimal', precision: 5, scale: 2, nullable: true })
   easeFactor: number;
 
+  // 提交复习的时间，统计汇总按此日期计入
+  @Column({ name: 'reviewed_at', type: 'datetime', nullable: true })
+  reviewedAt: Date | null;
+
   @CreateDateColumn({ name: 'created_at' })
   createdAt: Date;
 }
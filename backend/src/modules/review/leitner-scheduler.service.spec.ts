@@ -0,0 +1,108 @@
+import {
+  LeitnerScheduler,
+  REVIEW_DIFFICULTY_CODES,
+  REVIEW_RESULT_CODES,
+  ReviewDifficultyCode,
+} from './leitner-scheduler.service';
+import { ReviewDifficulty, ReviewResult } from './dto/review.dto';
+
+describe('LeitnerScheduler', () => {
+  const scheduler = new LeitnerScheduler();
+
+  describe('optimizeSchedule', () => {
+    const cards = (count: number, dueDay: number, earliestDay: number, prefix: string) =>
+      Array.from({ length: count }, (_, i) => ({ id: `${prefix}${i}`, dueDay, earliestDay }));
+
+    it('should pull the excess of a peak day forward within capacity', () => {
+      const { assignments, load } = scheduler.optimizeSchedule(cards(10, 3, 0, 'a'), 5, 4);
+
+      expect(load).toEqual([0, 2, 4, 4, 0]);
+      expect(assignments).toHaveLength(10);
+      expect(assignments.every(({ card, day }) => day <= card.dueDay && day >= card.earliestDay)).toBe(true);
+    });
+
+    it('should never move a card before its earliest allowed day', () => {
+      const { load } = scheduler.optimizeSchedule(cards(6, 2, 2, 'fixed'), 3, 4);
+
+      expect(load).toEqual([0, 0, 6]);
+    });
+
+    it('should move the flexible cards first and leave under-capacity days untouched', () => {
+      const input = [...cards(3, 2, 2, 'fixed'), ...cards(3, 2, 0, 'flex'), ...cards(2, 4, 4, 'later')];
+      const { assignments, load } = scheduler.optimizeSchedule(input, 5, 4);
+
+      expect(load).toEqual([0, 2, 4, 0, 2]);
+      const moved = assignments.filter(({ card, day }) => day < card.dueDay).map(({ card }) => card.id);
+      expect(moved.every((id) => id.startsWith('flex'))).toBe(true);
+    });
+  });
+
+  describe('bucketByDay', () => {
+    it('should count raw reviews and aggregated rows in the same buckets', () => {
+      const from = new Date(2024, 0, 1, 9);
+      const buckets = scheduler.bucketByDay(
+        [
+          { nextReviewAt: new Date(2024, 0, 1, 20), stage: 1 },
+          { nextReviewAt: '2024-01-02', stage: 2, count: 5 },
+          { nextReviewAt: new Date(2024, 0, 9), stage: 3 },
+        ],
+        3,
+        from,
+      );
+
+      expect(buckets.map((bucket) => bucket.count)).toEqual([1, 5, 0]);
+      expect(buckets[1].stages.get(2)).toBe(5);
+    });
+  });
+
+  describe('calculateNextReviewBatch', () => {
+    it('should match calculateNextReview for every box, result, difficulty and ease factor', () => {
+      const now = new Date(2024, 2, 30, 10);
+      const cases: Array<{ box: number; result: ReviewResult; difficulty?: ReviewDifficulty; ease: number }> = [];
+      for (const box of [1, 2, 3, 4, 5]) {
+        for (const result of Object.values(ReviewResult)) {
+          for (const difficulty of [undefined, ...Object.values(ReviewDifficulty)]) {
+            for (const ease of [1.3, 2.05, 2.5, 2.95, 3.0]) {
+              cases.push({ box, result, difficulty, ease });
+            }
+          }
+        }
+      }
+
+      const batch = scheduler.calculateNextReviewBatch(
+        {
+          boxes: cases.map((c) => c.box),
+          results: cases.map((c) => REVIEW_RESULT_CODES[c.result]),
+          difficulties: cases.map((c) => (c.difficulty ? REVIEW_DIFFICULTY_CODES[c.difficulty] : ReviewDifficultyCode.NONE)),
+          easeFactors: Float64Array.from(cases, (c) => c.ease),
+        },
+        now,
+      );
+
+      cases.forEach((c, i) => {
+        const expected = scheduler.calculateNextReview(c.box, c.result, c.difficulty, c.ease, now);
+        expect({
+          newBox: batch.newBoxes[i],
+          intervalDays: batch.intervalDays[i],
+          easeFactor: batch.easeFactors[i],
+          nextReviewAt: batch.nextReviewAt[i],
+        }).toEqual({ ...expected, nextReviewAt: expected.nextReviewAt.getTime() });
+      });
+    });
+  });
+
+  describe('calculateInitialReviewBatch', () => {
+    it('should match calculateInitialReview including out-of-range stages', () => {
+      const now = new Date(2024, 0, 1, 9);
+      const stages = [0, 1, 2, 3, 4, 5, 9];
+      const batch = scheduler.calculateInitialReviewBatch(stages, now);
+
+      stages.forEach((stage, i) => {
+        const expected = scheduler.calculateInitialReview(stage, now);
+        expect(batch.boxes[i]).toBe(expected.box);
+        expect(batch.intervalDays[i]).toBe(expected.intervalDays);
+        expect(batch.nextReviewAt[i]).toBe(expected.nextReviewAt.getTime());
+      });
+    });
+  });
+});
@@ -5,6 +5,104 @@ import {
   ReviewDifficulty,
 } from './dto/review.dto';
 
+/**
+ * 复习结果编码（批量计算使用的数值形式）
+ */
+export enum ReviewResultCode {
+  CORRECT = 0,
+  PARTIALLY = 1,
+  INCORRECT = 2,
+  FORGOTTEN = 3,
+}
+
+/**
+ * 复习难度编码，0 表示未填写
+ */
+export enum ReviewDifficultyCode {
+  NONE = 0,
+  EASY = 1,
+  MEDIUM = 2,
+  HARD = 3,
+}
+
+export const REVIEW_RESULT_CODES: Record<ReviewResult, ReviewResultCode> = {
+  [ReviewResult.CORRECT]: ReviewResultCode.CORRECT,
+  [ReviewResult.PARTIALLY]: ReviewResultCode.PARTIALLY,
+  [ReviewResult.INCORRECT]: ReviewResultCode.INCORRECT,
+  [ReviewResult.FORGOTTEN]: ReviewResultCode.FORGOTTEN,
+};
+
+export const REVIEW_DIFFICULTY_CODES: Record<ReviewDifficulty, ReviewDifficultyCode> = {
+  [ReviewDifficulty.EASY]: ReviewDifficultyCode.EASY,
+  [ReviewDifficulty.MEDIUM]: ReviewDifficultyCode.MEDIUM,
+  [ReviewDifficulty.HARD]: ReviewDifficultyCode.HARD,
+};
+
+/**
+ * 批量计算的输入：各数组按下标一一对应，长度以 boxes 为准
+ */
+export interface ReviewBatchInput {
+  boxes: ArrayLike<number>;
+  results: ArrayLike<ReviewResultCode>;
+  difficulties?: ArrayLike<ReviewDifficultyCode>;
+  easeFactors?: ArrayLike<number>;
+}
+
+/**
+ * 批量计算的输出，nextReviewAt 为毫秒时间戳
+ */
+export interface ReviewBatchResult {
+  newBoxes: Uint8Array;
+  intervalDays: Int32Array;
+  easeFactors: Float64Array;
+  nextReviewAt: Float64Array;
+}
+
+const BOX_COUNT = LEITNER_BOXES.length;
+const DEFAULT_EASE_FACTOR = 2.5;
+
+// 按箱子编号直接索引的配置表与间隔表（下标 0 不使用），替代逐次 find
+const BOX_BY_NUMBER = LEITNER_BOXES.reduce<Array<(typeof LEITNER_BOXES)[number]>>((table, config) => {
+  table[config.box] = config;
+  return table;
+}, []);
+const BOX_INTERVALS = Int32Array.from(BOX_BY_NUMBER, (config) => config?.intervalDays ?? 1);
+
+/**
+ * 箱子的复习间隔天数，未配置的箱子按 1 天计
+ */
+function boxInterval(box: number): number {
+  return box >= 1 && box < BOX_INTERVALS.length ? BOX_INTERVALS[box] : 1;
+}
+
+/**
+ * easeFactor 保留两位小数
+ */
+function roundEase(easeFactor: number): number {
+  return Math.round(easeFactor * 100) / 100;
+}
+
+/**
+ * 按间隔天数缓存到期时间戳：同一批次内间隔取值有限，每种间隔只做一次日期运算
+ */
+function dueTimeCache(now: Date, hoursForOneDay = false): (intervalDays: number) => number {
+  const cache = new Map<number, number>();
+  return (intervalDays) => {
+    let time = cache.get(intervalDays);
+    if (time === undefined) {
+      const date = new Date(now);
+      if (hoursForOneDay && intervalDays === 1) {
+        date.setHours(date.getHours() + 1);
+      } else {
+        date.setDate(date.getDate() + intervalDays);
+      }
+      time = date.getTime();
+      cache.set(intervalDays, time);
+    }
+    return time;
+  };
+}
+
 /**
  * Leitner 箱子调度器
  * 实现 Leitner 间隔重复算法
@@ -24,7 +122,8 @@ export class LeitnerScheduler {
     currentBox: number,
     result: ReviewResult,
     difficulty?: ReviewDifficulty,
-    currentEaseFactor: number = 2.5,
+    currentEaseFactor: number = DEFAULT_EASE_FACTOR,
+    now: Date = new Date(),
   ): {
     newBox: number;
     intervalDays: number;
@@ -39,10 +138,10 @@ export class LeitnerScheduler {
       case ReviewResult.CORRECT:
         // 正确：根据难度决定是否升级
         if (difficulty === ReviewDifficulty.EASY) {
-          newBox = Math.min(currentBox + 2, LEITNER_BOXES.length);
+          newBox = Math.min(currentBox + 2, BOX_COUNT);
           easeFactor += 0.15;
         } else if (difficulty === ReviewDifficulty.MEDIUM) {
-          newBox = Math.min(currentBox + 1, LEITNER_BOXES.length);
+          newBox = Math.min(currentBox + 1, BOX_COUNT);
           easeFactor += 0.1;
         } else {
           // HARD - 保持当前箱子
@@ -68,8 +167,7 @@ export class LeitnerScheduler {
     easeFactor = Math.max(1.3, Math.min(3.0, easeFactor));
 
     // 获取新箱子的间隔天数
-    const boxConfig = LEITNER_BOXES.find((b) => b.box === newBox);
-    let intervalDays = boxConfig ? boxConfig.intervalDays : 1;
+    let intervalDays = boxInterval(newBox);
 
     // 使用 easeFactor 调整间隔
     // 简单的 SM-2 变体算法
@@ -79,13 +177,13 @@ export class LeitnerScheduler {
     }
 
     // 计算下次复习时间
-    const nextReviewAt = new Date();
+    const nextReviewAt = new Date(now);
     nextReviewAt.setDate(nextReviewAt.getDate() + intervalDays);
 
     return {
       newBox,
       intervalDays,
-      easeFactor: parseFloat(easeFactor.toFixed(2)),
+      easeFactor: roundEase(easeFactor),
       nextReviewAt,
     };
   }
@@ -93,16 +191,15 @@ export class LeitnerScheduler {
   /**
    * 计算初始复习时间
    */
-  calculateInitialReview(initialStage: number = 1): {
+  calculateInitialReview(initialStage: number = 1, now: Date = new Date()): {
     box: number;
     intervalDays: number;
     nextReviewAt: Date;
   } {
-    const box = Math.min(Math.max(initialStage, 1), LEITNER_BOXES.length);
-    const boxConfig = LEITNER_BOXES.find((b) => b.box === box);
-    const intervalDays = boxConfig ? boxConfig.intervalDays : 1;
+    const box = Math.min(Math.max(initialStage, 1), BOX_COUNT);
+    const intervalDays = boxInterval(box);
 
-    const nextReviewAt = new Date();
+    const nextReviewAt = new Date(now);
     // 新加入的错题，第一次复习设为今天
     if (intervalDays === 1) {
       nextReviewAt.setHours(nextReviewAt.getHours() + 1); // 1小时后复习
@@ -117,11 +214,92 @@ export class LeitnerScheduler {
     };
   }
 
+  /**
+   * 批量计算下一个复习状态（与 calculateNextReview 逐条计算结果一致）
+   * 单次遍历，按箱子编号查表取间隔；整批共用同一个 now，到期时间按间隔天数缓存，不逐条创建 Date
+   */
+  calculateNextReviewBatch(input: ReviewBatchInput, now: Date = new Date()): ReviewBatchResult {
+    const { boxes, results, difficulties, easeFactors } = input;
+    const count = boxes.length;
+    const dueTime = dueTimeCache(now);
+
+    const newBoxes = new Uint8Array(count);
+    const intervals = new Int32Array(count);
+    const eases = new Float64Array(count);
+    const nextReviewAt = new Float64Array(count);
+
+    for (let i = 0; i < count; i++) {
+      const currentBox = boxes[i];
+      const result = results[i];
+      let newBox = currentBox;
+      let easeFactor = easeFactors ? easeFactors[i] : DEFAULT_EASE_FACTOR;
+
+      if (result === ReviewResultCode.CORRECT) {
+        const difficulty = difficulties ? difficulties[i] : ReviewDifficultyCode.NONE;
+        if (difficulty === ReviewDifficultyCode.EASY) {
+          newBox = Math.min(currentBox + 2, BOX_COUNT);
+          easeFactor += 0.15;
+        } else if (difficulty === ReviewDifficultyCode.MEDIUM) {
+          newBox = Math.min(currentBox + 1, BOX_COUNT);
+          easeFactor += 0.1;
+        } else {
+          easeFactor -= 0.05;
+        }
+      } else if (result === ReviewResultCode.PARTIALLY) {
+        newBox = Math.max(currentBox - 1, 1);
+        easeFactor -= 0.1;
+      } else {
+        newBox = 1;
+        easeFactor = Math.max(2.0, easeFactor - 0.3);
+      }
+
+      easeFactor = Math.max(1.3, Math.min(3.0, easeFactor));
+
+      let intervalDays = boxInterval(newBox);
+      if (newBox === currentBox && result === ReviewResultCode.CORRECT) {
+        intervalDays = Math.floor(intervalDays * easeFactor);
+      }
+
+      newBoxes[i] = newBox;
+      intervals[i] = intervalDays;
+      eases[i] = roundEase(easeFactor);
+      nextReviewAt[i] = dueTime(intervalDays);
+    }
+
+    return { newBoxes, intervalDays: intervals, easeFactors: eases, nextReviewAt };
+  }
+
+  /**
+   * 批量计算初始复习时间（与 calculateInitialReview 逐条计算结果一致）
+   */
+  calculateInitialReviewBatch(
+    initialStages: ArrayLike<number>,
+    now: Date = new Date(),
+  ): { boxes: Uint8Array; intervalDays: Int32Array; nextReviewAt: Float64Array } {
+    const count = initialStages.length;
+    const dueTime = dueTimeCache(now, true);
+
+    const boxes = new Uint8Array(count);
+    const intervals = new Int32Array(count);
+    const nextReviewAt = new Float64Array(count);
+
+    for (let i = 0; i < count; i++) {
+      const box = Math.min(Math.max(initialStages[i], 1), BOX_COUNT);
+      const intervalDays = boxInterval(box);
+
+      boxes[i] = box;
+      intervals[i] = intervalDays;
+      nextReviewAt[i] = dueTime(intervalDays);
+    }
+
+    return { boxes, intervalDays: intervals, nextReviewAt };
+  }
+
   /**
    * 获取箱子信息
    */
   getBoxInfo(box: number) {
-    return LEITNER_BOXES.find((b) => b.box === box);
+    return BOX_BY_NUMBER[box];
   }
 
   /**
@@ -146,7 +324,7 @@ export class LeitnerScheduler {
 
     // 越期越久 + 箱子越小 = 优先级越高
     // 基础优先级基于箱子编号（箱子越小优先级越高）
-    const basePriority = (LEITNER_BOXES.length - review.stage + 1) * 100;
+    const basePriority = (BOX_COUNT - review.stage + 1) * 100;
 
     // 越期加分（每小时加1分）
     const overdueBonus = Math.max(0, overdueHours);
@@ -189,101 +367,116 @@ export class LeitnerScheduler {
     return LEITNER_BOXES.filter((b) => b.intervalDays <= 7).map((b) => b.box);
   }
 
+  /**
+   * 按到期日分桶（单次遍历）
+   * 条目可以是单条复习（nextReviewAt 为 Date），也可以是按天聚合的结果（nextReviewAt 为 'YYYY-MM-DD'，附带 count）；
+   * 只统计从 from 当天起 days 天内到期的条目
+   */
+  bucketByDay(
+    entries: Iterable<{ nextReviewAt: Date | string; stage: number; count?: number }>,
+    days: number,
+    from: Date = new Date(),
+  ): Array<{ date: Date; count: number; stages: Map<number, number> }> {
+    const buckets: Array<{ date: Date; count: number; stages: Map<number, number> }> = [];
+    const indexByDay = new Map<string, number>();
+
+    for (let i = 0; i < days; i++) {
+      const date = new Date(from);
+      date.setDate(date.getDate() + i);
+      date.setHours(0, 0, 0, 0);
+      indexByDay.set(this.dayKey(date), i);
+      buckets.push({ date, count: 0, stages: new Map() });
+    }
+
+    for (const entry of entries) {
+      const day = typeof entry.nextReviewAt === 'string' ? entry.nextReviewAt : this.dayKey(entry.nextReviewAt);
+      const index = indexByDay.get(day);
+      if (index === undefined) continue;
+
+      const count = entry.count ?? 1;
+      const bucket = buckets[index];
+      bucket.count += count;
+      bucket.stages.set(entry.stage, (bucket.stages.get(entry.stage) || 0) + count);
+    }
+
+    return buckets;
+  }
+
   /**
    * 预测未来复习负荷
    */
   predictFutureLoad(
-    currentReviews: Array<{
-      nextReviewAt: Date;
+    currentReviews: Iterable<{
+      nextReviewAt: Date | string;
       stage: number;
+      count?: number;
     }>,
     days: number = 7,
   ): Array<{ date: Date; count: number }> {
-    const prediction: Array<{ date: Date; count: number }> = [];
-
-    for (let i = 0; i < days; i++) {
-      const targetDate = new Date();
-      targetDate.setDate(targetDate.getDate() + i);
-      targetDate.setHours(0, 0, 0, 0);
-
-      const nextDay = new Date(targetDate);
-      nextDay.setDate(nextDay.getDate() + 1);
-
-      // 统计该日期到期的复习数量
-      const count = currentReviews.filter((r) => {
-        return r.nextReviewAt >= targetDate && r.nextReviewAt < nextDay;
-      }).length;
-
-      prediction.push({
-        date: targetDate,
-        count,
-      });
-    }
-
-    return prediction;
+    return this.bucketByDay(currentReviews, days).map(({ date, count }) => ({ date, count }));
   }
 
   /**
-   * 优化复习计划
-   * 如果某天复习量过大，建议提前复习部分内容
+   * 复习负荷均衡
+   * 以每日容量为上限，把超载日的复习提前，但不早于各自的最早允许日期（dueDay/earliestDay 为相对今天的天数）。
+   * 从远到近逐日分配：最早允许日期就是当天的复习必须留在当天；剩余容量先给等待最久的复习，
+   * 其余顺延到前一天。复习只会被提前，且只提前到必要的程度；无法满足容量时当天超载
    */
-  optimizeSchedule(
-    prediction: Array<{ date: Date; count: number }>,
-    maxDaily: number = 50,
-  ): {
-    hasOverload: boolean;
-    recommendations: string[];
-    suggestedMoves: Array<{
-      from: Date;
-      to: Date;
-      count: number;
-    }>;
-  } {
-    const recommendations: string[] = [];
-    const suggestedMoves: Array<{
-      from: Date;
-      to: Date;
-      count: number;
-    }> = [];
-
-    let hasOverload = false;
-
-    for (let i = 0; i < prediction.length; i++) {
-      const day = prediction[i];
-
-      if (day.count > maxDaily) {
-        hasOverload = true;
-        const excess = day.count - maxDaily;
-
-        recommendations.push(
-          `${day.date.toLocaleDateString()} 复习量过大 (${day.count}题)`,
-        );
-        recommendations.push(
-          `建议提前复习 ${excess} 道题，分散学习压力`,
-        );
-
-        // 查找之前复习量较少的日期
-        for (let j = Math.max(0, i - 3); j < i; j++) {
-          const prevDay = prediction[j];
-          if (prevDay.count < maxDaily * 0.5) {
-            const moveCount = Math.min(
-              excess,
-              Math.floor((maxDaily - prevDay.count) / 2),
-            );
-            suggestedMoves.push({
-              from: day.date,
-              to: prevDay.date,
-              count: moveCount,
-            });
-          }
+  optimizeSchedule<T extends { dueDay: number; earliestDay: number }>(
+    cards: T[],
+    days: number,
+    capacity: number,
+  ): { assignments: Array<{ card: T; day: number }>; load: number[] } {
+    const clamp = (day: number, max: number) => Math.min(Math.max(day, 0), max);
+
+    const arriving: T[][] = Array.from({ length: days }, () => []);
+    for (const card of cards) {
+      arriving[clamp(card.dueDay, days - 1)].push(card);
+    }
+
+    // 按最早允许日期分组的待分配复习（FIFO：先到的等待更久）
+    const waiting: T[][] = Array.from({ length: days }, () => []);
+    const heads = new Array<number>(days).fill(0);
+    const load = new Array<number>(days).fill(0);
+    const assignments: Array<{ card: T; day: number }> = [];
+
+    for (let day = days - 1; day >= 0; day--) {
+      for (const card of arriving[day]) {
+        waiting[clamp(card.earliestDay, day)].push(card);
+      }
+
+      for (let i = heads[day]; i < waiting[day].length; i++) {
+        assignments.push({ card: waiting[day][i], day });
+      }
+      load[day] = waiting[day].length - heads[day];
+      waiting[day] = [];
+
+      for (let earliest = day - 1; earliest >= 0 && load[day] < capacity; earliest--) {
+        const bucket = waiting[earliest];
+        while (heads[earliest] < bucket.length && load[day] < capacity) {
+          assignments.push({ card: bucket[heads[earliest]++], day });
+          load[day]++;
         }
       }
     }
 
-    return {
-      hasOverload,
-      recommendations,
-      suggestedMoves,
-    };
+    return { assignments, load };
+  }
+
+  /**
+   * 距 from 当天的天数（按本地日期计算，与时刻无关）
+   */
+  dayOffset(date: Date, from: Date = new Date()): number {
+    const toUtcDay = (d: Date) => Date.UTC(d.getFullYear(), d.getMonth(), d.getDate());
+    return Math.round((toUtcDay(date) - toUtcDay(from)) / 86400000);
+  }
+
+  /**
+   * 本地日期键 YYYY-MM-DD
+   */
+  private dayKey(date: Date): string {
+    const month = String(date.getMonth() + 1).padStart(2, '0');
+    const day = String(date.getDate()).padStart(2, '0');
+    return `${date.getFullYear()}-${month}-${day}`;
   }
 }
@@ -8,6 +8,7 @@ import {
   Param,
   Query,
   UseGuards,
+  UseInterceptors,
   Request,
 } from '@nestjs/common';
 import {
@@ -17,12 +18,14 @@ import {
   ApiQuery,
 } from '@nestjs/swagger';
 import { JwtAuthGuard } from '../../common/guards/jwt-auth.guard';
+import { ETagInterceptor } from '../../common/interceptors/etag.interceptor';
 import { ReviewService } from './review.service';
 import { LeitnerScheduler } from './leitner-scheduler.service';
 import {
   AddToReviewDto,
   StartReviewDto,
   GetReviewScheduleDto,
+  OptimizeScheduleDto,
   GetDueReviewsDto,
   ReviewResult,
   ReviewDifficulty,
@@ -157,6 +160,7 @@ export class ReviewController {
    * 获取复习计划
    */
   @Get('schedule')
+  @UseInterceptors(ETagInterceptor)
   @ApiOperation({ summary: '获取复习计划' })
   async getSchedule(
     @Request() req,
@@ -205,11 +209,16 @@ export class ReviewController {
     @Request() req,
     @Query('days') days?: number,
   ) {
-    // TODO: 实现负荷预测
     const daysToPredict = days ? parseInt(days.toString()) : 7;
-    return {
-      message: '负荷预测功能开发中',
-      days: daysToPredict,
-    };
+    return this.reviewService.predictLoad(req.user.sub, daysToPredict);
+  }
+
+  /**
+   * 复习负荷均衡
+   */
+  @Post('optimize')
+  @ApiOperation({ summary: '按每日容量均衡复习负荷（提前超载日的部分复习）' })
+  async optimizeSchedule(@Request() req, @Body() dto: OptimizeScheduleDto) {
+    return this.reviewService.optimizeSchedule(req.user.sub, dto);
   }
 }
@@ -6,10 +6,12 @@ import { Mistake } from '../mistake/entities/mistake.entity';
 import { ReviewController } from './review.controller';
 import { ReviewService } from './review.service';
 import { LeitnerScheduler } from './leitner-scheduler.service';
+import { StatisticsModule } from '../statistics/statistics.module';
 
 @Module({
   imports: [
     JwtModule,
+    StatisticsModule,
     TypeOrmModule.forFeature([
       Review,
       Mistake,
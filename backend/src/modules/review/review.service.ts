@@ -1,9 +1,10 @@
 import { Injectable, NotFoundException, BadRequestException } from '@nestjs/common';
 import { InjectRepository } from '@nestjs/typeorm';
-import { Repository, LessThanOrEqual, Between } from 'typeorm';
+import { Repository, LessThanOrEqual } from 'typeorm';
 import { Review } from './entities/review.entity';
 import { Mistake } from '../mistake/entities/mistake.entity';
 import { LeitnerScheduler } from './leitner-scheduler.service';
+import { StatsRollupService } from '../statistics/stats-rollup.service';
 import {
   ReviewStatus,
   ReviewResult,
@@ -16,8 +17,13 @@ import {
   ReviewStatistics,
   ReviewHistoryResponse,
   ReviewHistoryItem,
+  OptimizeScheduleDto,
+  OptimizeScheduleResponse,
 } from './dto/review.dto';
 
+const BATCH_INSERT_SIZE = 500;
+const RESCHEDULE_CHUNK_SIZE = 1000;
+
 /**
  * 复习服务
  * 负责管理错题的复习流程
@@ -30,6 +36,7 @@ export class ReviewService {
     @InjectRepository(Mistake)
     private mistakeRepository: Repository<Mistake>,
     private leitnerScheduler: LeitnerScheduler,
+    private statsRollupService: StatsRollupService,
   ) {}
 
   /**
@@ -84,25 +91,91 @@ export class ReviewService {
 
   /**
    * 批量添加到复习队列
+   * 一次 IN 查询校验错题和已有复习记录，已在队列中的重置到第一个箱子，其余在同一事务中批量插入
    */
   async batchAddToReview(
     userId: string,
     mistakeIds: string[],
     initialStage: number = 1,
-  ): Promise<{ added: number; skipped: number }> {
-    let added = 0;
-    let skipped = 0;
-
-    for (const mistakeId of mistakeIds) {
-      try {
-        await this.addToReview(userId, { mistakeId, initialStage });
-        added++;
-      } catch (error) {
-        skipped++;
-      }
+  ): Promise<{ added: number; inserted: number; reset: number; skipped: number }> {
+    const uniqueIds = [...new Set(mistakeIds || [])];
+    if (uniqueIds.length === 0) {
+      return { added: 0, inserted: 0, reset: 0, skipped: mistakeIds?.length || 0 };
     }
 
-    return { added, skipped };
+    const result = await this.reviewRepository.manager.transaction(async (manager) => {
+      const mistakes: Array<{ id: string }> = await manager
+        .getRepository(Mistake)
+        .createQueryBuilder('mistake')
+        .select('mistake.id', 'id')
+        .where('mistake.id IN (:...ids)', { ids: uniqueIds })
+        .getRawMany();
+      const validIds = new Set(mistakes.map((m) => m.id));
+
+      const repository = manager.getRepository(Review);
+      const existing = validIds.size
+        ? await repository
+            .createQueryBuilder('review')
+            .select(['review.id', 'review.mistakeId'])
+            .where('review.userId = :userId', { userId })
+            .andWhere('review.mistakeId IN (:...ids)', { ids: [...validIds] })
+            .orderBy('review.createdAt', 'DESC')
+            .getMany()
+        : [];
+
+      // 每道错题只重置最近的一条复习记录
+      const resetIds = new Map<string, string>();
+      for (const review of existing) {
+        if (!resetIds.has(review.mistakeId)) {
+          resetIds.set(review.mistakeId, review.id);
+        }
+      }
+
+      if (resetIds.size > 0) {
+        const restart = this.leitnerScheduler.calculateInitialReview(1);
+        await repository
+          .createQueryBuilder()
+          .update(Review)
+          .set({
+            stage: 1,
+            status: ReviewStatus.PENDING,
+            nextReviewAt: restart.nextReviewAt,
+            intervalDays: restart.intervalDays,
+            easeFactor: 2.5,
+          })
+          .whereInIds([...resetIds.values()])
+          .execute();
+      }
+
+      const initial = this.leitnerScheduler.calculateInitialReview(initialStage);
+      const rows = uniqueIds
+        .filter((id) => validIds.has(id) && !resetIds.has(id))
+        .map((mistakeId) =>
+          repository.create({
+            userId,
+            mistakeId,
+            stage: initial.box,
+            nextReviewAt: initial.nextReviewAt,
+            intervalDays: initial.intervalDays,
+            easeFactor: 2.5,
+            status: ReviewStatus.PENDING,
+          }),
+        );
+
+      for (let i = 0; i < rows.length; i += BATCH_INSERT_SIZE) {
+        await repository.insert(rows.slice(i, i + BATCH_INSERT_SIZE));
+      }
+
+      return { inserted: rows.length, reset: resetIds.size };
+    });
+
+    const added = result.inserted + result.reset;
+    return {
+      added,
+      inserted: result.inserted,
+      reset: result.reset,
+      skipped: mistakeIds.length - added,
+    };
   }
 
   /**
@@ -133,20 +206,21 @@ export class ReviewService {
       queryBuilder.andWhere('review.stage = :box', { box });
     }
 
-    // 按优先级排序
+    // 按优先级排序（错题为多对一关联，直接 LIMIT）
     const reviews = await queryBuilder
       .orderBy('review.nextReviewAt', 'ASC')
       .addOrderBy('review.stage', 'ASC')
-      .take(limit)
+      .limit(limit)
       .getMany();
 
+    const reviewCounts = await this.getReviewCounts(
+      reviews.map((review) => review.mistakeId),
+    );
+
     const items = [];
 
     for (const review of reviews) {
-      const mistake = await this.mistakeRepository.findOne({
-        where: { id: review.mistakeId },
-      });
-
+      const mistake = review.mistake;
       if (!mistake) continue;
 
       items.push({
@@ -156,7 +230,7 @@ export class ReviewService {
         subject: mistake.subjectId,
         subjectId: mistake.subjectId,
         currentBox: review.stage,
-        reviewCount: await this.getReviewCount(review.mistakeId),
+        reviewCount: reviewCounts.get(mistake.id) || 0,
         lastReviewedAt: review.createdAt,
       });
     }
@@ -220,18 +294,18 @@ export class ReviewService {
           subjectId,
         })
         .orderBy('review.nextReviewAt', 'ASC')
-        .take(additionalNeeded)
+        .limit(additionalNeeded)
         .getMany();
 
-      for (const review of upcomingReviews) {
-        const mistake = await this.mistakeRepository.findOne({
-          where: { id: review.mistakeId },
-        });
+      const seen = new Set(items.map((item) => item.mistakeId));
 
+      for (const review of upcomingReviews) {
+        const mistake = review.mistake;
         if (!mistake) continue;
 
         // 检查是否已存在
-        if (!items.find((i) => i.mistakeId === mistake.id)) {
+        if (!seen.has(mistake.id)) {
+          seen.add(mistake.id);
           items.push({
             reviewId: review.id,
             mistakeId: mistake.id,
@@ -265,6 +339,7 @@ export class ReviewService {
   ): Promise<ReviewResultResponse> {
     const review = await this.reviewRepository.findOne({
       where: { id: reviewId, userId },
+      relations: { mistake: true },
     });
 
     if (!review) {
@@ -292,8 +367,7 @@ export class ReviewService {
     review.easeFactor = nextReview.easeFactor;
     review.isCorrect = result === ReviewResult.CORRECT;
     review.status = ReviewStatus.REVIEWED;
-
-    await this.reviewRepository.save(review);
+    review.reviewedAt = new Date();
 
     // 创建下一次的复习记录
     const newReview = this.reviewRepository.create({
@@ -306,7 +380,18 @@ export class ReviewService {
       status: ReviewStatus.PENDING,
     });
 
-    await this.reviewRepository.save(newReview);
+    await this.reviewRepository.manager.transaction(async (manager) => {
+      const repository = manager.getRepository(Review);
+      await repository.save(review);
+      await repository.save(newReview);
+      await this.statsRollupService.apply(
+        manager,
+        userId,
+        review.mistake?.subjectId || 'general',
+        { reviewCount: 1, reviewCorrectCount: review.isCorrect ? 1 : 0 },
+        review.reviewedAt,
+      );
+    });
 
     // 获取连续正确天数
     const streakDays = await this.getStreakDays(userId, review.mistakeId);
@@ -327,107 +412,109 @@ export class ReviewService {
    */
   async getStatistics(userId: string): Promise<ReviewStatistics> {
     const now = new Date();
-    const todayStart = new Date(now.setHours(0, 0, 0, 0));
-    const weekStart = new Date(now.setDate(now.getDate() - 7));
-    const monthStart = new Date(now.setDate(now.getDate() - 30));
-
-    // 总体统计
-    const totalReviews = await this.reviewRepository.count({
-      where: { userId },
-    });
-
-    const pendingReviews = await this.reviewRepository.count({
-      where: { userId, status: ReviewStatus.PENDING },
-    });
-
-    // 今日复习
-    const todayReviews = await this.reviewRepository.find({
-      where: {
-        userId,
-        status: ReviewStatus.REVIEWED,
-        createdAt: Between(todayStart, new Date()),
-      },
-    });
-
-    const todayCorrect = todayReviews.filter((r) => r.isCorrect).length;
-
-    // 本周复习
-    const weekReviews = await this.reviewRepository.find({
-      where: {
-        userId,
-        status: ReviewStatus.REVIEWED,
-        createdAt: Between(weekStart, new Date()),
-      },
-    });
-
-    const weekCorrect = weekReviews.filter((r) => r.isCorrect).length;
-
-    // 本月复习
-    const monthReviews = await this.reviewRepository.find({
-      where: {
-        userId,
-        status: ReviewStatus.REVIEWED,
-        createdAt: Between(monthStart, new Date()),
-      },
-    });
-
-    const monthCorrect = monthReviews.filter((r) => r.isCorrect).length;
-
-    // 正确率
-    const allReviewed = await this.reviewRepository.find({
-      where: { userId, status: ReviewStatus.REVIEWED },
-    });
-    const correctRate =
-      allReviewed.length > 0
-        ? (allReviewed.filter((r) => r.isCorrect).length / allReviewed.length) *
-          100
-        : 0;
-
-    // Leitner 箱子分布
-    const boxDistribution = [];
-    for (const boxConfig of this.leitnerScheduler.getAllBoxes()) {
-      const boxReviews = await this.reviewRepository.find({
-        where: { userId, stage: boxConfig.box, status: ReviewStatus.PENDING },
-      });
+    const todayStart = new Date(now);
+    todayStart.setHours(0, 0, 0, 0);
+    const weekStart = new Date(todayStart);
+    weekStart.setDate(weekStart.getDate() - 7);
+    const monthStart = new Date(todayStart);
+    monthStart.setDate(monthStart.getDate() - 30);
+    const weekEnd = new Date(now);
+    weekEnd.setDate(weekEnd.getDate() + 7);
 
-      const todayDue = boxReviews.filter((r) =>
-        this.leitnerScheduler.isDue(r.nextReviewAt),
-      ).length;
+    // 总体及各时间窗口统计（一次条件聚合）
+    const totals = await this.reviewRepository
+      .createQueryBuilder('review')
+      .select('COUNT(*)', 'total')
+      .addSelect('SUM(CASE WHEN review.status = :pending THEN 1 ELSE 0 END)', 'pending')
+      .addSelect('SUM(CASE WHEN review.status = :reviewed THEN 1 ELSE 0 END)', 'reviewed')
+      .addSelect(
+        'SUM(CASE WHEN review.status = :reviewed AND review.isCorrect = 1 THEN 1 ELSE 0 END)',
+        'reviewedCorrect',
+      )
+      .addSelect(
+        'SUM(CASE WHEN review.status = :reviewed AND review.createdAt >= :todayStart THEN 1 ELSE 0 END)',
+        'today',
+      )
+      .addSelect(
+        'SUM(CASE WHEN review.status = :reviewed AND review.createdAt >= :todayStart AND review.isCorrect = 1 THEN 1 ELSE 0 END)',
+        'todayCorrect',
+      )
+      .addSelect(
+        'SUM(CASE WHEN review.status = :reviewed AND review.createdAt >= :weekStart THEN 1 ELSE 0 END)',
+        'week',
+      )
+      .addSelect(
+        'SUM(CASE WHEN review.status = :reviewed AND review.createdAt >= :weekStart AND review.isCorrect = 1 THEN 1 ELSE 0 END)',
+        'weekCorrect',
+      )
+      .addSelect(
+        'SUM(CASE WHEN review.status = :reviewed AND review.createdAt >= :monthStart THEN 1 ELSE 0 END)',
+        'month',
+      )
+      .addSelect(
+        'SUM(CASE WHEN review.status = :reviewed AND review.createdAt >= :monthStart AND review.isCorrect = 1 THEN 1 ELSE 0 END)',
+        'monthCorrect',
+      )
+      .where('review.userId = :userId', { userId })
+      .setParameters({
+        pending: ReviewStatus.PENDING,
+        reviewed: ReviewStatus.REVIEWED,
+        todayStart,
+        weekStart,
+        monthStart,
+      })
+      .getRawOne();
 
-      const weekEnd = new Date();
-      weekEnd.setDate(weekEnd.getDate() + 7);
-      const weekDue = boxReviews.filter(
-        (r) => r.nextReviewAt <= weekEnd,
-      ).length;
+    const count = (key: string) => Number(totals?.[key]) || 0;
 
-      boxDistribution.push({
+    // Leitner 箱子分布（一次分组聚合）
+    const boxRows: Array<{ box: string; count: string; dueToday: string; dueThisWeek: string }> =
+      await this.reviewRepository
+        .createQueryBuilder('review')
+        .select('review.stage', 'box')
+        .addSelect('COUNT(*)', 'count')
+        .addSelect('SUM(CASE WHEN review.nextReviewAt <= :now THEN 1 ELSE 0 END)', 'dueToday')
+        .addSelect('SUM(CASE WHEN review.nextReviewAt <= :weekEnd THEN 1 ELSE 0 END)', 'dueThisWeek')
+        .where('review.userId = :userId', { userId })
+        .andWhere('review.status = :status', { status: ReviewStatus.PENDING })
+        .setParameters({ now, weekEnd })
+        .groupBy('review.stage')
+        .getRawMany();
+
+    const boxCounts = new Map(boxRows.map((row) => [Number(row.box), row]));
+    const boxDistribution = this.leitnerScheduler.getAllBoxes().map((boxConfig) => {
+      const row = boxCounts.get(boxConfig.box);
+      return {
         box: boxConfig.box,
         label: boxConfig.label,
-        count: boxReviews.length,
-        dueToday: todayDue,
-        dueThisWeek: weekDue,
-      });
-    }
+        count: Number(row?.count) || 0,
+        dueToday: Number(row?.dueToday) || 0,
+        dueThisWeek: Number(row?.dueThisWeek) || 0,
+      };
+    });
+
+    const reviewed = count('reviewed');
+    const correctRate = reviewed > 0 ? (count('reviewedCorrect') / reviewed) * 100 : 0;
 
     return {
-      totalReviews,
-      pendingReviews,
-      completedToday: todayReviews.length,
+      totalReviews: count('total'),
+      pendingReviews: count('pending'),
+      completedToday: count('today'),
       correctRate: parseFloat(correctRate.toFixed(2)),
       todayReviews: {
-        total: todayReviews.length,
-        correct: todayCorrect,
-        incorrect: todayReviews.length - todayCorrect,
+        total: count('today'),
+        correct: count('todayCorrect'),
+        incorrect: count('today') - count('todayCorrect'),
       },
       weekReviews: {
-        total: weekReviews.length,
-        correct: weekCorrect,
-        incorrect: weekReviews.length - weekCorrect,
+        total: count('week'),
+        correct: count('weekCorrect'),
+        incorrect: count('week') - count('weekCorrect'),
       },
       monthReviews: {
-        total: monthReviews.length,
-        correct: monthCorrect,
-        incorrect: monthReviews.length - monthCorrect,
+        total: count('month'),
+        correct: count('monthCorrect'),
+        incorrect: count('month') - count('monthCorrect'),
       },
       boxDistribution,
     };
@@ -441,82 +528,172 @@ export class ReviewService {
     days: number = 7,
     subjectId?: string,
   ): Promise<ReviewScheduleResponse> {
+    // 摘要需要 30 天内的数据
+    const horizon = Math.max(days, 30);
+    const { rows, total } = await this.getDueCountsByDay(userId, horizon, subjectId);
+    const buckets = this.leitnerScheduler.bucketByDay(rows, horizon);
+
+    const schedule: ReviewScheduleResponse['schedule'] = buckets.slice(0, days).map((bucket) => ({
+      date: bucket.date,
+      dueCount: bucket.count,
+      boxDistribution: Array.from(bucket.stages.entries()).map(([box, count]) => ({ box, count })),
+    }));
+
+    const sumFirst = (n: number) => buckets.slice(0, n).reduce((sum, bucket) => sum + bucket.count, 0);
+
+    return {
+      schedule,
+      summary: {
+        totalDue: total,
+        dueToday: sumFirst(1),
+        dueThisWeek: sumFirst(7),
+        dueThisMonth: sumFirst(30),
+      },
+    };
+  }
+
+  /**
+   * 预测未来复习负荷
+   */
+  async predictLoad(userId: string, days: number = 7): Promise<Array<{ date: Date; count: number }>> {
+    const { rows } = await this.getDueCountsByDay(userId, days);
+    return this.leitnerScheduler.predictFutureLoad(rows, days);
+  }
+
+  /**
+   * 复习负荷均衡
+   * 读取范围内的待复习记录，按每日容量把超载日的复习提前（不早于最早允许日期），并批量写回 nextReviewAt
+   */
+  async optimizeSchedule(userId: string, dto: OptimizeScheduleDto): Promise<OptimizeScheduleResponse> {
+    const { days = 30, capacity = 50, maxAdvanceRatio = 0.3, dryRun = false } = dto;
+
+    const today = new Date();
+    today.setHours(0, 0, 0, 0);
+    const end = new Date(today);
+    end.setDate(end.getDate() + days);
+
     const reviews = await this.reviewRepository
       .createQueryBuilder('review')
-      .leftJoin('review.mistake', 'mistake')
+      .select(['review.id', 'review.nextReviewAt', 'review.intervalDays'])
       .where('review.userId = :userId', { userId })
       .andWhere('review.status = :status', { status: ReviewStatus.PENDING })
-      .andWhere(subjectId ? 'mistake.subjectId = :subjectId' : '1=1', {
-        subjectId,
-      })
+      .andWhere('review.nextReviewAt < :end', { end })
       .getMany();
 
-    const schedule: ReviewScheduleResponse['schedule'] = [];
-    const now = new Date();
-
-    for (let i = 0; i < days; i++) {
-      const targetDate = new Date(now);
-      targetDate.setDate(targetDate.getDate() + i);
-      targetDate.setHours(0, 0, 0, 0);
+    // 逾期的复习只能留在今天；其余最多提前复习间隔的 maxAdvanceRatio
+    const cards = reviews.map((review) => {
+      const dueDay = Math.max(0, this.leitnerScheduler.dayOffset(review.nextReviewAt, today));
+      const advance = Math.floor(Math.max(review.intervalDays || 0, 0) * maxAdvanceRatio);
+      return { id: review.id, dueDay, earliestDay: Math.max(0, dueDay - advance) };
+    });
 
-      const nextDay = new Date(targetDate);
-      nextDay.setDate(nextDay.getDate() + 1);
+    const before = new Array<number>(days).fill(0);
+    for (const card of cards) {
+      before[card.dueDay]++;
+    }
 
-      // 统计该日期到期的复习
-      const dueReviews = reviews.filter((r) => {
-        return r.nextReviewAt >= targetDate && r.nextReviewAt < nextDay;
-      });
+    const { assignments, load } = this.leitnerScheduler.optimizeSchedule(cards, days, capacity);
+    const moves = assignments
+      .filter(({ card, day }) => day < card.dueDay)
+      .map(({ card, day }) => ({ id: card.id, shiftDays: card.dueDay - day }));
 
-      // 按箱子分组
-      const boxMap = new Map<number, number>();
-      for (const review of dueReviews) {
-        boxMap.set(review.stage, (boxMap.get(review.stage) || 0) + 1);
-      }
+    if (!dryRun && moves.length > 0) {
+      await this.applyScheduleMoves(userId, moves);
+    }
 
-      const boxDistribution = Array.from(boxMap.entries()).map(
-        ([box, count]) => ({ box, count }),
-      );
+    return {
+      days,
+      capacity,
+      moved: moves.length,
+      peakBefore: Math.max(0, ...before),
+      peakAfter: Math.max(0, ...load),
+      overloadedDays: load.filter((count) => count > capacity).length,
+      applied: !dryRun && moves.length > 0,
+      load: load.map((after, index) => {
+        const date = new Date(today);
+        date.setDate(date.getDate() + index);
+        return { date, before: before[index], after };
+      }),
+    };
+  }
 
-      schedule.push({
-        date: targetDate,
-        dueCount: dueReviews.length,
-        boxDistribution,
-      });
-    }
+  /**
+   * 批量提前复习时间（保留原时刻，只移动日期）
+   * 每批一条 UPDATE，用 CASE 给出每条记录的提前天数；只修改仍为待复习的记录
+   */
+  private async applyScheduleMoves(userId: string, moves: Array<{ id: string; shiftDays: number }>) {
+    await this.reviewRepository.manager.transaction(async (manager) => {
+      for (let i = 0; i < moves.length; i += RESCHEDULE_CHUNK_SIZE) {
+        const chunk = moves.slice(i, i + RESCHEDULE_CHUNK_SIZE);
+        const parameters: Record<string, string | number> = {};
+        const cases = chunk
+          .map((move, index) => {
+            parameters[`moveId${index}`] = move.id;
+            parameters[`moveShift${index}`] = move.shiftDays;
+            return `WHEN :moveId${index} THEN :moveShift${index}`;
+          })
+          .join(' ');
+
+        await manager
+          .createQueryBuilder()
+          .update(Review)
+          .set({ nextReviewAt: () => `DATE_SUB(nextReviewAt, INTERVAL (CASE id ${cases} END) DAY)` })
+          .where('id IN (:...ids)', { ids: chunk.map((move) => move.id) })
+          .andWhere('user_id = :userId', { userId })
+          .andWhere('status = :status', { status: ReviewStatus.PENDING })
+          .setParameters(parameters)
+          .execute();
+      }
+    });
+  }
 
-    // 计算摘要
+  /**
+   * 待复习数量按 (到期日, 箱子) 聚合
+   * 今天之前与 horizon 天之后的归入同一个 NULL 分组，只用于总数；结果行数与复习总量无关
+   */
+  private async getDueCountsByDay(
+    userId: string,
+    horizon: number,
+    subjectId?: string,
+  ): Promise<{ rows: Array<{ nextReviewAt: string; stage: number; count: number }>; total: number }> {
     const today = new Date();
     today.setHours(0, 0, 0, 0);
-    const tomorrow = new Date(today);
-    tomorrow.setDate(tomorrow.getDate() + 1);
-
-    const weekEnd = new Date(today);
-    weekEnd.setDate(weekEnd.getDate() + 7);
+    const end = new Date(today);
+    end.setDate(end.getDate() + horizon);
 
-    const monthEnd = new Date(today);
-    monthEnd.setDate(monthEnd.getDate() + 30);
+    const queryBuilder = this.reviewRepository
+      .createQueryBuilder('review')
+      .select(
+        "CASE WHEN review.nextReviewAt >= :today AND review.nextReviewAt < :end THEN DATE_FORMAT(review.nextReviewAt, '%Y-%m-%d') END",
+        'day',
+      )
+      .addSelect('review.stage', 'stage')
+      .addSelect('COUNT(*)', 'count')
+      .where('review.userId = :userId', { userId })
+      .andWhere('review.status = :status', { status: ReviewStatus.PENDING })
+      .setParameters({ today, end })
+      .groupBy('day')
+      .addGroupBy('review.stage');
 
-    const dueToday = reviews.filter(
-      (r) => r.nextReviewAt >= today && r.nextReviewAt < tomorrow,
-    ).length;
+    if (subjectId) {
+      queryBuilder
+        .innerJoin('review.mistake', 'mistake')
+        .andWhere('mistake.subjectId = :subjectId', { subjectId });
+    }
 
-    const dueThisWeek = reviews.filter(
-      (r) => r.nextReviewAt >= today && r.nextReviewAt < weekEnd,
-    ).length;
+    const raw = await queryBuilder.getRawMany();
 
-    const dueThisMonth = reviews.filter(
-      (r) => r.nextReviewAt >= today && r.nextReviewAt < monthEnd,
-    ).length;
+    let total = 0;
+    const rows: Array<{ nextReviewAt: string; stage: number; count: number }> = [];
+    for (const row of raw) {
+      const count = Number(row.count) || 0;
+      total += count;
+      if (row.day) {
+        rows.push({ nextReviewAt: row.day, stage: Number(row.stage), count });
+      }
+    }
 
-    return {
-      schedule,
-      summary: {
-        totalDue: reviews.length,
-        dueToday,
-        dueThisWeek,
-        dueThisMonth,
-      },
-    };
+    return { rows, total };
   }
 
   /**
@@ -529,6 +706,7 @@ export class ReviewService {
   ): Promise<ReviewHistoryResponse> {
     const [reviews, total] = await this.reviewRepository.findAndCount({
       where: { userId, status: ReviewStatus.REVIEWED },
+      relations: { mistake: true },
       order: { createdAt: 'DESC' },
       skip: (page - 1) * limit,
       take: limit,
@@ -537,10 +715,7 @@ export class ReviewService {
     const items: ReviewHistoryItem[] = [];
 
     for (const review of reviews) {
-      const mistake = await this.mistakeRepository.findOne({
-        where: { id: review.mistakeId },
-      });
-
+      const mistake = review.mistake;
       if (!mistake) continue;
 
       items.push({
@@ -619,12 +794,28 @@ export class ReviewService {
   }
 
   /**
-   * 获取复习次数
+   * 批量获取复习次数（一次分组查询）
    */
-  private async getReviewCount(mistakeId: string): Promise<number> {
-    return this.reviewRepository.count({
-      where: { mistakeId, status: ReviewStatus.REVIEWED },
-    });
+  private async getReviewCounts(mistakeIds: string[]): Promise<Map<string, number>> {
+    const counts = new Map<string, number>();
+    if (mistakeIds.length === 0) {
+      return counts;
+    }
+
+    const rows: Array<{ mistakeId: string; count: string }> = await this.reviewRepository
+      .createQueryBuilder('review')
+      .select('review.mistakeId', 'mistakeId')
+      .addSelect('COUNT(*)', 'count')
+      .where('review.mistakeId IN (:...mistakeIds)', { mistakeIds: [...new Set(mistakeIds)] })
+      .andWhere('review.status = :status', { status: ReviewStatus.REVIEWED })
+      .groupBy('review.mistakeId')
+      .getRawMany();
+
+    for (const row of rows) {
+      counts.set(row.mistakeId, Number(row.count));
+    }
+
+    return counts;
   }
 
   /**
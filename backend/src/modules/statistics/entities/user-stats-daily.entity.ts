@@ -0,0 +1,60 @@
+import { Entity, Column, PrimaryColumn, UpdateDateColumn, Index } from 'typeorm';
+
+/**
+ * 用户 × 科目 × 日 统计汇总
+ * 各列均为当日增量，汇总任意时间段只需对行求和
+ */
+@Entity('user_stats_daily')
+@Index(['userId', 'day'])
+export class UserStatsDaily {
+  @PrimaryColumn({ name: 'user_id', type: 'varchar', length: 36 })
+  userId: string;
+
+  @PrimaryColumn({ name: 'subject_id', type: 'varchar', length: 64 })
+  subjectId: string;
+
+  @PrimaryColumn({ type: 'date' })
+  day: string;
+
+  // 错题
+  @Column({ name: 'mistake_count', type: 'int', default: 0 })
+  mistakeCount: number;
+
+  @Column({ name: 'mastered_count', type: 'int', default: 0 })
+  masteredCount: number;
+
+  @Column({ name: 'familiar_count', type: 'int', default: 0 })
+  familiarCount: number;
+
+  @Column({ name: 'unknown_count', type: 'int', default: 0 })
+  unknownCount: number;
+
+  @Column({ name: 'favorite_count', type: 'int', default: 0 })
+  favoriteCount: number;
+
+  // 练习
+  @Column({ name: 'exam_count', type: 'int', default: 0 })
+  examCount: number;
+
+  @Column({ name: 'question_count', type: 'int', default: 0 })
+  questionCount: number;
+
+  @Column({ name: 'correct_count', type: 'int', default: 0 })
+  correctCount: number;
+
+  @Column({ name: 'incorrect_count', type: 'int', default: 0 })
+  incorrectCount: number;
+
+  @Column({ name: 'time_spent', type: 'int', default: 0 })
+  timeSpent: number; // 单位：秒
+
+  // 复习
+  @Column({ name: 'review_count', type: 'int', default: 0 })
+  reviewCount: number;
+
+  @Column({ name: 'review_correct_count', type: 'int', default: 0 })
+  reviewCorrectCount: number;
+
+  @UpdateDateColumn({ name: 'updated_at' })
+  updatedAt: Date;
+}
@@ -0,0 +1,11 @@
+import { Module } from '@nestjs/common';
+import { TypeOrmModule } from '@nestjs/typeorm';
+import { UserStatsDaily } from './entities/user-stats-daily.entity';
+import { StatsRollupService } from './stats-rollup.service';
+
+@Module({
+  imports: [TypeOrmModule.forFeature([UserStatsDaily])],
+  providers: [StatsRollupService],
+  exports: [StatsRollupService],
+})
+export class StatisticsModule {}
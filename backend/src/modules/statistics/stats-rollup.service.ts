@@ -0,0 +1,426 @@
+import { Injectable, Logger, OnModuleInit } from '@nestjs/common';
+import { InjectRepository } from '@nestjs/typeorm';
+import {
+  Repository,
+  EntityManager,
+  DataSource,
+  EntitySubscriberInterface,
+  QueryRunner,
+  TransactionCommitEvent,
+  TransactionRollbackEvent,
+} from 'typeorm';
+import { UserStatsDaily } from './entities/user-stats-daily.entity';
+import { Subject } from '../subject/entities/subject.entity';
+
+/**
+ * 汇总增量（未给出的列视为 0）
+ */
+export interface StatsDelta {
+  mistakeCount?: number;
+  masteredCount?: number;
+  familiarCount?: number;
+  unknownCount?: number;
+  favoriteCount?: number;
+  examCount?: number;
+  questionCount?: number;
+  correctCount?: number;
+  incorrectCount?: number;
+  timeSpent?: number;
+  reviewCount?: number;
+  reviewCorrectCount?: number;
+}
+
+/**
+ * 影响汇总的错题字段
+ */
+export interface MistakeStatsSnapshot {
+  userId: string;
+  subjectId: string;
+  masteryLevel: string;
+  isFavorite: boolean;
+  // 汇总计入错题的创建日（与重建一致）；缺省为当前时间
+  createdAt?: Date;
+}
+
+/**
+ * 练习汇总
+ */
+export interface ExamSummary {
+  examCount: number;
+  questionCount: number;
+  correctCount: number;
+  incorrectCount: number;
+  timeSpent: number;
+  studyDays: number;
+}
+
+/**
+ * 错题汇总
+ */
+export interface MistakeSummary {
+  total: number;
+  masteredCount: number;
+  familiarCount: number;
+  unknownCount: number;
+  favoriteCount: number;
+  subjectStats: { subjectId: string; subjectName: string; count: number }[];
+}
+
+const TABLE = 'user_stats_daily';
+
+const DELTA_COLUMNS: Record<keyof StatsDelta, string> = {
+  mistakeCount: 'mistake_count',
+  masteredCount: 'mastered_count',
+  familiarCount: 'familiar_count',
+  unknownCount: 'unknown_count',
+  favoriteCount: 'favorite_count',
+  examCount: 'exam_count',
+  questionCount: 'question_count',
+  correctCount: 'correct_count',
+  incorrectCount: 'incorrect_count',
+  timeSpent: 'time_spent',
+  reviewCount: 'review_count',
+  reviewCorrectCount: 'review_correct_count',
+};
+
+const MASTERY_DELTA_KEYS: Record<string, keyof StatsDelta> = {
+  mastered: 'masteredCount',
+  familiar: 'familiarCount',
+  unknown: 'unknownCount',
+};
+
+/**
+ * 统计汇总服务
+ * 在业务写入的同一事务中累加 user × subject × day 增量，看板和导出直接读取汇总表；
+ * 事务提交后通知变更的用户，供依赖统计数据的缓存失效
+ */
+@Injectable()
+export class StatsRollupService implements OnModuleInit, EntitySubscriberInterface {
+  private readonly logger = new Logger(StatsRollupService.name);
+  private readonly changeListeners: Array<(userId: string) => void> = [];
+  // 事务内发生变更的用户，提交后再通知：提交前并发读到的仍是旧数据，过早失效会把旧数据重新写入缓存
+  private readonly pendingChanges = new WeakMap<QueryRunner, Set<string>>();
+
+  constructor(
+    @InjectRepository(UserStatsDaily)
+    private statsRepository: Repository<UserStatsDaily>,
+    private dataSource: DataSource,
+  ) {}
+
+  onModuleInit() {
+    this.dataSource.subscribers.push(this);
+  }
+
+  /**
+   * 注册用户统计变更监听
+   */
+  onUserChange(listener: (userId: string) => void): void {
+    this.changeListeners.push(listener);
+  }
+
+  afterTransactionCommit(event: TransactionCommitEvent): void {
+    // 嵌套事务（保存点）提交时外层事务仍未结束
+    if (event.queryRunner.isTransactionActive) return;
+
+    const users = this.pendingChanges.get(event.queryRunner);
+    if (!users) return;
+
+    this.pendingChanges.delete(event.queryRunner);
+    for (const userId of users) {
+      this.notifyChange(userId);
+    }
+  }
+
+  afterTransactionRollback(event: TransactionRollbackEvent): void {
+    if (!event.queryRunner.isTransactionActive) {
+      this.pendingChanges.delete(event.queryRunner);
+    }
+  }
+
+  /**
+   * 累加增量（INSERT ... ON DUPLICATE KEY UPDATE）
+   * date 应为业务表中实际写入的时间戳（完成时间、复习时间、错题创建时间），
+   * 日期由 MySQL 的 DATE() 计算，与重建时对同一列取 DATE() 的结果一致
+   */
+  async apply(
+    manager: EntityManager,
+    userId: string,
+    subjectId: string,
+    delta: StatsDelta,
+    date: Date = new Date(),
+  ): Promise<void> {
+    this.markChanged(manager, userId);
+
+    const entries = Object.entries(delta).filter(([, value]) => value) as [keyof StatsDelta, number][];
+    if (entries.length === 0) return;
+
+    const columns = entries.map(([key]) => DELTA_COLUMNS[key]);
+
+    await manager.query(
+      `INSERT INTO ${TABLE} (user_id, subject_id, day, ${columns.join(', ')})
+       VALUES (?, ?, DATE(?), ${columns.map(() => '?').join(', ')}) AS delta
+       ON DUPLICATE KEY UPDATE ${this.increment(columns, 'delta')}`,
+      [userId, subjectId, date, ...entries.map(([, value]) => value)],
+    );
+  }
+
+  /**
+   * 记录错题变更：before 为 null 表示新建，after 为 null 表示删除
+   */
+  async applyMistakeChange(
+    manager: EntityManager,
+    before: MistakeStatsSnapshot | null,
+    after: MistakeStatsSnapshot | null,
+  ): Promise<void> {
+    await this.applyMistakeChanges(manager, [{ before, after }]);
+  }
+
+  /**
+   * 批量记录错题变更，同一用户、科目和创建时间的增量合并为一次写入
+   */
+  async applyMistakeChanges(
+    manager: EntityManager,
+    changes: { before: MistakeStatsSnapshot | null; after: MistakeStatsSnapshot | null }[],
+  ): Promise<void> {
+    const merged = new Map<string, { userId: string; subjectId: string; date: Date; delta: StatsDelta }>();
+    const now = new Date();
+
+    const add = (mistake: MistakeStatsSnapshot, sign: number) => {
+      const date = mistake.createdAt ? new Date(mistake.createdAt) : now;
+      const key = `${mistake.userId}:${mistake.subjectId}:${date.getTime()}`;
+      const change = merged.get(key) || { userId: mistake.userId, subjectId: mistake.subjectId, date, delta: {} };
+      const delta = change.delta;
+      const masteryKey = MASTERY_DELTA_KEYS[mistake.masteryLevel] || 'unknownCount';
+
+      delta.mistakeCount = (delta.mistakeCount || 0) + sign;
+      delta[masteryKey] = (delta[masteryKey] || 0) + sign;
+      if (mistake.isFavorite) {
+        delta.favoriteCount = (delta.favoriteCount || 0) + sign;
+      }
+      merged.set(key, change);
+    };
+
+    for (const { before, after } of changes) {
+      if (before) add(before, -1);
+      if (after) add(after, 1);
+    }
+
+    for (const { userId, subjectId, date, delta } of merged.values()) {
+      await this.apply(manager, userId, subjectId, delta, date);
+    }
+  }
+
+  /**
+   * 获取错题汇总（按科目）
+   */
+  async getMistakeSummary(userId: string): Promise<MistakeSummary> {
+    const rows = await this.statsRepository
+      .createQueryBuilder('stats')
+      .select('stats.subjectId', 'subjectId')
+      .addSelect('subject.name', 'subjectName')
+      .addSelect('SUM(stats.mistakeCount)', 'count')
+      .addSelect('SUM(stats.masteredCount)', 'mastered')
+      .addSelect('SUM(stats.familiarCount)', 'familiar')
+      .addSelect('SUM(stats.unknownCount)', 'unknown')
+      .addSelect('SUM(stats.favoriteCount)', 'favorite')
+      .leftJoin(Subject, 'subject', 'subject.id = stats.subjectId')
+      .where('stats.userId = :userId', { userId })
+      .groupBy('stats.subjectId')
+      .addGroupBy('subject.name')
+      .getRawMany();
+
+    const summary: MistakeSummary = {
+      total: 0,
+      masteredCount: 0,
+      familiarCount: 0,
+      unknownCount: 0,
+      favoriteCount: 0,
+      subjectStats: [],
+    };
+
+    for (const row of rows) {
+      const count = Number(row.count) || 0;
+      summary.total += count;
+      summary.masteredCount += Number(row.mastered) || 0;
+      summary.familiarCount += Number(row.familiar) || 0;
+      summary.unknownCount += Number(row.unknown) || 0;
+      summary.favoriteCount += Number(row.favorite) || 0;
+
+      if (count > 0) {
+        summary.subjectStats.push({
+          subjectId: row.subjectId,
+          subjectName: row.subjectName,
+          count,
+        });
+      }
+    }
+
+    return summary;
+  }
+
+  /**
+   * 获取练习汇总（可选日期范围，按天粒度）
+   */
+  async getExamSummary(
+    userId: string,
+    dateRange?: { start: Date; end: Date },
+  ): Promise<ExamSummary> {
+    const queryBuilder = this.statsRepository
+      .createQueryBuilder('stats')
+      .select('SUM(stats.examCount)', 'examCount')
+      .addSelect('SUM(stats.questionCount)', 'questionCount')
+      .addSelect('SUM(stats.correctCount)', 'correctCount')
+      .addSelect('SUM(stats.incorrectCount)', 'incorrectCount')
+      .addSelect('SUM(stats.timeSpent)', 'timeSpent')
+      .addSelect('COUNT(DISTINCT CASE WHEN stats.examCount > 0 THEN stats.day END)', 'studyDays')
+      .where('stats.userId = :userId', { userId });
+
+    if (dateRange) {
+      queryBuilder.andWhere('stats.day BETWEEN :startDay AND :endDay', {
+        startDay: this.formatDay(dateRange.start),
+        endDay: this.formatDay(dateRange.end),
+      });
+    }
+
+    const row = await queryBuilder.getRawOne();
+
+    return {
+      examCount: Number(row?.examCount) || 0,
+      questionCount: Number(row?.questionCount) || 0,
+      correctCount: Number(row?.correctCount) || 0,
+      incorrectCount: Number(row?.incorrectCount) || 0,
+      timeSpent: Number(row?.timeSpent) || 0,
+      studyDays: Number(row?.studyDays) || 0,
+    };
+  }
+
+  /**
+   * 从原始表重建汇总（不传 userId 时重建全部用户）
+   */
+  async rebuild(userId?: string): Promise<number> {
+    const userFilter = (alias: string) => (userId ? `AND ${alias}.user_id = ?` : '');
+    const params = userId ? [userId] : [];
+    // 分组查询放在派生表中，ON DUPLICATE KEY UPDATE 通过派生表别名引用新值
+    const increment = (columns: string[]) => this.increment(columns, 'src');
+
+    const rows = await this.statsRepository.manager.transaction(async (manager) => {
+      await manager.query(`DELETE FROM ${TABLE} WHERE 1 = 1 ${userId ? 'AND user_id = ?' : ''}`, params);
+
+      // 错题：按当前状态计入创建日
+      await manager.query(
+        `INSERT INTO ${TABLE}
+           (user_id, subject_id, day, mistake_count, mastered_count, familiar_count, unknown_count, favorite_count)
+         SELECT * FROM (
+           SELECT m.user_id, m.subject_id, DATE(m.created_at) AS day, COUNT(*) AS mistake_count,
+                  SUM(m.mastery_level = 'mastered') AS mastered_count,
+                  SUM(m.mastery_level = 'familiar') AS familiar_count,
+                  SUM(m.mastery_level = 'unknown') AS unknown_count,
+                  SUM(m.is_favorite) AS favorite_count
+           FROM mistakes m
+           WHERE 1 = 1 ${userFilter('m')}
+           GROUP BY m.user_id, m.subject_id, DATE(m.created_at)
+         ) AS src
+         ON DUPLICATE KEY UPDATE ${increment([
+           'mistake_count',
+           'mastered_count',
+           'familiar_count',
+           'unknown_count',
+           'favorite_count',
+         ])}`,
+        params,
+      );
+
+      // 练习：已完成的记录计入完成日
+      await manager.query(
+        `INSERT INTO ${TABLE}
+           (user_id, subject_id, day, exam_count, question_count, correct_count, incorrect_count, time_spent)
+         SELECT * FROM (
+           SELECT r.user_id, e.subject_id, DATE(r.completed_at) AS day, COUNT(*) AS exam_count,
+                  SUM(r.questionCount) AS question_count, SUM(r.correctCount) AS correct_count,
+                  SUM(r.incorrectCount) AS incorrect_count, SUM(r.timeSpent) AS time_spent
+           FROM exam_records r
+           JOIN exams e ON e.id = r.exam_id
+           WHERE r.status = 'completed' AND r.completed_at IS NOT NULL ${userFilter('r')}
+           GROUP BY r.user_id, e.subject_id, DATE(r.completed_at)
+         ) AS src
+         ON DUPLICATE KEY UPDATE ${increment([
+           'exam_count',
+           'question_count',
+           'correct_count',
+           'incorrect_count',
+           'time_spent',
+         ])}`,
+        params,
+      );
+
+      // 复习：已完成的复习计入提交日（早于 reviewed_at 列的旧记录退回到创建日）
+      await manager.query(
+        `INSERT INTO ${TABLE} (user_id, subject_id, day, review_count, review_correct_count)
+         SELECT * FROM (
+           SELECT v.user_id, m.subject_id, DATE(COALESCE(v.reviewed_at, v.created_at)) AS day,
+                  COUNT(*) AS review_count, SUM(v.isCorrect) AS review_correct_count
+           FROM reviews v
+           JOIN mistakes m ON m.id = v.mistake_id
+           WHERE v.status = 'reviewed' ${userFilter('v')}
+           GROUP BY v.user_id, m.subject_id, DATE(COALESCE(v.reviewed_at, v.created_at))
+         ) AS src
+         ON DUPLICATE KEY UPDATE ${increment(['review_count', 'review_correct_count'])}`,
+        params,
+      );
+
+      const [{ count }] = await manager.query(
+        `SELECT COUNT(*) AS count FROM ${TABLE} WHERE 1 = 1 ${userId ? 'AND user_id = ?' : ''}`,
+        params,
+      );
+      return Number(count);
+    });
+
+    this.logger.log(`Rebuilt ${rows} rollup rows${userId ? ` for user ${userId}` : ''}`);
+    return rows;
+  }
+
+  /**
+   * 累加赋值列表，新值通过行别名或派生表别名引用（替代已废弃的 VALUES(col)）
+   */
+  private increment(columns: string[], alias: string): string {
+    return columns.map((column) => `${column} = ${column} + ${alias}.${column}`).join(', ');
+  }
+
+  /**
+   * 记录用户统计变更：事务内等提交后通知，否则立即通知
+   */
+  private markChanged(manager: EntityManager, userId: string): void {
+    const queryRunner = manager.queryRunner;
+    if (!queryRunner?.isTransactionActive) {
+      this.notifyChange(userId);
+      return;
+    }
+
+    let users = this.pendingChanges.get(queryRunner);
+    if (!users) {
+      users = new Set();
+      this.pendingChanges.set(queryRunner, users);
+    }
+    users.add(userId);
+  }
+
+  private notifyChange(userId: string): void {
+    for (const listener of this.changeListeners) {
+      try {
+        listener(userId);
+      } catch (error) {
+        this.logger.warn(`Stats change listener failed for user ${userId}: ${error.message}`);
+      }
+    }
+  }
+
+  /**
+   * 本地日期 YYYY-MM-DD
+   */
+  private formatDay(date: Date): string {
+    const year = date.getFullYear();
+    const month = String(date.getMonth() + 1).padStart(2, '0');
+    const day = String(date.getDate()).padStart(2, '0');
+    return `${year}-${month}-${day}`;
+  }
+}
@@ -0,0 +1,43 @@
+import { NestFactory } from '@nestjs/core';
+import { Logger } from '@nestjs/common';
+import { DataSource } from 'typeorm';
+import { AppModule } from '../app.module';
+
+const BATCH_SIZE = parseInt(process.env.RANDOM_KEY_BACKFILL_BATCH_SIZE, 10) || 5000;
+
+/**
+ * 为存量错题生成随机抽题键（random_key 为 0 的行）
+ * 分批更新以避免长时间锁表；保留 updated_at 不变
+ * 用法：pnpm mistakes:backfill-random-keys
+ */
+async function backfill() {
+  const logger = new Logger('BackfillRandomKeys');
+
+  const app = await NestFactory.createApplicationContext(AppModule, {
+    logger: ['error', 'warn', 'log'],
+  });
+
+  try {
+    const dataSource = app.get(DataSource);
+    let total = 0;
+
+    for (;;) {
+      const result = await dataSource.query(
+        `UPDATE mistakes SET random_key = RAND(), updated_at = updated_at WHERE random_key = 0 LIMIT ?`,
+        [BATCH_SIZE],
+      );
+      const affected = result?.affectedRows ?? 0;
+      total += affected;
+      if (affected < BATCH_SIZE) break;
+    }
+
+    logger.log(`Done: ${total} mistakes backfilled`);
+  } finally {
+    await app.close();
+  }
+}
+
+backfill().catch((error) => {
+  console.error(error);
+  process.exit(1);
+});
@@ -0,0 +1,67 @@
+import { Logger } from '@nestjs/common';
+import { performance } from 'perf_hooks';
+import {
+  LeitnerScheduler,
+  REVIEW_DIFFICULTY_CODES,
+  REVIEW_RESULT_CODES,
+} from '../modules/review/leitner-scheduler.service';
+import { ReviewDifficulty, ReviewResult } from '../modules/review/dto/review.dto';
+
+const ROUNDS = 5;
+
+/**
+ * Leitner 调度计算基准：逐条 calculateNextReview 与批量 calculateNextReviewBatch 对比
+ * 用法：pnpm review:bench-leitner [卡片数，默认 100000]
+ */
+function bench() {
+  const logger = new Logger('BenchLeitner');
+  const count = parseInt(process.argv[2], 10) || 100000;
+  const scheduler = new LeitnerScheduler();
+
+  const results = Object.values(ReviewResult);
+  const difficulties = Object.values(ReviewDifficulty);
+  const cards = Array.from({ length: count }, () => ({
+    box: 1 + Math.floor(Math.random() * 5),
+    result: results[Math.floor(Math.random() * results.length)],
+    difficulty: difficulties[Math.floor(Math.random() * difficulties.length)],
+    easeFactor: 1.3 + Math.random() * 1.7,
+  }));
+
+  const input = {
+    boxes: Uint8Array.from(cards, (card) => card.box),
+    results: Uint8Array.from(cards, (card) => REVIEW_RESULT_CODES[card.result]),
+    difficulties: Uint8Array.from(cards, (card) => REVIEW_DIFFICULTY_CODES[card.difficulty]),
+    easeFactors: Float64Array.from(cards, (card) => card.easeFactor),
+  };
+
+  const measure = (run: () => void) => {
+    run(); // 预热
+    const timings: number[] = [];
+    for (let round = 0; round < ROUNDS; round++) {
+      const start = performance.now();
+      run();
+      timings.push(performance.now() - start);
+    }
+    return timings.sort((a, b) => a - b)[Math.floor(ROUNDS / 2)];
+  };
+
+  const scalar = measure(() => {
+    const now = new Date();
+    for (const card of cards) {
+      scheduler.calculateNextReview(card.box, card.result, card.difficulty, card.easeFactor, now);
+    }
+  });
+  const batch = measure(() => {
+    scheduler.calculateNextReviewBatch(input, new Date());
+  });
+  const initial = measure(() => {
+    scheduler.calculateInitialReviewBatch(input.boxes, new Date());
+  });
+
+  logger.log(`${count} cards, median of ${ROUNDS} rounds`);
+  logger.log(`calculateNextReview (per card):  ${scalar.toFixed(1)}ms`);
+  logger.log(`calculateNextReviewBatch:        ${batch.toFixed(1)}ms (${(scalar / batch).toFixed(1)}x)`);
+  logger.log(`calculateInitialReviewBatch:     ${initial.toFixed(1)}ms`);
+}
+
+bench();
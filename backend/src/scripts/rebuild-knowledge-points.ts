@@ -0,0 +1,29 @@
+import { NestFactory } from '@nestjs/core';
+import { Logger } from '@nestjs/common';
+import { AppModule } from '../app.module';
+import { KnowledgePointIndexService } from '../modules/mistake/knowledge-point-index.service';
+
+/**
+ * 从错题的 knowledge_points 列重建知识点关联表和全文检索文本
+ * 用法：pnpm knowledge-points:rebuild [userId]
+ */
+async function rebuild() {
+  const logger = new Logger('RebuildKnowledgePoints');
+  const userId = process.argv[2];
+
+  const app = await NestFactory.createApplicationContext(AppModule, {
+    logger: ['error', 'warn', 'log'],
+  });
+
+  try {
+    const rows = await app.get(KnowledgePointIndexService).rebuild(userId);
+    logger.log(`Done: ${rows} knowledge point rows${userId ? ` for user ${userId}` : ''}`);
+  } finally {
+    await app.close();
+  }
+}
+
+rebuild().catch((error) => {
+  console.error(error);
+  process.exit(1);
+});
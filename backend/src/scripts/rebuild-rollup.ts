@@ -0,0 +1,29 @@
+import { NestFactory } from '@nestjs/core';
+import { Logger } from '@nestjs/common';
+import { AppModule } from '../app.module';
+import { StatsRollupService } from '../modules/statistics/stats-rollup.service';
+
+/**
+ * 重建统计汇总表
+ * 用法：pnpm rollup:rebuild [userId]
+ */
+async function rebuild() {
+  const logger = new Logger('RebuildRollup');
+  const userId = process.argv[2];
+
+  const app = await NestFactory.createApplicationContext(AppModule, {
+    logger: ['error', 'warn', 'log'],
+  });
+
+  try {
+    const rows = await app.get(StatsRollupService).rebuild(userId);
+    logger.log(`Done: ${rows} rows${userId ? ` for user ${userId}` : ''}`);
+  } finally {
+    await app.close();
+  }
+}
+
+rebuild().catch((error) => {
+  console.error(error);
+  process.exit(1);
+});
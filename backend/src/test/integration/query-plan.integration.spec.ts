@@ -0,0 +1,253 @@
+import { DataSource, Logger as TypeOrmLogger } from 'typeorm';
+import { User } from '../../modules/user/entities/user.entity';
+import { Subject } from '../../modules/subject/entities/subject.entity';
+import { Mistake } from '../../modules/mistake/entities/mistake.entity';
+import { MistakeKnowledgePoint } from '../../modules/mistake/entities/mistake-knowledge-point.entity';
+import { Review } from '../../modules/review/entities/review.entity';
+import { Exam } from '../../modules/practice/entities/exam.entity';
+import { ExamRecord } from '../../modules/practice/entities/exam-record.entity';
+import { ExamAnswer } from '../../modules/practice/entities/exam-answer.entity';
+import { MistakeService } from '../../modules/mistake/mistake.service';
+import { MistakeSearchService } from '../../modules/mistake/mistake-search.service';
+import { ReviewService } from '../../modules/review/review.service';
+import { LeitnerScheduler } from '../../modules/review/leitner-scheduler.service';
+import { PerformanceAggregator } from '../../modules/analytics/performance-aggregator.service';
+import { TimeRange } from '../../modules/analytics/dto/analytics.dto';
+
+/**
+ * 热点查询执行计划回归测试
+ * 在种子数据上捕获服务实际发出的 SQL，逐条 EXPLAIN，出现全表/全索引扫描即失败
+ */
+
+// 需要检查的表别名（关联的主键查找不在此列）
+const WATCHED_ALIASES = new Set(['mistake', 'review', 'record']);
+const FULL_SCAN_TYPES = new Set(['ALL', 'index']);
+
+const USERS = 5;
+const SUBJECTS_PER_USER = 3;
+const MISTAKES_PER_USER = 600;
+const EXAMS_PER_USER = 10;
+const RECORDS_PER_USER = 300;
+const CHUNK_SIZE = 500;
+
+/**
+ * 记录执行过的 SELECT 及其参数
+ */
+class CapturingLogger implements TypeOrmLogger {
+  queries: { sql: string; parameters: any[] }[] = [];
+
+  logQuery(query: string, parameters?: any[]) {
+    if (/^\s*SELECT/i.test(query)) {
+      this.queries.push({ sql: query, parameters: parameters || [] });
+    }
+  }
+
+  logQueryError() {}
+  logQuerySlow() {}
+  logSchemaBuild() {}
+  logMigration() {}
+  log() {}
+}
+
+describe('Query Plan Regression Tests', () => {
+  let dataSource: DataSource;
+  let logger: CapturingLogger;
+  let mistakeService: MistakeService;
+  let reviewService: ReviewService;
+  let aggregator: PerformanceAggregator;
+  let userId: string;
+  let subjectId: string;
+
+  beforeAll(async () => {
+    logger = new CapturingLogger();
+    dataSource = new DataSource({
+      type: 'mysql',
+      host: process.env.DB_HOST || 'localhost',
+      port: parseInt(process.env.DB_PORT || '3306'),
+      username: process.env.DB_USER || 'root',
+      password: process.env.DB_PASSWORD || 'password',
+      database: process.env.DB_NAME || 'mistakery_test',
+      entities: [User, Subject, Mistake, MistakeKnowledgePoint, Review, Exam, ExamRecord, ExamAnswer],
+      synchronize: true,
+      dropSchema: true,
+      logging: ['query'],
+      logger,
+    });
+    await dataSource.initialize();
+
+    await seed();
+
+    mistakeService = new MistakeService(
+      dataSource.getRepository(Mistake),
+      dataSource.getRepository(Subject),
+      null,
+      null,
+      null,
+      null,
+      new MistakeSearchService(),
+    );
+    reviewService = new ReviewService(
+      dataSource.getRepository(Review),
+      dataSource.getRepository(Mistake),
+      new LeitnerScheduler(),
+      null,
+    );
+    aggregator = new PerformanceAggregator(
+      dataSource.getRepository(ExamRecord),
+      dataSource.getRepository(ExamAnswer),
+      dataSource.getRepository(Mistake),
+      null,
+    );
+  }, 120000);
+
+  afterAll(async () => {
+    await dataSource?.destroy();
+  });
+
+  beforeEach(() => {
+    logger.queries = [];
+  });
+
+  /**
+   * 批量写入种子数据并刷新统计信息，让优化器基于真实分布选择计划
+   */
+  async function seed() {
+    const now = Date.now();
+    const day = 24 * 60 * 60 * 1000;
+    const userIds: string[] = [];
+
+    for (let u = 0; u < USERS; u++) {
+      const user = await dataSource.getRepository(User).save({
+        username: `plan-user-${u}`,
+        email: `plan-user-${u}@example.com`,
+        passwordHash: 'hash',
+      });
+      userIds.push(user.id);
+
+      const subjectIds: string[] = [];
+      for (let s = 0; s < SUBJECTS_PER_USER; s++) {
+        const subject = await dataSource.getRepository(Subject).save({ userId: user.id, name: `科目${s}` });
+        subjectIds.push(subject.id);
+      }
+
+      const mistakes = Array.from({ length: MISTAKES_PER_USER }, (_, i) => ({
+        userId: user.id,
+        subjectId: subjectIds[i % SUBJECTS_PER_USER],
+        type: 'choice',
+        content: `题目 ${u}-${i}`,
+        analysis: '解析',
+        difficultyLevel: ['easy', 'medium', 'hard'][i % 3],
+        masteryLevel: ['unknown', 'familiar', 'mastered'][i % 3],
+        randomKey: Math.random(),
+      }));
+      const mistakeIds: string[] = [];
+      for (let i = 0; i < mistakes.length; i += CHUNK_SIZE) {
+        const result = await dataSource.getRepository(Mistake).insert(mistakes.slice(i, i + CHUNK_SIZE));
+        mistakeIds.push(...result.identifiers.map((identifier) => identifier.id));
+      }
+
+      const reviews = mistakeIds.map((mistakeId, i) => ({
+        userId: user.id,
+        mistakeId,
+        stage: (i % 5) + 1,
+        nextReviewAt: new Date(now + ((i % 20) - 10) * day),
+        status: i % 4 === 0 ? 'reviewed' : 'pending',
+      }));
+      for (let i = 0; i < reviews.length; i += CHUNK_SIZE) {
+        await dataSource.getRepository(Review).insert(reviews.slice(i, i + CHUNK_SIZE));
+      }
+
+      const exams = Array.from({ length: EXAMS_PER_USER }, (_, i) => ({
+        userId: user.id,
+        subjectId: subjectIds[i % SUBJECTS_PER_USER],
+        name: `练习 ${i}`,
+        questionIds: [],
+        status: 'completed' as const,
+      }));
+      const examIds = (await dataSource.getRepository(Exam).insert(exams)).identifiers.map((identifier) => identifier.id);
+
+      const records = Array.from({ length: RECORDS_PER_USER }, (_, i) => ({
+        examId: examIds[i % EXAMS_PER_USER],
+        examName: `练习 ${i % EXAMS_PER_USER}`,
+        userId: user.id,
+        status: (i % 10 === 0 ? 'in-progress' : 'completed') as ExamRecord['status'],
+        startedAt: new Date(now - (i + 1) * day),
+        completedAt: i % 10 === 0 ? null : new Date(now - i * day),
+      }));
+      for (let i = 0; i < records.length; i += CHUNK_SIZE) {
+        await dataSource.getRepository(ExamRecord).insert(records.slice(i, i + CHUNK_SIZE));
+      }
+
+      if (u === 0) {
+        subjectId = subjectIds[0];
+      }
+    }
+
+    userId = userIds[0];
+    await dataSource.query('ANALYZE TABLE mistakes, reviews, exam_records');
+  }
+
+  /**
+   * 对捕获的每条 SELECT 执行 EXPLAIN，返回命中全扫描的计划行
+   */
+  async function findFullScans(): Promise<string[]> {
+    expect(logger.queries.length).toBeGreaterThan(0);
+
+    const captured = [...logger.queries];
+    const violations: string[] = [];
+
+    for (const { sql, parameters } of captured) {
+      const plan = await dataSource.query(`EXPLAIN ${sql}`, parameters);
+      for (const row of plan) {
+        if (WATCHED_ALIASES.has(row.table) && FULL_SCAN_TYPES.has(row.type)) {
+          violations.push(`${row.table}: type=${row.type} key=${row.key} rows=${row.rows}\n  ${sql}`);
+        }
+      }
+    }
+
+    return violations;
+  }
+
+  describe('MistakeService.findAll', () => {
+    it('should use an index for the default listing', async () => {
+      await mistakeService.findAll(userId, { page: 3, limit: 20 } as any);
+      expect(await findFullScans()).toEqual([]);
+    });
+
+    it('should use an index when filtering by subject and mastery level', async () => {
+      await mistakeService.findAll(userId, { subjectId, masteryLevel: 'unknown', page: 1, limit: 20 } as any);
+      expect(await findFullScans()).toEqual([]);
+    });
+  });
+
+  describe('ReviewService.getDueReviews', () => {
+    it('should use an index for due reviews', async () => {
+      await reviewService.getDueReviews(userId, { limit: 50 });
+      expect(await findFullScans()).toEqual([]);
+    });
+
+    it('should use an index when filtering by subject', async () => {
+      await reviewService.getDueReviews(userId, { limit: 50, subjectId });
+      expect(await findFullScans()).toEqual([]);
+    });
+  });
+
+  describe('ReviewService.getSchedule', () => {
+    it('should aggregate due counts from the review index', async () => {
+      await reviewService.getSchedule(userId, 90);
+      expect(await findFullScans()).toEqual([]);
+    });
+  });
+
+  describe('PerformanceAggregator.getUserExamRecords', () => {
+    it('should use an index for all completed records', async () => {
+      await aggregator.getUserExamRecords(userId);
+      expect(await findFullScans()).toEqual([]);
+    });
+
+    it('should use an index for a completed_at range', async () => {
+      await aggregator.getUserExamRecords(userId, TimeRange.MONTH);
+      expect(await findFullScans()).toEqual([]);
+    });
+  });
+});